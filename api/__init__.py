@@ -1,17 +1,32 @@
-from math import trunc
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Optional
 
 from fastapi import FastAPI, Depends
 from fastapi.security import APIKeyHeader
 from fastapi import HTTPException, Security, status
-from .routes import router, ws_router
+from .analytics import game_stats, stats_path
+from .bots import bot_manager
+from .profiles import profile_directory
+from .ratings import player_ratings, ratings_path
+from .routes import router, ws_router, internal_router
+from .matchmaking import matchmaker
+from .policy import open_policy_table, policy_path
+from startup import startup_profiler, use_prebuilt_openapi, warm_serializers
 import os
+import secrets
 
 api_key_internal = os.getenv("API_KEY_INTERNAL")
 
 API_KEY_NAME = "AXKAN"
 API_KEY_HEADER = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
+# shared by the gateway and workers of a cluster only, see cluster.py
+cluster_secret = os.getenv("AXKAN_CLUSTER_SECRET")
+
+CLUSTER_SECRET_NAME = "AXKAN-CLUSTER"
+CLUSTER_SECRET_HEADER = APIKeyHeader(name=CLUSTER_SECRET_NAME, auto_error=False)
+
 async def check_api_key(api_key_header: str = Security(API_KEY_HEADER)) -> bool:
     if api_key_header is None:
         raise HTTPException(status_code=403, detail="Internal API Key is missing")
@@ -21,7 +36,39 @@ async def check_api_key(api_key_header: str = Security(API_KEY_HEADER)) -> bool:
     else:
         raise HTTPException(status_code=401, detail="Invalid API Key")
 
-app = FastAPI(title="Axkan II Game API")
+async def check_cluster_secret(secret_header: str = Security(CLUSTER_SECRET_HEADER)) -> bool:
+    """Internal endpoints move games between workers, only the gateway and other workers may call them."""
+    if cluster_secret is None or secret_header is None:
+        raise HTTPException(status_code=403, detail="Internal endpoints are only served to the cluster")
+    if not secrets.compare_digest(secret_header, cluster_secret):
+        raise HTTPException(status_code=401, detail="Invalid cluster secret")
+    return True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup_profiler.phase("warm serializers"):
+        warm_serializers()
+    if policy_path() is not None:
+        with startup_profiler.phase("map policy table"):
+            open_policy_table(policy_path())
+    tasks = [asyncio.create_task(matchmaker.run())]
+    for store, path in ((game_stats, stats_path()), (player_ratings, ratings_path())):
+        if path is not None:
+            # every worker snapshots, the profiles are only loaded by their owner
+            if store is not player_ratings or profile_directory.owner() is None:
+                store.load(path)
+            tasks.append(asyncio.create_task(store.snapshot_periodically(path)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await bot_manager.shutdown()
+
+app = FastAPI(title="Axkan II Game API", lifespan=lifespan)
+use_prebuilt_openapi(app)
 app.include_router(router, prefix="/api/v1", dependencies=[Security(check_api_key)])
 app.include_router(ws_router, prefix="/api/v1")
+app.include_router(internal_router, prefix="/internal", dependencies=[Security(check_cluster_secret)])
 
@@ -0,0 +1,176 @@
+"""
+Aggregate statistics over finished games, kept as fixed-size counters and snapshotted to disk.
+
+Each finished game updates a bounded number of counters, so recording is O(1) and the snapshot
+has the same size after ten games or ten million. Set AXKAN_STATS_PATH to persist the counters, and
+AXKAN_ARCHIVE_PATH to also keep every finished game in the archive (see archive.py).
+"""
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from .profiles import profile_directory
+
+if TYPE_CHECKING:
+    from archive import GameArchive
+    from game_context import GameResult
+    from game_record import GameRecorder
+
+PNL_MIN = -60  # lower edge of the first P&L bin, lower values are counted in it
+PNL_BIN_WIDTH = 5
+PNL_BINS = 32  # up to +100, higher values are counted in the last bin
+MAX_PRICE = 20
+SEVEN_CARDS_DEALT = 2
+SNAPSHOT_INTERVAL = 30  # seconds between snapshots when something changed
+
+
+def _zeros(size: int) -> List[int]:
+    return [0] * size
+
+
+class GameStats:
+    """
+    Counters over finished games:
+    - wins by seat (seat 0, seat 1, draw)
+    - P&L histogram per seat
+    - final stock price distribution
+    - picked pairs by breakeven price and color, as held at the end of the game
+    - seven cards used per player
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.wins = _zeros(3)
+        self.pnl = [_zeros(PNL_BINS), _zeros(PNL_BINS)]
+        self.final_price = _zeros(MAX_PRICE + 1)
+        self.picks = {"red": _zeros(MAX_PRICE + 1), "black": _zeros(MAX_PRICE + 1)}
+        self.seven_cards_used = _zeros(SEVEN_CARDS_DEALT + 1)
+        self.dirty = False
+
+    def record(self, result: "GameResult") -> None:
+        """Count a finished game."""
+        self.games += 1
+        self.wins[result.winner] += 1  # -1 (draw) is the last slot
+        if result.stock_price is not None:
+            self.final_price[result.stock_price] += 1
+        for seat, view in enumerate((result.player_1, result.player_2)):
+            self.pnl[seat][pnl_bin(view.pnl)] += 1
+            for pair in view.selected_pairs:
+                color = "red" if pair.big_card.is_red else "black"
+                self.picks[color][min(max(pair.get_breakeven_price(), 0), MAX_PRICE)] += 1
+            self.seven_cards_used[SEVEN_CARDS_DEALT - len(view.seven_cards)] += 1
+        self.dirty = True
+
+    def merge(self, other: "GameStats") -> None:
+        """Add the counters of another instance, e.g. of another worker."""
+        self.games += other.games
+        _add(self.wins, other.wins)
+        for seat in range(2):
+            _add(self.pnl[seat], other.pnl[seat])
+        _add(self.final_price, other.final_price)
+        for color in self.picks:
+            _add(self.picks[color], other.picks[color])
+        _add(self.seven_cards_used, other.seven_cards_used)
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def to_dict(self) -> Dict:
+        return {
+            "games": self.games,
+            "wins": self.wins,
+            "pnl": self.pnl,
+            "final_price": self.final_price,
+            "picks": self.picks,
+            "seven_cards_used": self.seven_cards_used,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "GameStats":
+        stats = cls()
+        stats.games = data["games"]
+        stats.wins = list(data["wins"])
+        stats.pnl = [list(row) for row in data["pnl"]]
+        stats.final_price = list(data["final_price"])
+        stats.picks = {color: list(row) for color, row in data["picks"].items()}
+        stats.seven_cards_used = list(data["seven_cards_used"])
+        return stats
+
+    def summary(self) -> Dict:
+        """Counters plus the derived rates served by the stats endpoint."""
+        games = self.games or 1
+        return {
+            **self.to_dict(),
+            "win_rate": [self.wins[0] / games, self.wins[1] / games],
+            "draw_rate": self.wins[2] / games,
+            "pnl_bins": {"min": PNL_MIN, "width": PNL_BIN_WIDTH, "count": PNL_BINS},
+        }
+
+    def save(self, path: str) -> None:
+        """Write a snapshot atomically, so a crash mid-write keeps the previous one."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    def load(self, path: str) -> bool:
+        """Replace the counters with a snapshot. Returns False when there is none."""
+        if not os.path.exists(path):
+            return False
+        with open(path) as f:
+            loaded = GameStats.from_dict(json.load(f))
+        self.__dict__.update(loaded.__dict__)
+        return True
+
+    async def snapshot_periodically(self, path: str, interval: float = SNAPSHOT_INTERVAL) -> None:
+        """Save a snapshot every `interval` seconds when something was recorded, and once more on cancel."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                if self.dirty:
+                    self.save(path)
+        finally:
+            if self.dirty:
+                self.save(path)
+
+
+def pnl_bin(pnl: int) -> int:
+    return min(max((pnl - PNL_MIN) // PNL_BIN_WIDTH, 0), PNL_BINS - 1)
+
+
+def _add(total: List[int], other: List[int]) -> None:
+    for i, value in enumerate(other):
+        total[i] += value
+
+
+def stats_path() -> Optional[str]:
+    return os.getenv("AXKAN_STATS_PATH") or None
+
+
+def archive_path() -> Optional[str]:
+    return os.getenv("AXKAN_ARCHIVE_PATH") or None
+
+
+_archive: Optional["GameArchive"] = None
+
+
+def record_finished_game(result: "GameResult", profile_ids: Tuple[Optional[str], Optional[str]],
+                         recorder: "GameRecorder") -> None:
+    """Count a finished game, update the players' ratings and archive it when AXKAN_ARCHIVE_PATH is set."""
+    global _archive
+    game_stats.record(result)
+    profile_directory.record(result, profile_ids)
+    path = archive_path()
+    if path is None:
+        return
+    # numpy is only imported by servers that archive
+    from archive import GameArchive, pack_game
+    if _archive is None or _archive.path != path:
+        _archive = GameArchive(path)
+    _archive.append(pack_game(recorder, result))
+
+
+# Global game statistics instance
+game_stats = GameStats()
@@ -0,0 +1,213 @@
+"""
+Bots filling the empty seat of a game. A bot follows its game's notification feed like a polling
+client and plays through GameManager.take_action, the same way as a human player.
+
+Choosing a move runs in a process pool with a per-move time budget (see bot.py), so searches never
+block the event loop. A choice has until its budget plus POOL_GRACE: the search stops itself there, even
+after waiting in the pool's queue, and the bot plays a random move when the answer comes too late.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from dice import DiceCollectionType
+from enums import Difficulty, GameAction, GamePhase
+from .feed import notification_feed
+from .policy import policy_path
+from .registry import session_registry
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from bot import BotMove
+    from game_manager import GameManager
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = 5.0  # seconds between checks of a game whose feed is quiet, batches do not notify
+POOL_GRACE = 2.0  # seconds a choice may take past its budget, for queueing and starting workers
+ACTING_BOTS = 1  # bots applying a move on the event loop at once
+
+
+def bot_workers() -> int:
+    return int(os.getenv("AXKAN_BOT_WORKERS") or os.cpu_count() or 1)
+
+
+@dataclass
+class Bot:
+    game_manager: "GameManager"
+    player_uuid: str
+    difficulty: Difficulty
+    task: Optional[asyncio.Task] = None
+    done_in: Optional[GamePhase] = None  # phase in which the bot already got ready or ended its review
+    moves: int = 0
+    timeouts: int = 0  # moves played at random because the choice missed its budget
+
+
+class BotManager:
+    def __init__(self):
+        self.bots: Dict[str, Bot] = {}  # player_uuid -> bot
+        self.executor: Optional["ProcessPoolExecutor"] = None
+        self.turns = asyncio.Semaphore(ACTING_BOTS)
+        self.rng = random.Random()
+
+    def pool(self) -> "ProcessPoolExecutor":
+        if self.executor is None:
+            # the pool, the bots and the solver are only imported once a game needs them, not at startup
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            from bot import init_worker
+            # spawned workers do not inherit the server's sockets, tasks and games
+            self.executor = ProcessPoolExecutor(bot_workers(), mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=init_worker, initargs=(policy_path(),))
+        return self.executor
+
+    async def add(self, game_manager: "GameManager", difficulty: Difficulty) -> Bot:
+        """Join a game waiting for a player with a bot, and start playing it."""
+        player_uuid = str(uuid.uuid4())
+        await game_manager.take_action(player_uuid=player_uuid, action=GameAction.JOIN_GAME,
+                                       player_name=f"Bot ({difficulty.value})")
+        session_registry.add_player(game_manager, player_uuid)
+        return self.start(game_manager, player_uuid, difficulty)
+
+    def start(self, game_manager: "GameManager", player_uuid: str, difficulty: Difficulty,
+              done_in: Optional[GamePhase] = None) -> Bot:
+        """Play a seat of a game, e.g. one of a game moved from another worker."""
+        bot = Bot(game_manager, player_uuid, difficulty, done_in=done_in)
+        bot.task = asyncio.create_task(self.play(bot))
+        self.bots[player_uuid] = bot
+        return bot
+
+    def dump(self, game_manager: "GameManager") -> List[list]:
+        """JSON-compatible [player uuid, difficulty, done_in] of the bots of a game, to start them again elsewhere."""
+        return [[bot.player_uuid, bot.difficulty.value, bot.done_in.value if bot.done_in else None]
+                for bot in self.bots.values() if bot.game_manager is game_manager]
+
+    async def play(self, bot: Bot) -> None:
+        """Act whenever it is the bot's turn, until its game is dropped."""
+        game_id = bot.game_manager.game_id
+        try:
+            with bot.game_manager.hold():
+                while session_registry.get_game(game_id) is bot.game_manager:
+                    feed = notification_feed.get(game_id)
+                    seq = feed.seq
+                    try:
+                        acted = await self.act(bot)
+                    except ValueError as e:
+                        logger.warning("Bot %s in game %s: %s", bot.player_uuid, game_id, e)
+                        acted = False
+                    if not acted:
+                        await feed.wait(seq, IDLE_TIMEOUT)
+        finally:
+            if self.bots.get(bot.player_uuid) is bot:
+                del self.bots[bot.player_uuid]
+
+    @asynccontextmanager
+    async def turn(self):
+        """
+        Bots take turns on the event loop, each handing it back before the next one goes, so a request
+        waits behind one bot action at most however many bots were woken at once.
+        """
+        async with self.turns:
+            yield
+            await asyncio.sleep(0)
+
+    async def act(self, bot: Bot) -> bool:
+        """Take the bot's next action, if it has one. Returns whether the game may have changed."""
+        async with self.turn():
+            if await self.act_without_choice(bot):
+                return True
+            context = bot.game_manager.context
+            current = context.get_current_player()
+            if current is None or current.uuid != bot.player_uuid:
+                return False
+            from solver import root_state
+            state = root_state(context, current.player_id)
+            version = bot.game_manager.version
+
+        move = await self.choose(bot, state)
+        async with self.turn():
+            if bot.game_manager.version != version:
+                return True  # the game moved on while the bot was thinking, e.g. it was imported again
+            await self.apply(bot, move)
+        bot.moves += 1
+        return True
+
+    async def act_without_choice(self, bot: Bot) -> bool:
+        """Get ready, review or roll the initial price when the bot has to."""
+        game_manager = bot.game_manager
+        phase = game_manager.context.current_phase
+        if phase != bot.done_in:
+            bot.done_in = None
+
+        if phase in (GamePhase.GAME_START, GamePhase.GAME_END) and bot.done_in is None:
+            # ready for the first game right away, for a rematch once the opponent asked for one
+            if phase == GamePhase.GAME_END and game_manager.ready_player_count == 0:
+                return False
+            bot.done_in = phase
+            await game_manager.take_action(player_uuid=bot.player_uuid, action=GameAction.READY)
+            return True
+        if phase == GamePhase.FINAL_REVIEW and bot.done_in is None:
+            bot.done_in = phase
+            if bot.difficulty != Difficulty.EASY:
+                await game_manager.take_action(player_uuid=bot.player_uuid, action=GameAction.AUTO_CONVERT)
+            await game_manager.take_action(player_uuid=bot.player_uuid, action=GameAction.END_REVIEW)
+            return True
+        current = game_manager.context.get_current_player()
+        if phase == GamePhase.GAME_INIT and current.uuid == bot.player_uuid:
+            await game_manager.take_action(player_uuid=bot.player_uuid, action=GameAction.ROLL_DICE)
+            return True
+        return False
+
+    async def choose(self, bot: Bot, state) -> "BotMove":
+        from bot import MOVE_BUDGETS, choose_move, random_move
+        if bot.difficulty == Difficulty.EASY:
+            return random_move(state, self.rng)  # nothing to search, not worth a trip to the pool
+        budget = MOVE_BUDGETS[bot.difficulty]
+        # the pool cannot stop a job once it runs, so the job gets the deadline the bot stops waiting at
+        deadline = time.time() + budget + POOL_GRACE
+        future = asyncio.get_running_loop().run_in_executor(self.pool(), choose_move, state, bot.difficulty, budget,
+                                                            deadline)
+        try:
+            return await asyncio.wait_for(future, budget + POOL_GRACE)
+        except asyncio.TimeoutError:
+            bot.timeouts += 1
+            return random_move(state, self.rng)
+
+    async def apply(self, bot: Bot, move: "BotMove") -> None:
+        context = bot.game_manager.context
+        if move.pair_id is not None:
+            taken = set(context.selected_pair_index.values())
+            pair_index = next(i for i, pair in enumerate(context.available_pairs)
+                              if i not in taken and pair.to_index() == move.pair_id)
+            await bot.game_manager.take_action(player_uuid=bot.player_uuid, action=GameAction.SELECT_PAIR,
+                                               pair_index=pair_index)
+        elif move.collection == DiceCollectionType.REGULAR:
+            await bot.game_manager.take_action(player_uuid=bot.player_uuid, action=GameAction.ROLL_DICE)
+        else:
+            await bot.game_manager.take_action(player_uuid=bot.player_uuid, action=GameAction.ROLL_DICE,
+                                               special_card_index=0, dice_collection_type=move.collection.value)
+
+    def clear(self) -> None:
+        """Stop every bot."""
+        for bot in list(self.bots.values()):
+            bot.task.cancel()
+        self.bots.clear()
+
+    async def shutdown(self) -> None:
+        tasks = [bot.task for bot in self.bots.values()]
+        self.clear()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.turns = asyncio.Semaphore(ACTING_BOTS)  # the next loop gets its own
+
+
+# Global bot manager instance
+bot_manager = BotManager()
@@ -0,0 +1,251 @@
+"""
+Message buses carrying WebSocket notifications to whichever worker holds the player's connection.
+"""
+import abc
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# A frame is [game_id, player_uuids or None for everyone, message_type, message]
+Frame = list
+DeliverCallback = Callable[[List[Frame]], Awaitable[None]]
+
+RECONNECT_MIN_DELAY = 0.1  # seconds before the first reconnection attempt, doubled after each failure
+RECONNECT_MAX_DELAY = 5.0
+MAX_PENDING = 10000  # frames kept for the broker while disconnected
+
+
+class DeliveryError(Exception):
+    """Frames could not be sent to some of the connections they were addressed to."""
+
+
+class MessageBus(abc.ABC):
+    """Interface of a notification bus. Frames published here end up in the deliver callback of every
+    worker subscribed to the frame's game."""
+
+    def __init__(self):
+        self.deliver: Optional[DeliverCallback] = None
+
+    def bind(self, deliver: DeliverCallback) -> None:
+        self.deliver = deliver
+
+    @abc.abstractmethod
+    async def publish(self, frame: Frame, local: bool) -> None:
+        """Publish a frame. `local` tells whether this worker holds connections for the game."""
+
+    async def subscribe(self, game_id: str) -> None:
+        pass
+
+    async def unsubscribe(self, game_id: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class InProcessBus(MessageBus):
+    """Single process: frames are delivered straight to the local connections."""
+
+    async def publish(self, frame: Frame, local: bool) -> None:
+        if local:
+            await self.deliver([frame])
+
+
+class BrokerBus(MessageBus):
+    """
+    Multi-process: frames are delivered locally and forwarded to the broker, which relays them to
+    the other workers subscribed to the game. Frames published in the same event loop tick are sent
+    to the broker as one batch.
+
+    A background task keeps the connection open, reconnecting with exponential backoff and subscribing
+    to the worker's games again. Frames published while disconnected are kept, up to MAX_PENDING.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.games: Set[str] = set()  # subscriptions, replayed after reconnecting
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Event] = None
+        self._pending: Deque[Frame] = deque(maxlen=MAX_PENDING)
+        self._flush_scheduled = False
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def _start(self) -> None:
+        if self._task is None:
+            self._connected = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_connected(self, timeout: float) -> bool:
+        """Wait until the broker connection is open. Returns False on timeout."""
+        self._start()
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _run(self) -> None:
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logger.warning("Message broker unavailable at %s, retrying in %.1fs: %s", self.path, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            delay = RECONNECT_MIN_DELAY
+            self._writer = writer
+            for game_id in self.games:
+                self._write({"op": "sub", "game_id": game_id})
+            self._flush()
+            self._connected.set()
+            try:
+                await self._read(reader)
+            except (OSError, ValueError) as e:
+                logger.warning("Lost the message broker connection: %s", e)
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            if message["op"] == "deliver":
+                try:
+                    await self.deliver(message["frames"])
+                except DeliveryError as e:
+                    logger.warning("Failed to deliver frames from broker: %s", e)
+
+    def _write(self, message: dict) -> None:
+        self._writer.write(json.dumps(message).encode() + b"\n")
+
+    async def publish(self, frame: Frame, local: bool) -> None:
+        self._start()
+        if len(self._pending) == MAX_PENDING:
+            logger.warning("Message broker backlog full, dropping the oldest frame")
+        self._pending.append(frame)
+        if self.connected and not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+        if local:
+            await self.deliver([frame])
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        if self._pending and self.connected:
+            frames = list(self._pending)
+            self._pending.clear()
+            self._write({"op": "pub", "frames": frames})
+
+    async def subscribe(self, game_id: str) -> None:
+        self._start()
+        self.games.add(game_id)
+        if self.connected:
+            self._write({"op": "sub", "game_id": game_id})
+
+    async def unsubscribe(self, game_id: str) -> None:
+        self.games.discard(game_id)
+        if self.connected:
+            self._write({"op": "unsub", "game_id": game_id})
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class Broker:
+    """Relays published frames between workers over a unix socket, one batch per worker per tick."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}  # game_id -> worker connections
+        self._pending: Dict[asyncio.StreamWriter, List[Frame]] = {}
+        self._flush_scheduled = False
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # the server only stops accepting, workers see their connection end and reconnect
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        games: Set[str] = set()
+        self._connections.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                op = message["op"]
+                if op == "pub":
+                    self._route(writer, message["frames"])
+                elif op == "sub":
+                    games.add(message["game_id"])
+                    self.subscribers.setdefault(message["game_id"], set()).add(writer)
+                elif op == "unsub":
+                    games.discard(message["game_id"])
+                    self._unsubscribe(message["game_id"], writer)
+        finally:
+            for game_id in games:
+                self._unsubscribe(game_id, writer)
+            self._pending.pop(writer, None)
+            self._connections.discard(writer)
+            writer.close()
+
+    def _unsubscribe(self, game_id: str, writer: asyncio.StreamWriter) -> None:
+        writers = self.subscribers.get(game_id)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[game_id]
+
+    def _route(self, sender: asyncio.StreamWriter, frames: List[Frame]) -> None:
+        for frame in frames:
+            for writer in self.subscribers.get(frame[0], ()):
+                if writer is not sender:
+                    self._pending.setdefault(writer, []).append(frame)
+        if self._pending and not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, {}
+        for writer, frames in pending.items():
+            if not writer.is_closing():
+                writer.write(json.dumps({"op": "deliver", "frames": frames}).encode() + b"\n")
+
+
+def create_bus() -> MessageBus:
+    """Use the broker started by cluster.py when there is one."""
+    path = os.getenv("AXKAN_BROKER_SOCKET")
+    return BrokerBus(path) if path else InProcessBus()
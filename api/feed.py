@@ -0,0 +1,91 @@
+"""
+Per-game notification feed backing the long-poll and Server-Sent Events transports.
+"""
+import asyncio
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+FEED_SIZE = 64  # messages kept per game for clients catching up
+
+
+class FeedMessage(NamedTuple):
+    seq: int
+    player_uuids: Optional[Tuple[str, ...]]  # None for everyone
+    type: str
+    content: str
+
+
+class GameFeed:
+    """
+    Recent notifications of one game. All clients waiting on the game share a single event,
+    which is set and replaced whenever a message is appended, or the feed is closed.
+    """
+
+    def __init__(self, size: int = FEED_SIZE):
+        self.seq = 0
+        self.messages: Deque[FeedMessage] = deque(maxlen=size)
+        self.closed = False  # the game left this worker, streams end and clients resume at its new owner
+        self._changed: Optional[asyncio.Event] = None
+
+    def _wake(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    def append(self, player_uuids: Optional[List[str]], message_type: str, content: str) -> None:
+        self.seq += 1
+        targets = tuple(player_uuids) if player_uuids is not None else None
+        self.messages.append(FeedMessage(self.seq, targets, message_type, content))
+        self._wake()
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake()
+
+    def since(self, seq: int, player_uuid: str) -> Tuple[List[FeedMessage], bool]:
+        """Get the messages for a player after a sequence number, and whether older ones were dropped."""
+        # a sequence number from the future comes from a feed that was dropped, e.g. after a migration
+        missed = seq > self.seq or (bool(self.messages) and self.messages[0].seq > seq + 1)
+        messages = [m for m in self.messages
+                    if m.seq > seq and (m.player_uuids is None or player_uuid in m.player_uuids)]
+        return messages, missed
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """Wait until a message after `seq` is appended or the feed is closed. Returns False on timeout."""
+        if self.seq > seq or self.closed:
+            return True
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class NotificationFeed:
+    def __init__(self):
+        self.games: Dict[str, GameFeed] = {}  # game_id -> feed
+
+    def get(self, game_id: str) -> GameFeed:
+        feed = self.games.get(game_id)
+        if feed is None:
+            feed = self.games[game_id] = GameFeed()
+        return feed
+
+    def append(self, game_id: str, player_uuids: Optional[List[str]], message_type: str, content: str) -> None:
+        self.get(game_id).append(player_uuids, message_type, content)
+
+    def drop(self, game_id: str) -> None:
+        feed = self.games.pop(game_id, None)
+        if feed is not None:
+            feed.close()
+
+    def clear(self) -> None:
+        for feed in self.games.values():
+            feed.close()
+        self.games.clear()
+
+
+# Global notification feed instance
+notification_feed = NotificationFeed()
@@ -0,0 +1,418 @@
+"""
+Gateway routing HTTP and WebSocket traffic to the worker owning each game over unix sockets.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import httpx
+from websockets.asyncio.client import unix_connect
+from websockets.exceptions import ConnectionClosed, InvalidStatus
+
+from .analytics import GameStats
+from .sharding import HashRing, socket_path
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v1"
+GAME_PATH = re.compile(r"/games/(?P<game_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(/|$)")
+# long-lived requests that a migration does not wait for, the old owner ends them when exporting the game
+STREAM_PATH = re.compile(r"/games/[^/]+/(events|poll)$")
+HOP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"upgrade", b"host"}
+
+
+class Gateway:
+    """ASGI app placing games on workers with consistent hashing and proxying requests to them."""
+
+    def __init__(self, socket_dir: str, workers: List[int], api_key: Optional[str] = None,
+                 cluster_secret: Optional[str] = None):
+        self.socket_dir = socket_dir
+        self.ring = HashRing(workers)
+        self.api_key = api_key if api_key is not None else os.getenv("API_KEY_INTERNAL")
+        # authenticates the gateway to the workers' internal endpoints, never forwarded from clients
+        self.cluster_secret = cluster_secret if cluster_secret is not None else os.getenv("AXKAN_CLUSTER_SECRET")
+        self.placements: Dict[str, int] = {}  # game_id -> worker, for games not on their ring owner
+        self.open_game_id: Optional[str] = None  # game waiting for its second player
+        self.spawn_worker: Optional[Callable[[int], Awaitable[None]]] = None  # set by the cluster
+        self.stop_worker: Optional[Callable[[int], Awaitable[None]]] = None
+        self._clients: Dict[int, httpx.AsyncClient] = {}
+        self._join_lock = asyncio.Lock()
+        self._migrations: Dict[str, asyncio.Event] = {}  # game_id -> set when the game has moved
+        self._inflight: Dict[str, int] = {}  # game_id -> requests being proxied, streams aside
+
+    # --- routing ---
+
+    def owner(self, game_id: str) -> int:
+        """Get the worker owning a game: its ring owner, unless a failed migration left it elsewhere."""
+        worker_id = self.placements.get(game_id)
+        return worker_id if worker_id is not None else self.ring.lookup(game_id)
+
+    @property
+    def home_worker(self) -> int:
+        """Worker serving requests that do not belong to a game, it owns the player profiles."""
+        return self.ring.workers[0]
+
+    def client(self, worker_id: int) -> httpx.AsyncClient:
+        client = self._clients.get(worker_id)
+        if client is None:
+            transport = httpx.AsyncHTTPTransport(uds=socket_path(self.socket_dir, worker_id))
+            client = httpx.AsyncClient(transport=transport, base_url="http://worker", timeout=None)
+            self._clients[worker_id] = client
+        return client
+
+    @staticmethod
+    def game_id_of(path: str, query: List[Tuple[str, str]]) -> Optional[str]:
+        for key, value in query:
+            if key == "game_id":
+                return value
+        match = GAME_PATH.search(path)
+        return match.group("game_id") if match else None
+
+    # --- ASGI ---
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self.handle_http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self.handle_websocket(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self.handle_lifespan(receive, send)
+
+    async def handle_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for client in self._clients.values():
+                    await client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle_http(self, scope, receive, send):
+        path = scope["path"]
+        query = parse_qsl(scope["query_string"].decode(), keep_blank_values=True)
+        headers = [(k, v) for k, v in scope["headers"] if k not in HOP_HEADERS]
+        body = await self._read_body(receive)
+        method = scope["method"]
+
+        if path.startswith("/cluster/"):
+            status, content = await self.handle_cluster(method, path, query, dict(headers))
+            await self._send_response(send, status, [(b"content-type", b"application/json")], content)
+            return
+
+        if path == "/internal" or path.startswith("/internal/"):
+            # workers' internal endpoints are only for the gateway and other workers
+            await self._send_response(send, 404, [(b"content-type", b"application/json")], b'{"detail":"Not Found"}')
+            return
+
+        if path == f"{API_PREFIX}/games/clear":
+            responses = await asyncio.gather(*(
+                self.client(w).request(method, path, headers=headers, content=body) for w in self.ring.workers))
+            self.placements.clear()
+            self.open_game_id = None
+            await self._send_httpx(send, responses[0])
+            return
+
+        if path.startswith(f"{API_PREFIX}/games/phases") and method == "GET":
+            responses = await asyncio.gather(*(
+                self.client(w).get(path, headers=headers) for w in self.ring.workers))
+            await self._send_merged(send, responses)
+            return
+
+        if path == f"{API_PREFIX}/games/stats" and method == "GET":
+            responses = await asyncio.gather(*(
+                self.client(w).get(path, headers=headers) for w in self.ring.workers))
+            await self._send_merged_stats(send, responses)
+            return
+
+        game_id = self.game_id_of(path, query)
+        if game_id is None and path == f"{API_PREFIX}/games/join":
+            await self.handle_join(send, path, query, headers, body)
+            return
+
+        if game_id is None:
+            worker_id = self.home_worker
+            await self._proxy(send, worker_id, method, path, query, headers, body)
+            return
+
+        migration = self._migrations.get(game_id)
+        if migration is not None:
+            await migration.wait()
+        if STREAM_PATH.search(path):
+            await self._proxy(send, self.owner(game_id), method, path, query, headers, body)
+            return
+        self._inflight[game_id] = self._inflight.get(game_id, 0) + 1
+        try:
+            await self._proxy(send, self.owner(game_id), method, path, query, headers, body)
+        finally:
+            self._inflight[game_id] -= 1
+            if not self._inflight[game_id]:
+                del self._inflight[game_id]
+
+    async def handle_join(self, send, path, query, headers, body):
+        """Pair players across workers: the gateway picks the game id and forwards to its owner."""
+        async with self._join_lock:
+            game_id = self.open_game_id or str(uuid.uuid4())
+            response = await self.client(self.owner(game_id)).post(
+                path, params=query + [("game_id", game_id)], headers=headers, content=body)
+            if response.status_code == 200:
+                # a first player asking for a bot gets a full game, only a game without opponent stays open
+                self.open_game_id = game_id if response.json().get("opponent_uuid") is None else None
+            elif self.open_game_id == game_id:
+                # the open game was taken or cleared on the worker, start over on the next join
+                self.open_game_id = None
+        await self._send_httpx(send, response)
+
+    async def handle_websocket(self, scope, receive, send):
+        path = scope["path"]
+        query_string = scope["query_string"].decode()
+        game_id = self.game_id_of(path, parse_qsl(query_string))
+        worker_id = self.owner(game_id) if game_id else self.home_worker
+
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+
+        uri = f"ws://worker{path}" + (f"?{query_string}" if query_string else "")
+        try:
+            upstream = await unix_connect(socket_path(self.socket_dir, worker_id), uri)
+        except InvalidStatus:
+            await send({"type": "websocket.close", "code": 4003})
+            return
+        except OSError:
+            await send({"type": "websocket.close", "code": 1011})
+            return
+        await send({"type": "websocket.accept"})
+
+        async def client_to_worker():
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    await upstream.close()
+                    return
+                data = message.get("text")
+                await upstream.send(data if data is not None else message.get("bytes"))
+
+        async def worker_to_client():
+            try:
+                async for data in upstream:
+                    if isinstance(data, str):
+                        await send({"type": "websocket.send", "text": data})
+                    else:
+                        await send({"type": "websocket.send", "bytes": data})
+            except ConnectionClosed:
+                pass
+            await send({"type": "websocket.close", "code": upstream.close_code or 1000,
+                        "reason": upstream.close_reason or ""})
+
+        tasks = [asyncio.create_task(client_to_worker()), asyncio.create_task(worker_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await upstream.close()
+
+    # --- rebalancing ---
+
+    async def handle_cluster(self, method, path, query, headers) -> Tuple[int, bytes]:
+        """Admin endpoints: POST /cluster/workers/{id} adds a worker, DELETE removes it."""
+        if self.api_key is None or headers.get(b"axkan", b"").decode() != self.api_key:
+            return 401, b'{"detail":"Invalid API Key"}'
+        match = re.fullmatch(r"/cluster/workers/(\d+)", path)
+        if match is None:
+            return 404, b'{"detail":"Not Found"}'
+        worker_id = int(match.group(1))
+        if method == "POST":
+            moved = await self.add_worker(worker_id)
+        elif method == "DELETE":
+            moved = await self.remove_worker(worker_id)
+        else:
+            return 405, b'{"detail":"Method Not Allowed"}'
+        return 200, json.dumps({"workers": self.ring.workers, "moved": moved}).encode()
+
+    async def add_worker(self, worker_id: int) -> int:
+        if worker_id in self.ring.workers:
+            return 0
+        if self.spawn_worker is not None:
+            await self.spawn_worker(worker_id)
+        return await self.rebalance(self.ring.with_worker(worker_id))
+
+    async def remove_worker(self, worker_id: int) -> int:
+        if worker_id not in self.ring.workers or len(self.ring.workers) == 1:
+            return 0
+        moved = await self.rebalance(self.ring.without_worker(worker_id))
+        if worker_id in self.ring.workers:
+            return moved  # the profiles could not move off it
+        if worker_id in self.placements.values():
+            logger.warning("Worker %d left running for the games that could not move off it", worker_id)
+            return moved
+        if self.stop_worker is not None:
+            await self.stop_worker(worker_id)
+        client = self._clients.pop(worker_id, None)
+        if client is not None:
+            await client.aclose()
+        return moved
+
+    async def rebalance(self, ring: HashRing) -> int:
+        """
+        Switch to a new ring and migrate every game whose owner changed. The games are listed on the
+        workers, so games the gateway never routed (e.g. created by matchmaking) move too.
+        """
+        headers = self.internal_headers()
+        async with self._join_lock:  # no game is created on the old ring after the listing
+            # workers create their own games for the new ring from now on
+            pushed = await self._push_ring(ring, ring.workers)
+            listings = await asyncio.gather(*(self.client(w).get("/internal/games", headers=headers)
+                                              for w in self.ring.workers), return_exceptions=True)
+            failed = [w for w, listing in zip(self.ring.workers, listings)
+                      if isinstance(listing, BaseException) or listing.status_code != 200]
+            if not pushed or failed:
+                # games of a worker that cannot be listed would be routed to the wrong owner
+                logger.error("Keeping the ring, workers %s could not be reached", failed or ring.workers)
+                await self._push_ring(self.ring, ring.workers)
+                return 0
+            moves = [(game_id, worker_id, ring.lookup(game_id))
+                     for worker_id, listing in zip(self.ring.workers, listings)
+                     for game_id in listing.json() if ring.lookup(game_id) != worker_id]
+            if ring.workers[0] != self.home_worker and not await self._hand_off_profiles(ring.workers[0]):
+                logger.error("Keeping the ring, the profiles could not move to worker %d", ring.workers[0])
+                await self._push_ring(self.ring, ring.workers)
+                return 0
+            for game_id, _, _ in moves:
+                self._migrations.setdefault(game_id, asyncio.Event())
+            # placements of ended games are dropped, those of games that fail to move are set again
+            self.ring = ring
+            self.placements = {}
+        await asyncio.gather(*(self.migrate(game_id, old, new) for game_id, old, new in moves))
+        return len(moves)
+
+    async def migrate(self, game_id: str, old_worker: int, new_worker: int) -> None:
+        """Move a game, its requests wait on the migration registered by rebalance."""
+        event = self._migrations.setdefault(game_id, asyncio.Event())
+        try:
+            # let requests already sent to the old owner finish first
+            while self._inflight.get(game_id):
+                await asyncio.sleep(0.005)
+            headers = self.internal_headers()
+            try:
+                exported = await self.client(old_worker).post(f"/internal/games/{game_id}/export", headers=headers)
+            except httpx.HTTPError:
+                logger.error("Game %s could not be exported from worker %d", game_id, old_worker)
+                self.placements[game_id] = old_worker
+                return
+            if exported.status_code != 200:
+                return  # ended on the old owner meanwhile
+            if await self._import(new_worker, exported.content):
+                return
+            # the export closed the game on the old owner, put it back there rather than lose it
+            if await self._import(old_worker, exported.content):
+                self.placements[game_id] = old_worker
+            else:
+                logger.error("Game %s lost moving from worker %d to %d", game_id, old_worker, new_worker)
+        finally:
+            del self._migrations[game_id]
+            event.set()
+
+    async def _import(self, worker_id: int, content: bytes) -> bool:
+        try:
+            response = await self.client(worker_id).post("/internal/games/import", headers=self.internal_headers(),
+                                                         content=content)
+        except httpx.HTTPError:
+            return False
+        return response.status_code == 200
+
+    async def _push_ring(self, ring: HashRing, workers: List[int]) -> bool:
+        responses = await asyncio.gather(*(self.client(w).put("/internal/ring", headers=self.internal_headers(),
+                                                              json={"workers": ring.workers}) for w in workers),
+                                         return_exceptions=True)
+        return all(not isinstance(r, BaseException) and r.status_code == 200 for r in responses)
+
+    async def _hand_off_profiles(self, new_home: int) -> bool:
+        """Move the profiles from the home worker to the new one, the other workers rate through it meanwhile."""
+        try:
+            response = await self.client(self.home_worker).post(
+                "/internal/profiles/handoff", headers=self.internal_headers(), json={"owner": new_home})
+        except httpx.HTTPError:
+            return False
+        if response.status_code != 200:
+            return False
+        workers = set(self.ring.workers) | {new_home}
+        await asyncio.gather(*(self.client(w).put("/internal/profiles/owner", headers=self.internal_headers(),
+                                                  json={"owner": new_home}) for w in workers),
+                             return_exceptions=True)
+        return True
+
+    # --- helpers ---
+
+    def internal_headers(self) -> Dict[str, str]:
+        return {"AXKAN-CLUSTER": self.cluster_secret or "", "content-type": "application/json"}
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                return body
+
+    async def _proxy(self, send, worker_id, method, path, query, headers, body):
+        client = self.client(worker_id)
+        request = client.build_request(method, path, params=query, headers=headers, content=body)
+        response = await client.send(request, stream=True)
+        try:
+            await send({"type": "http.response.start", "status": response.status_code,
+                        "headers": self._response_headers(response)})
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await response.aclose()
+
+    async def _send_httpx(self, send, response: httpx.Response):
+        await self._send_response(send, response.status_code, self._response_headers(response), response.content)
+
+    async def _send_merged(self, send, responses: List[httpx.Response]):
+        """Merge JSON lists by concatenation and JSON objects of counts by sum."""
+        payloads = [r.json() for r in responses if r.status_code == 200]
+        if len(payloads) != len(responses):
+            await self._send_httpx(send, next(r for r in responses if r.status_code != 200))
+            return
+        if payloads and isinstance(payloads[0], dict):
+            merged = {}
+            for payload in payloads:
+                for key, value in payload.items():
+                    merged[key] = merged.get(key, 0) + value
+        else:
+            merged = [item for payload in payloads for item in payload]
+        await self._send_response(send, 200, [(b"content-type", b"application/json")], json.dumps(merged).encode())
+
+    async def _send_merged_stats(self, send, responses: List[httpx.Response]):
+        """Add up the game statistics of every worker."""
+        failed = [r for r in responses if r.status_code != 200]
+        if failed:
+            await self._send_httpx(send, failed[0])
+            return
+        stats = GameStats()
+        for response in responses:
+            stats.merge(GameStats.from_dict(response.json()))
+        await self._send_response(send, 200, [(b"content-type", b"application/json")],
+                                  json.dumps(stats.summary()).encode())
+
+    @staticmethod
+    def _response_headers(response: httpx.Response) -> List[Tuple[bytes, bytes]]:
+        return [(k, v) for k, v in response.headers.raw if k.lower() not in HOP_HEADERS]
+
+    @staticmethod
+    async def _send_response(send, status: int, headers, content: bytes):
+        headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+        headers.append((b"content-length", str(len(content)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
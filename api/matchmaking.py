@@ -0,0 +1,183 @@
+"""
+Rating-aware matchmaking: waiting players are paired with the closest rating inside a window that
+widens the longer they wait.
+
+The pool is a SortedList of (rating, ticket id), so the best opponent of a ticket is one of its two
+neighbours and finding it is an O(log n) lookup instead of a scan of the pool.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+from enums import GameAction
+from game_manager import game_pool
+from .models import PlayerMetadata
+from .profiles import ProfilesUnavailable, profile_directory
+from .ratings import INITIAL_RATING
+from .registry import session_registry
+from .sharding import new_game_id
+
+BASE_WINDOW = 50.0  # rating difference accepted right away
+WINDOW_GROWTH = 25.0  # added per second of waiting
+MAX_WINDOW = 800.0
+TICK_INTERVAL = 1.0  # seconds between matching passes
+WAIT_SAMPLES = 10000  # recent queue waits kept for the percentiles
+MATCH_TTL = 60.0  # seconds a match is kept for a player who does not fetch it
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Ticket:
+    ticket_id: str
+    player_name: str
+    profile_id: Optional[str]
+    rating: float
+    enqueued_at: float
+    match: Optional[PlayerMetadata] = None
+    matched_at: Optional[float] = None
+    matched: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def window(self, now: float) -> float:
+        return min(BASE_WINDOW + WINDOW_GROWTH * (now - self.enqueued_at), MAX_WINDOW)
+
+
+class Matchmaker:
+    def __init__(self):
+        self.tickets: Dict[str, Ticket] = {}  # ticket_id -> ticket, waiting or matched but not yet fetched
+        self.pool = SortedList()  # (rating, ticket_id) of waiting tickets
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.matches = 0
+
+    def enqueue(self, player_name: str, profile_id: Optional[str] = None, rating: float = INITIAL_RATING,
+                now: Optional[float] = None) -> Ticket:
+        ticket = Ticket(str(uuid.uuid4()), player_name, profile_id, rating, time.monotonic() if now is None else now)
+        self.tickets[ticket.ticket_id] = ticket
+        self.pool.add((ticket.rating, ticket.ticket_id))
+        return ticket
+
+    def cancel(self, ticket_id: str) -> bool:
+        """Leave the queue. Returns False when the ticket is unknown or already matched."""
+        ticket = self.tickets.get(ticket_id)
+        if ticket is None or ticket.match is not None:
+            return False
+        self.pool.remove((ticket.rating, ticket_id))
+        del self.tickets[ticket_id]
+        return True
+
+    def collect(self, ticket_id: str) -> Optional[Ticket]:
+        """Get a ticket, forgetting it once its match was handed out."""
+        ticket = self.tickets.get(ticket_id)
+        if ticket is not None and ticket.match is not None:
+            del self.tickets[ticket_id]
+        return ticket
+
+    def opponent(self, ticket: Ticket, now: float) -> Optional[Ticket]:
+        """Closest waiting rating within the ticket's window, from the two neighbours in the pool."""
+        index = self.pool.index((ticket.rating, ticket.ticket_id))
+        window = ticket.window(now)
+        best = None
+        for neighbour in (index - 1, index + 1):
+            if 0 <= neighbour < len(self.pool):
+                rating, ticket_id = self.pool[neighbour]
+                distance = abs(rating - ticket.rating)
+                if distance <= window and (best is None or distance < best[0]):
+                    best = (distance, ticket_id)
+        return self.tickets[best[1]] if best else None
+
+    def pairs(self, now: float) -> List[Tuple[Ticket, Ticket]]:
+        """Pair waiting tickets, longest waiting first, and take them out of the pool."""
+        pairs = []
+        for ticket in list(self.tickets.values()):  # insertion order is enqueue order
+            if ticket.match is not None or (ticket.rating, ticket.ticket_id) not in self.pool:
+                continue
+            opponent = self.opponent(ticket, now)
+            if opponent is None:
+                continue
+            self.pool.remove((ticket.rating, ticket.ticket_id))
+            self.pool.remove((opponent.rating, opponent.ticket_id))
+            pairs.append((ticket, opponent))
+        return pairs
+
+    async def tick(self, now: Optional[float] = None) -> int:
+        """Run one matching pass and start a game for every pair. Returns the number of games."""
+        now = time.monotonic() if now is None else now
+        self.expire(now)
+        pairs = self.pairs(now)
+        for first, second in pairs:
+            first.match, second.match = await start_game(first, second)
+            for ticket in (first, second):
+                ticket.matched_at = now
+                self.waits.append(now - ticket.enqueued_at)
+                ticket.matched.set()
+        self.matches += len(pairs)
+        return len(pairs)
+
+    def expire(self, now: float) -> None:
+        """Forget matches their players never fetched."""
+        expired = [ticket_id for ticket_id, ticket in self.tickets.items()
+                   if ticket.matched_at is not None and now - ticket.matched_at > MATCH_TTL]
+        for ticket_id in expired:
+            del self.tickets[ticket_id]
+
+    async def run(self, interval: float = TICK_INTERVAL) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.tick()
+
+    def wait_percentile(self, percentile: float) -> Optional[float]:
+        if not self.waits:
+            return None
+        waits = sorted(self.waits)
+        return waits[min(int(len(waits) * percentile / 100), len(waits) - 1)]
+
+    def stats(self) -> dict:
+        return {
+            "waiting": len(self.pool),
+            "matches": self.matches,
+            "p50_wait": self.wait_percentile(50),
+            "p99_wait": self.wait_percentile(99),
+        }
+
+    def clear(self) -> None:
+        self.__init__()
+
+
+async def start_game(first: Ticket, second: Ticket) -> Tuple[PlayerMetadata, PlayerMetadata]:
+    """
+    Create a game on this worker with both players joined, as /games/join would. Its id hashes onto
+    this worker, so the gateway routes the players here without being told about the game.
+    """
+    game_manager = game_pool.acquire(new_game_id())
+    session_registry.register(game_manager)
+    uuids = []
+    for ticket in (first, second):
+        player_uuid = str(uuid.uuid4())
+        await game_manager.take_action(player_uuid=player_uuid, action=GameAction.JOIN_GAME,
+                                       player_name=ticket.player_name)
+        session_registry.add_player(game_manager, player_uuid)
+        if ticket.profile_id is not None:
+            # the profile lives on its owner worker, the game's ratings are sent there when it ends
+            game_manager.context.get_player(player_uuid).profile_id = ticket.profile_id
+            try:
+                await profile_directory.get_or_create(ticket.profile_id, ticket.player_name)
+            except ProfilesUnavailable as e:
+                # the game goes on unrated rather than failing the whole matching pass
+                logger.error("Profile %s could not be created: %s", ticket.profile_id, e)
+        uuids.append(player_uuid)
+    return (
+        PlayerMetadata(game_id=game_manager.game_id, player_uuid=uuids[0], player_name=first.player_name,
+                       opponent_uuid=uuids[1], opponent_name=second.player_name),
+        PlayerMetadata(game_id=game_manager.game_id, player_uuid=uuids[1], player_name=second.player_name,
+                       opponent_uuid=uuids[0], opponent_name=first.player_name),
+    )
+
+
+# Global matchmaker instance
+matchmaker = Matchmaker()
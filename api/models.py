@@ -1,10 +1,16 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enums.game_action import GameAction
+from enums.game_phase import GamePhase
+from enums.difficulty import Difficulty
 from board import Board
+from card import CardPair
+from dice import DiceCollectionType
 
 class JoinGameRequest(BaseModel):
     player_name: str
+    profile_id: Optional[str] = None  # play rated games under a profile
+    bot: Optional[Difficulty] = None  # when no one is waiting, play a bot of this difficulty instead
 
 class GameMove(BaseModel):
     player_id: str
@@ -31,6 +37,153 @@ class PlayerMetadata(BaseModel):
     opponent_uuid: Optional[str]
     opponent_name: Optional[str]
 
+class BatchAction(BaseModel):
+    player_uuid: str
+    action: GameAction
+    pair_index: Optional[int] = None
+    special_card_index: Optional[int] = None
+    dice_collection_type: Optional[str] = None
+
+class BatchActionRequest(BaseModel):
+    actions: List[BatchAction]
+
+class BatchActionResponse(BaseModel):
+    status: str
+    game_id: str
+    applied: int
+    current_phase: GamePhase
+
+class FeedMessage(BaseModel):
+    seq: int
+    type: str
+    content: str
+
+class PollResponse(BaseModel):
+    seq: int  # pass back as `since` on the next poll
+    missed: bool  # older messages were dropped, refetch the board
+    messages: List[FeedMessage]
+
+class PnlBins(BaseModel):
+    min: int  # lower edge of the first bin
+    width: int
+    count: int
+
+class GameStatsResponse(BaseModel):
+    games: int
+    wins: List[int]  # seat 0, seat 1, draws
+    win_rate: List[float]  # by seat
+    draw_rate: float
+    pnl: List[List[int]]  # histogram per seat
+    pnl_bins: PnlBins
+    final_price: List[int]  # games by final stock price
+    picks: Dict[str, List[int]]  # "red"/"black" -> picked pairs by breakeven price
+    seven_cards_used: List[int]  # players by number of seven cards used
+
+class CreateProfileRequest(BaseModel):
+    name: str
+
+class PlayerRating(BaseModel):
+    profile_id: str
+    name: str
+    rating: float
+    rank: int
+    games: int
+    wins: int
+    draws: int
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    profile_id: str
+    name: str
+    rating: float
+
+class LeaderboardPage(BaseModel):
+    total: int
+    entries: List[LeaderboardEntry]
+
+class MatchTicket(BaseModel):
+    ticket_id: str
+    status: str  # "waiting" or "matched"
+    match: Optional[PlayerMetadata] = None
+
+class MatchmakingStats(BaseModel):
+    waiting: int
+    matches: int
+    p50_wait: Optional[float]  # seconds, over recent matches
+    p99_wait: Optional[float]
+
+class PairHintResponse(BaseModel):
+    pair_index: int
+    pair: CardPair
+    expected_pnl: float
+    profit_probability: float
+    vs_best_response: Optional[float] = None  # expected lead over an opponent taking the best other pair
+
+class PairHintsResponse(BaseModel):
+    stock_price: int
+    rolls_remaining: int
+    hints: List[PairHintResponse]  # best first
+
+class ConversionResponse(BaseModel):
+    pair_index: int  # -1 for the hidden pair
+    pair: CardPair
+    gain: int  # P&L gained by flipping the pair's big card
+
+class ConversionPlanResponse(BaseModel):
+    stock_price: int
+    seven_cards: int
+    total_gain: int
+    conversions: List[ConversionResponse]  # best first
+
+class DiceOptionResponse(BaseModel):
+    collection: DiceCollectionType
+    spends_seven_card: bool
+    expected_pnl: float
+    expected_lead: float  # over the opponent's visible pairs
+    win_probability: float
+
+class DiceOptionsResponse(BaseModel):
+    stock_price: int
+    rolls_remaining: int
+    options: List[DiceOptionResponse]  # best expected lead first
+
+class BreakevenOddsResponse(BaseModel):
+    breakeven: str
+    per_pair: float  # probability that a drawn pair has this breakeven
+    expected_count: float  # in the next draw
+    at_least_one: float  # probability that the next draw has a pair with this breakeven
+
+class DeckOddsResponse(BaseModel):
+    small_cards: int  # not seen by the player, the opponent's hidden pair included
+    big_cards: int
+    draws: int  # pairs in the next draw, 0 when no more pairs will be drawn
+    pair_probability: float  # of every unseen pair being in the next draw
+    breakevens: List[BreakevenOddsResponse]  # most likely first
+
+class AnalysisMove(BaseModel):
+    pair_index: Optional[int] = None  # index in the available pairs, for selections
+    pair: Optional[CardPair] = None
+    collection: Optional[DiceCollectionType] = None  # for rolls
+    expected_lead: float  # of the analysed player after the move
+
+class AnalysisResponse(BaseModel):
+    current_phase: GamePhase
+    to_move: Optional[int] = None  # player id of the player to act, None in the final review
+    expected_lead: float  # final P&L lead of the analysed player under best play
+    moves: List[AnalysisMove]  # best for the player to act first
+    conversions: List[int]  # in the final review, pair indexes to flip, -1 for the hidden pair
+    depth: int  # deepest completed search, in plies
+    nodes: int
+    table_hit_rate: float
+    elapsed: float  # seconds
+
+class PolicyResponse(BaseModel):
+    current_phase: GamePhase
+    pick_red: Optional[bool] = None  # in the selection phases, whether to pick a pair with a red big card
+    collection: Optional[DiceCollectionType] = None  # in turn_complete, the dice to roll
+    expected_lead: float
+    margin: float  # lead given up by the next best action
+
 class GameMessage(BaseModel):
     board: Board
 
@@ -0,0 +1,32 @@
+"""
+The policy table a server answers policy requests from, memory-mapped at startup when
+AXKAN_POLICY_PATH is set (see policy.py). The file is read-only, so every worker maps the same one.
+"""
+import os
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from policy import PolicyTable
+
+_table: Optional["PolicyTable"] = None
+
+
+def policy_path() -> Optional[str]:
+    return os.getenv("AXKAN_POLICY_PATH") or None
+
+
+def open_policy_table(path: str) -> "PolicyTable":
+    global _table
+    # numpy is only imported by servers that serve a policy table
+    from policy import PolicyTable
+    _table = PolicyTable(path)
+    return _table
+
+
+def close_policy_table() -> None:
+    global _table
+    _table = None
+
+
+def policy_table() -> Optional["PolicyTable"]:
+    return _table
@@ -0,0 +1,116 @@
+"""
+Player profiles in a cluster. The gateway's home worker, the one with the lowest id, owns every profile
+and also serves /players and /leaderboard. When a rebalance changes the home worker, the gateway has the
+profiles handed over and then tells every worker their new owner. The other workers read and rate profiles through the
+owner's internal endpoints, so each profile has a single record and the leaderboard ranks everyone.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import api
+from .ratings import Profile, game_score, player_ratings
+from .sharding import shard_config, socket_path
+
+if TYPE_CHECKING:
+    import httpx
+    from game_context import GameResult
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilesUnavailable(Exception):
+    """The worker owning the profiles could not be reached or failed the request."""
+
+
+class ProfileDirectory:
+    def __init__(self):
+        self.lock = asyncio.Lock()  # held while handing the profiles over to a new owner
+        self.owner_id: Optional[int] = None  # set by hand-offs, the lowest worker id until the first one
+        self._clients: Dict[int, "httpx.AsyncClient"] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def owner(self) -> Optional[int]:
+        """Get the worker owning the profiles, None when it is this process."""
+        if not shard_config.enabled:
+            return None
+        owner = self.owner_id if self.owner_id is not None else min(shard_config.workers)
+        return None if owner == shard_config.worker_id else owner
+
+    async def get(self, profile_id: str) -> Optional[Profile]:
+        async with self.lock:
+            owner = self.owner()
+            if owner is None:
+                return player_ratings.get(profile_id)
+        response = await self._request(owner, "GET", f"/internal/profiles/{profile_id}")
+        return Profile(**response.json()) if response.status_code == 200 else None
+
+    async def get_or_create(self, profile_id: str, name: str) -> Profile:
+        async with self.lock:
+            owner = self.owner()
+            if owner is None:
+                return player_ratings.get_or_create(profile_id, name)
+        response = await self._request(owner, "PUT", f"/internal/profiles/{profile_id}", json={"name": name},
+                                       expected=200)
+        return Profile(**response.json())
+
+    def record(self, result: "GameResult", profile_ids: Tuple[Optional[str], Optional[str]]) -> None:
+        """Rate a finished game, right away on the owner and in the background elsewhere."""
+        if None in profile_ids:
+            return
+        if self.owner() is None and not self.lock.locked():
+            player_ratings.record(result, profile_ids)
+            return
+        task = asyncio.create_task(self.rate(profile_ids, game_score(result)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def rate(self, profile_ids: Tuple[Optional[str], Optional[str]], score: float) -> None:
+        async with self.lock:
+            owner = self.owner()
+            if owner is None:
+                player_ratings.rate(profile_ids, score)
+                return
+        try:
+            await self._request(owner, "POST", "/internal/profiles/rate",
+                                json={"profile_ids": list(profile_ids), "score": score}, expected=200)
+        except ProfilesUnavailable as e:
+            logger.error("Rating of %s lost: %s", profile_ids, e)
+
+    async def handoff(self, new_owner: int) -> None:
+        """Send the profiles to their new owner. Ratings wait meanwhile, and are then forwarded to it."""
+        async with self.lock:
+            if not shard_config.enabled or self.owner() is not None or new_owner == shard_config.worker_id:
+                return
+            await self._request(new_owner, "POST", "/internal/profiles/import",
+                                json=[list(profile) for profile in player_ratings.profiles.values()], expected=200)
+            player_ratings.clear()
+            self.owner_id = new_owner
+
+    def restore(self, profiles: List[Profile]) -> None:
+        """Take over the profiles handed over by the previous owner."""
+        player_ratings.restore(profiles)
+        self.owner_id = shard_config.worker_id
+
+    async def _request(self, worker_id: int, method: str, path: str, expected: Optional[int] = None,
+                       **kwargs) -> "httpx.Response":
+        """Send a request to another worker, raising ProfilesUnavailable when it fails or its status is not the
+        expected one. httpx is only imported by clustered workers, standalone servers start without it."""
+        import httpx
+        client = self._clients.get(worker_id)
+        if client is None:
+            transport = httpx.AsyncHTTPTransport(uds=socket_path(shard_config.socket_dir, worker_id))
+            client = httpx.AsyncClient(transport=transport, base_url="http://worker", timeout=None)
+            self._clients[worker_id] = client
+        try:
+            response = await client.request(method, path, headers={"AXKAN-CLUSTER": api.cluster_secret or ""},
+                                            **kwargs)
+        except httpx.HTTPError as e:
+            raise ProfilesUnavailable(f"{method} {path} on worker {worker_id}: {e}") from e
+        if expected is not None and response.status_code != expected:
+            raise ProfilesUnavailable(f"{method} {path} on worker {worker_id}: status {response.status_code}")
+        return response
+
+
+# Global profile directory instance
+profile_directory = ProfileDirectory()
@@ -0,0 +1,182 @@
+"""
+Persistent player profiles with Elo ratings and a leaderboard kept in a SortedList.
+
+Every rating change is two O(log n) SortedList operations, and ranks and pages are index lookups, so
+updating both players at every game end stays cheap with a million rated players in memory.
+Set AXKAN_RATINGS_PATH to snapshot the profiles to disk.
+"""
+import asyncio
+import json
+import os
+import uuid
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from sortedcontainers import SortedList
+
+if TYPE_CHECKING:
+    from game_context import GameResult
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+SNAPSHOT_INTERVAL = 60  # seconds between snapshots when something changed
+
+
+class Profile(NamedTuple):
+    """A player's rating record. Immutable, so a snapshot is a consistent copy of references."""
+    profile_id: str
+    name: str
+    rating: float = INITIAL_RATING
+    games: int = 0
+    wins: int = 0
+    draws: int = 0
+
+
+def expected_score(rating: float, opponent_rating: float) -> float:
+    return 1.0 / (1.0 + 10.0 ** ((opponent_rating - rating) / 400.0))
+
+
+def game_score(result: "GameResult") -> float:
+    """Score of the first seat: 1 for a win, 0 for a loss and 0.5 for a draw."""
+    return {0: 1.0, 1: 0.0}.get(result.winner, 0.5)
+
+
+def elo_update(rating_a: float, rating_b: float, score_a: float, k: float = K_FACTOR) -> Tuple[float, float]:
+    """New ratings after a game, score_a being 1 for a win of a, 0.5 for a draw and 0 for a loss."""
+    delta = k * (score_a - expected_score(rating_a, rating_b))
+    return rating_a + delta, rating_b - delta
+
+
+class Leaderboard:
+    """Profiles ordered by rating, best first. Ties are ordered by profile id."""
+
+    def __init__(self, profiles=()):
+        self.entries = SortedList(self.key(profile) for profile in profiles)
+
+    @staticmethod
+    def key(profile: Profile) -> Tuple[float, str]:
+        return -profile.rating, profile.profile_id
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, profile: Profile) -> None:
+        self.entries.add(self.key(profile))
+
+    def update(self, old: Profile, new: Profile) -> None:
+        if old.rating != new.rating:
+            self.entries.remove(self.key(old))
+            self.entries.add(self.key(new))
+
+    def rank(self, profile: Profile) -> int:
+        """1-based position of a profile."""
+        return self.entries.index(self.key(profile)) + 1
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, str]]:
+        """(rank, profile id) of up to `limit` entries starting after `offset`."""
+        return [(offset + i + 1, profile_id)
+                for i, (_, profile_id) in enumerate(self.entries.islice(offset, offset + limit))]
+
+    def around(self, profile: Profile, radius: int) -> List[Tuple[int, str]]:
+        """(rank, profile id) of the entries within `radius` places of a profile."""
+        rank = self.rank(profile)
+        offset = max(rank - 1 - radius, 0)
+        return self.page(offset, rank + radius - offset)
+
+
+class PlayerRatings:
+    def __init__(self):
+        self.profiles: Dict[str, Profile] = {}  # profile_id -> profile
+        self.leaderboard = Leaderboard()
+        self.dirty = False
+
+    def create(self, name: str) -> Profile:
+        return self.get_or_create(str(uuid.uuid4()), name)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self.profiles.get(profile_id)
+
+    def get_or_create(self, profile_id: str, name: str) -> Profile:
+        profile = self.profiles.get(profile_id)
+        if profile is None:
+            profile = self.profiles[profile_id] = Profile(profile_id, name)
+            self.leaderboard.add(profile)
+            self.dirty = True
+        return profile
+
+    def record(self, result: "GameResult", profile_ids: Tuple[Optional[str], Optional[str]]) -> None:
+        """Update the ratings of a finished game, given the profile ids by seat. Unrated games are skipped."""
+        self.rate(profile_ids, game_score(result))
+
+    def rate(self, profile_ids: Tuple[Optional[str], Optional[str]], score: float) -> None:
+        """Update the ratings of two players, `score` being the first one's as in elo_update."""
+        if None in profile_ids or profile_ids[0] == profile_ids[1]:
+            return
+        first, second = self.profiles.get(profile_ids[0]), self.profiles.get(profile_ids[1])
+        if first is None or second is None:
+            return
+        first_rating, second_rating = elo_update(first.rating, second.rating, score)
+        self._replace(first, first_rating, score)
+        self._replace(second, second_rating, 1.0 - score)
+
+    def _replace(self, profile: Profile, rating: float, score: float) -> None:
+        updated = profile._replace(rating=rating, games=profile.games + 1,
+                                   wins=profile.wins + (score == 1.0), draws=profile.draws + (score == 0.5))
+        self.profiles[profile.profile_id] = updated
+        self.leaderboard.update(profile, updated)
+        self.dirty = True
+
+    def rank(self, profile: Profile) -> int:
+        return self.leaderboard.rank(profile)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def save(self, path: str) -> None:
+        """Write the profiles atomically, one JSON array per line."""
+        write_profiles(path, list(self.profiles.values()))
+        self.dirty = False
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        with open(path) as f:
+            self.restore(Profile(*json.loads(line)) for line in f if line.strip())
+        self.dirty = False
+        return True
+
+    def restore(self, profiles: Iterable[Profile]) -> None:
+        """Replace every profile, e.g. with those handed over by the previous owner of the ratings."""
+        self.profiles = {profile.profile_id: profile for profile in profiles}
+        self.leaderboard = Leaderboard(self.profiles.values())
+        self.dirty = True
+
+    async def snapshot_periodically(self, path: str, interval: float = SNAPSHOT_INTERVAL) -> None:
+        """Save the profiles every `interval` seconds when something changed, and once more on cancel."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                if self.dirty:
+                    # profiles are immutable, so the copied list is consistent while games go on
+                    self.dirty = False
+                    await asyncio.to_thread(write_profiles, path, list(self.profiles.values()))
+        finally:
+            if self.dirty:
+                self.save(path)
+
+
+def write_profiles(path: str, profiles: List[Profile]) -> None:
+    # the ratings move between the workers of a cluster, two of them may write at the hand-off
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        for profile in profiles:
+            f.write(json.dumps(profile))
+            f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def ratings_path() -> Optional[str]:
+    return os.getenv("AXKAN_RATINGS_PATH") or None
+
+
+# Global player ratings instance
+player_ratings = PlayerRatings()
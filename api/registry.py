@@ -0,0 +1,98 @@
+"""
+Session registry indexing live games by game id, player uuid and phase.
+"""
+from typing import Dict, List, NamedTuple, Optional, TYPE_CHECKING
+
+from enums import GamePhase
+
+if TYPE_CHECKING:
+    from game_manager import GameManager
+
+
+class PlayerLocation(NamedTuple):
+    game_id: str
+    seat: int  # player_id of the player in the current game
+
+
+class SessionRegistry:
+    def __init__(self):
+        self.games: Dict[str, "GameManager"] = {}  # game_id -> GameManager
+        self.players: Dict[str, "GameManager"] = {}  # player_uuid -> GameManager
+        # phase -> ordered set of game ids (dict keys keep insertion order)
+        self.phases: Dict[GamePhase, Dict[str, None]] = {phase: {} for phase in GamePhase}
+        self._game_phases: Dict[str, GamePhase] = {}  # game_id -> indexed phase
+
+    def register(self, game_manager: "GameManager") -> None:
+        """Index a new game under its current phase."""
+        game_id = game_manager.game_id
+        phase = game_manager.context.current_phase
+        self.games[game_id] = game_manager
+        self._game_phases[game_id] = phase
+        self.phases[phase][game_id] = None
+
+    def add_player(self, game_manager: "GameManager", player_uuid: str) -> None:
+        """Index a player under the game they joined."""
+        self.players[player_uuid] = game_manager
+
+    def remove(self, game_id: str) -> Optional["GameManager"]:
+        """Drop a game and all of its players from the indexes."""
+        game_manager = self.games.pop(game_id, None)
+        if game_manager is None:
+            return None
+        phase = self._game_phases.pop(game_id)
+        self.phases[phase].pop(game_id, None)
+        for player in game_manager.context.players:
+            if self.players.get(player.uuid) is game_manager:
+                del self.players[player.uuid]
+        return game_manager
+
+    def clear(self) -> None:
+        """Drop every game."""
+        self.games.clear()
+        self.players.clear()
+        self._game_phases.clear()
+        for games in self.phases.values():
+            games.clear()
+
+    def update_phase(self, game_manager: "GameManager") -> None:
+        """Move a game to the bucket of its current phase."""
+        game_id = game_manager.game_id
+        old_phase = self._game_phases.get(game_id)
+        new_phase = game_manager.context.current_phase
+        if old_phase is None or old_phase == new_phase:
+            return
+        del self.phases[old_phase][game_id]
+        self.phases[new_phase][game_id] = None
+        self._game_phases[game_id] = new_phase
+
+    def get_game(self, game_id: str) -> Optional["GameManager"]:
+        return self.games.get(game_id)
+
+    def resolve(self, player_uuid: str) -> Optional["GameManager"]:
+        """Get the game a player belongs to."""
+        return self.players.get(player_uuid)
+
+    def locate(self, player_uuid: str) -> Optional[PlayerLocation]:
+        """Get the game id and seat of a player."""
+        game_manager = self.players.get(player_uuid)
+        if game_manager is None:
+            return None
+        player = game_manager.context.get_player(player_uuid)
+        return PlayerLocation(game_id=game_manager.game_id, seat=player.player_id)
+
+    def games_in_phase(self, phase: GamePhase) -> List[str]:
+        """Get the ids of all games currently in a phase."""
+        return list(self.phases[phase])
+
+    def first_game_in_phase(self, phase: GamePhase) -> Optional["GameManager"]:
+        """Get the oldest game in a phase, if any."""
+        for game_id in self.phases[phase]:
+            return self.games[game_id]
+        return None
+
+    def phase_counts(self) -> Dict[str, int]:
+        return {phase.value: len(games) for phase, games in self.phases.items()}
+
+
+# Global session registry instance
+session_registry = SessionRegistry()
@@ -1,26 +1,52 @@
 import asyncio
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Query
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Query, Request, Response, Header, Body
+from fastapi.responses import StreamingResponse
 from typing import Dict, List, Optional
 import uuid
 import api
 
 from board import Board
-from enums import GameAction, GamePhase
+from card import CardPair
+from enums import Difficulty, GameAction, GamePhase
 from game_context import GameResult
-from game_manager import GameManager
-from .models import JoinGameRequest, GameMove, GameMetadata, GameResponse, GameError, PlayerMetadata
+from game_manager import GameManager, game_pool
+from game_record import TURNS
+from .models import JoinGameRequest, GameMove, GameMetadata, GameResponse, GameError, PlayerMetadata, \
+    BatchActionRequest, BatchActionResponse, FeedMessage, PollResponse, GameStatsResponse, \
+    CreateProfileRequest, PlayerRating, LeaderboardEntry, LeaderboardPage, MatchTicket, MatchmakingStats, \
+    PairHintResponse, PairHintsResponse, ConversionResponse, ConversionPlanResponse, \
+    DiceOptionResponse, DiceOptionsResponse, BreakevenOddsResponse, DeckOddsResponse, AnalysisMove, AnalysisResponse, \
+    PolicyResponse
+from .analytics import game_stats
+from .bots import bot_manager
+from .feed import notification_feed
+from .matchmaking import matchmaker
+from .policy import policy_table
+from .profiles import ProfilesUnavailable, profile_directory
+from .ratings import INITIAL_RATING, Profile, player_ratings
+from .registry import session_registry
+from .sharding import new_game_id, set_workers, shard_config
 from .websocket import websocket_manager
 from player import Player, PlayerView
+from pricing import pair_hints, rolls_remaining
 
 
 router = APIRouter()
 ws_router = APIRouter()
+internal_router = APIRouter()
 
-# In-memory storage for game sessions
-game_sessions: Dict[str, GameManager] = {}
-# Track which players have joined each game
-game_players: Dict[str, Dict[str, Player]] = {}
+def get_player_game(game_id: str, player_uuid: str) -> GameManager:
+    """
+    Get the game manager for a player, checking that the player is part of the game.
+    """
+    game_manager = session_registry.resolve(player_uuid)
+    if game_manager is not None and game_manager.game_id == game_id:
+        return game_manager
+
+    if session_registry.get_game(game_id) is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    raise HTTPException(status_code=403, detail="Player not part of this game")
 
 # clear all in-memory game session
 @router.post("/games/clear")
@@ -28,61 +54,95 @@ async def clear_game_sessions() -> None:
     """
     Clear all game sessions and player data.
     """
-    global game_sessions, game_players
-    game_sessions = {}
-    game_players = {}
+    games = list(session_registry.games.values())
+    session_registry.clear()
+    notification_feed.clear()
+    matchmaker.clear()
+    bot_manager.clear()
+    for game_manager in games:
+        game_manager.retire()
 
 
 @router.post("/games/join", response_model=PlayerMetadata)
-async def join_game(request: JoinGameRequest):
+async def join_game(request: JoinGameRequest, game_id: Optional[str] = None):
     """
     Create a new game or join an existing one.
     If this is the first player, creates a new game.
     If this is the second player, starts the game.
+    A first player asking for a bot gets one as the second player right away.
+    When sharded, the gateway passes the game id it placed on this worker.
     """
-    # Find an available game with one player
-    available_game_id = None
-    for game_id, players in game_players.items():
-        if len(players) == 1:
-            available_game_id = game_id
-            break
-    
-    if available_game_id:
+    if game_id is None:
+        # Find an available game with one player, games waiting in the lobby have exactly one
+        game_manager = session_registry.first_game_in_phase(GamePhase.LOBBY)
+    else:
+        game_manager = session_registry.get_game(game_id)
+        if game_manager is not None and game_manager.context.current_phase != GamePhase.LOBBY:
+            raise HTTPException(status_code=409, detail="Game is already full")
+
+    if game_manager:
         # Join existing game
-        game_id = available_game_id
+        game_id = game_manager.game_id
         player_uuid = str(uuid.uuid4())
-        
-        # Create second player
-        player2 = Player(player_id=1, uuid=player_uuid, name=request.player_name)
-        game_players[game_id][player_uuid] = player2
-        game_manager = game_sessions[game_id]
+        opponent = game_manager.context.players[0]
 
         # Start the game
         await game_manager.take_action(player_uuid=player_uuid, action=GameAction.JOIN_GAME, player_name=request.player_name)
+        session_registry.add_player(game_manager, player_uuid)
+        await attach_profile(game_manager, player_uuid, request)
 
         return PlayerMetadata(
             game_id=game_id,
             player_uuid=player_uuid,
             player_name=request.player_name,
-            opponent_uuid=list(game_players[game_id].values())[0].uuid,
-            opponent_name=list(game_players[game_id].values())[0].name)
+            opponent_uuid=opponent.uuid,
+            opponent_name=opponent.name)
 
     else:
         # Create new game
-        game_id = str(uuid.uuid4())
+        game_id = game_id or new_game_id()
         player_uuid = str(uuid.uuid4())
-        
-        # Create first player
-        player1 = Player(player_id=0, uuid=player_uuid, name=request.player_name)
-        
+
         # Initialize game manager
-        game_manager = GameManager(game_id=game_id)
-        game_sessions[game_id] = game_manager
-        game_players[game_id] = {player_uuid: player1}
+        game_manager = game_pool.acquire(game_id)
+        session_registry.register(game_manager)
 
         await game_manager.take_action(player_uuid=player_uuid, action=GameAction.JOIN_GAME, player_name=request.player_name)
+        session_registry.add_player(game_manager, player_uuid)
+        await attach_profile(game_manager, player_uuid, request)
+        if request.bot is not None:
+            return await add_bot(game_manager, player_uuid, request.bot)
         return PlayerMetadata(game_id=game_id, player_uuid=player_uuid, player_name=request.player_name, opponent_uuid=None, opponent_name=None)
 
+async def add_bot(game_manager: GameManager, player_uuid: str, difficulty: Difficulty) -> PlayerMetadata:
+    """Fill the empty seat of a waiting player's game with a bot."""
+    bot = await bot_manager.add(game_manager, difficulty)
+    player = game_manager.context.get_player(player_uuid)
+    opponent = game_manager.context.get_player(bot.player_uuid)
+    return PlayerMetadata(game_id=game_manager.game_id, player_uuid=player_uuid, player_name=player.name,
+                          opponent_uuid=opponent.uuid, opponent_name=opponent.name)
+
+@router.post("/games/{game_id}/bot", response_model=PlayerMetadata)
+async def play_bot(game_id: str, player_uuid: str, difficulty: Difficulty = Difficulty.MEDIUM):
+    """
+    Stop waiting for an opponent and play a bot instead.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    if game_manager.context.current_phase != GamePhase.LOBBY:
+        raise HTTPException(status_code=409, detail="Game is already full")
+    return await add_bot(game_manager, player_uuid, difficulty)
+
+async def attach_profile(game_manager: GameManager, player_uuid: str, request: JoinGameRequest) -> None:
+    """Rate the player's games under their profile, creating it on first use."""
+    if request.profile_id is None:
+        return
+    game_manager.context.get_player(player_uuid).profile_id = request.profile_id
+    try:
+        await profile_directory.get_or_create(request.profile_id, request.player_name)
+    except ProfilesUnavailable:
+        raise HTTPException(status_code=503, detail="Profiles are unavailable")
+
+
 # game ready
 @router.post("/games/ready", response_model=GameResponse)
 async def ready_game(game_id: str, player_uuid: str = Query(..., description="ID of the player getting ready")):
@@ -90,16 +150,8 @@ async def ready_game(game_id: str, player_uuid: str = Query(..., description="ID
     Mark a player as ready to start the game.
     If both players are ready, the game starts.
     """
-    # Check if game exists
-    if game_id not in game_sessions:
-        raise HTTPException(status_code=404, detail="Game not found")
-
-    # Check if player is part of the game
-    if game_id not in game_players or player_uuid not in game_players[game_id]:
-        raise HTTPException(status_code=403, detail="Player not part of this game")
-
-    # Get game manager
-    game_manager = game_sessions[game_id]
+    # Check that the game exists and the player is part of it
+    game_manager = get_player_game(game_id, player_uuid)
 
     # Process the ready action
     await game_manager.take_action(player_uuid, GameAction.READY)
@@ -115,16 +167,8 @@ async def roll_dice(game_id: str, player_uuid: str, dice_collection_type: str =
     """
     Roll the dice for the current player.
     """
-    # Check if game exists
-    if game_id not in game_sessions:
-        raise HTTPException(status_code=404, detail="Game not found")
-
-    # Check if player is part of the game
-    if game_id not in game_players or player_uuid not in game_players[game_id]:
-        raise HTTPException(status_code=403, detail="Player not part of this game")
-
-    # Get game manager
-    game_manager = game_sessions[game_id]
+    # Check that the game exists and the player is part of it
+    game_manager = get_player_game(game_id, player_uuid)
 
     # Process the roll dice action
     await game_manager.take_action(player_uuid, GameAction.ROLL_DICE, dice_collection_type=dice_collection_type, special_card_index=special_card_index)
@@ -140,16 +184,8 @@ async def select_pair(game_id: str, player_uuid: str, pair_index: int):
     """
     Select a pair for the current player.
     """
-    # Check if game exists
-    if game_id not in game_sessions:
-        raise HTTPException(status_code=404, detail="Game not found")
-
-    # Check if player is part of the game
-    if game_id not in game_players or player_uuid not in game_players[game_id]:
-        raise HTTPException(status_code=403, detail="Player not part of this game")
-
-    # Get game manager
-    game_manager = game_sessions[game_id]
+    # Check that the game exists and the player is part of it
+    game_manager = get_player_game(game_id, player_uuid)
 
     # Process the select pair action
     await game_manager.take_action(player_uuid, GameAction.SELECT_PAIR, pair_index=pair_index)
@@ -165,16 +201,8 @@ async def end_review(game_id: str, player_uuid: str):
     """
     End the review phase.
     """
-    # Check if game exists
-    if game_id not in game_sessions:
-        raise HTTPException(status_code=404, detail="Game not found")
-
-    # Check if player is part of the game
-    if game_id not in game_players or player_uuid not in game_players[game_id]:
-        raise HTTPException(status_code=403, detail="Player not part of this game")
-
-    # Get game manager
-    game_manager = game_sessions[game_id]
+    # Check that the game exists and the player is part of it
+    game_manager = get_player_game(game_id, player_uuid)
 
     # Process the end review action
     await game_manager.take_action(player_uuid, GameAction.END_REVIEW)
@@ -191,16 +219,8 @@ async def convert_color(game_id: str, player_uuid: str, pair_index: int, special
     """
     Convert the color of a pair for the current player.
     """
-    # Check if game exists
-    if game_id not in game_sessions:
-        raise HTTPException(status_code=404, detail="Game not found")
-
-    # Check if player is part of the game
-    if game_id not in game_players or player_uuid not in game_players[game_id]:
-        raise HTTPException(status_code=403, detail="Player not part of this game")
-
-    # Get game manager
-    game_manager = game_sessions[game_id]
+    # Check that the game exists and the player is part of it
+    game_manager = get_player_game(game_id, player_uuid)
 
     # Process the color convert action
     await game_manager.take_action(player_uuid, GameAction.COLOR_CONVERT, pair_index=pair_index, special_card_index=special_card_index)
@@ -211,6 +231,287 @@ async def convert_color(game_id: str, player_uuid: str, pair_index: int, special
         player_uuid=player_uuid
     )
 
+# pick the best conversions, for players who ran out of time
+@router.post("/games/auto-convert", response_model=GameResponse)
+async def auto_convert(game_id: str, player_uuid: str):
+    """
+    Spend the current player's remaining seven cards on the conversions that maximize their P&L.
+    """
+    # Check that the game exists and the player is part of it
+    game_manager = get_player_game(game_id, player_uuid)
+
+    # Process the auto convert action
+    await game_manager.take_action(player_uuid, GameAction.AUTO_CONVERT)
+
+    return GameResponse(
+        status="success",
+        game_id=game_id,
+        player_uuid=player_uuid
+    )
+
+@router.get("/games/{game_id}/conversions", response_model=ConversionPlanResponse)
+async def get_conversion_plan(game_id: str, player_uuid: str):
+    """
+    The conversions that maximize the player's P&L at the final price, with their remaining seven cards.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    context = game_manager.context
+    if context.current_phase != GamePhase.FINAL_REVIEW:
+        raise HTTPException(status_code=409, detail="Conversions are only made in the final review")
+
+    player = context.get_player(player_uuid)
+    plan = context.conversion_plan(player.player_id)
+    return ConversionPlanResponse(
+        stock_price=context.current_price,
+        seven_cards=len(player.seven_cards),
+        total_gain=plan.total_gain,
+        conversions=[ConversionResponse(pair_index=index, gain=gain,
+                                        pair=player.hidden_pair if index < 0 else player.selected_pairs[index])
+                     for index, gain in zip(plan.pair_indexes, plan.gains)])
+
+@router.get("/games/{game_id}/board")
+async def get_board(
+    game_id: str,
+    player_uuid: str,
+    if_none_match: Optional[str] = Header(default=None)
+) -> Response:
+    """
+    Get the current board of a player.
+    The ETag is the game's state version, send it back in If-None-Match to get a 304 while nothing changed.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    if len(game_manager.context.players) < 2:
+        raise HTTPException(status_code=409, detail="Game has not started")
+
+    etag = f'"{game_manager.version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    player = game_manager.context.get_player(player_uuid)
+    return Response(content=game_manager.board_json(player.player_id), media_type="application/json", headers=headers)
+
+# fallback transports for clients that cannot keep a WebSocket open
+POLL_TIMEOUT = 25.0
+SSE_KEEPALIVE = 15.0
+
+@router.get("/games/{game_id}/hints", response_model=PairHintsResponse)
+async def get_pair_hints(game_id: str, player_uuid: str, best_response: bool = False):
+    """
+    Rank the available pairs by expected final P&L and probability of profit, from the exact
+    distribution of the final price assuming regular rolls. With best_response, the first selector's
+    pairs are ranked by the expected lead over an opponent who then takes the best remaining pair.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    context = game_manager.context
+    if context.current_phase not in (GamePhase.TURN_SELECT_FIRST, GamePhase.TURN_SELECT_SECOND):
+        raise HTTPException(status_code=409, detail="Pairs are not being selected")
+
+    # pairs stay listed after being taken, only the first selector's opponent still picks this turn
+    taken = set(context.selected_pair_index.values())
+    indexes = [i for i in range(len(context.available_pairs)) if i not in taken]
+    best_response = best_response and context.current_phase == GamePhase.TURN_SELECT_FIRST
+    rolls = rolls_remaining(context.current_turn)
+    pair_ids = tuple(context.available_pairs[i].to_index() for i in indexes)
+    hints = pair_hints(context.current_price, rolls, pair_ids, best_response)
+    return PairHintsResponse(
+        stock_price=context.current_price,
+        rolls_remaining=rolls,
+        hints=[PairHintResponse(**{**hint._asdict(), "pair_index": indexes[hint.pair_index]},
+                                pair=context.available_pairs[indexes[hint.pair_index]])
+               for hint in hints])
+
+@router.get("/games/{game_id}/dice-options", response_model=DiceOptionsResponse)
+async def get_dice_options(game_id: str, player_uuid: str):
+    """
+    Score the regular roll and every special roll the dice roller could spend a seven card on, by
+    expected final P&L and lead over the opponent's visible pairs. Keeping the card counts it towards
+    the conversions of the final review.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    context = game_manager.context
+    if context.current_phase != GamePhase.TURN_COMPLETE:
+        raise HTTPException(status_code=409, detail="Dice are not being rolled")
+    if context.dice_roller.uuid != player_uuid:
+        raise HTTPException(status_code=409, detail="Only the dice roller can roll the dice")
+
+    player = context.get_player(player_uuid)
+    return DiceOptionsResponse(
+        stock_price=context.current_price,
+        rolls_remaining=rolls_remaining(context.current_turn),
+        options=[DiceOptionResponse(**option._asdict()) for option in context.dice_options(player.player_id)])
+
+@router.get("/games/{game_id}/deck", response_model=DeckOddsResponse)
+async def get_deck_odds(game_id: str, player_uuid: str):
+    """
+    Exact odds of the next turn's pairs and their breakevens, from the cards the player has seen.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    context = game_manager.context
+    if context.current_phase in (GamePhase.LOBBY, GamePhase.GAME_START):
+        raise HTTPException(status_code=409, detail="No cards dealt yet")
+
+    odds = context.deck_odds(context.get_player(player_uuid).player_id)
+    return DeckOddsResponse(
+        small_cards=odds.small_cards,
+        big_cards=odds.big_cards,
+        draws=odds.draws,
+        pair_probability=odds.pair_probability,
+        breakevens=[BreakevenOddsResponse(**breakeven._asdict()) for breakeven in odds.breakevens])
+
+# analysis requests, the solver itself is only imported by the first one
+ANALYSIS_DEPTH = 6
+MAX_ANALYSIS_DEPTH = 3 * TURNS  # three plies per turn
+ANALYSIS_TIME_BUDGET = 1.0  # seconds
+MAX_ANALYSIS_TIME_BUDGET = 10.0
+
+@router.get("/games/{game_id}/analysis", response_model=AnalysisResponse)
+async def get_analysis(
+    game_id: str,
+    player_uuid: str,
+    depth: int = Query(ANALYSIS_DEPTH, ge=1, le=MAX_ANALYSIS_DEPTH),
+    time_budget: float = Query(ANALYSIS_TIME_BUDGET, gt=0, le=MAX_ANALYSIS_TIME_BUDGET)
+):
+    """
+    Search the rest of the game from the player's point of view, up to `depth` plies (a pick or a roll)
+    or `time_budget` seconds, and rank the moves of the player to act by the player's expected final lead.
+    In the final review, returns the player's best conversions instead.
+    """
+    from solver import analyse, root_state
+    game_manager = get_player_game(game_id, player_uuid)
+    context = game_manager.context
+    player = context.get_player(player_uuid)
+    try:
+        state = root_state(context, player.player_id)
+    except ValueError:
+        raise HTTPException(status_code=409, detail="Nothing to analyse in this phase")
+    pair_ids = [pair.to_index() for pair in context.available_pairs]
+    # the search runs in the bots' process pool, so it neither holds the worker's GIL nor shares a table
+    analysis = await asyncio.get_running_loop().run_in_executor(
+        bot_manager.pool(), analyse, state, depth, time_budget, player.player_id)
+    sign = 1 if player.player_id == 0 else -1
+    return AnalysisResponse(
+        current_phase=state.phase,
+        to_move=state.mover() if state.phase != GamePhase.FINAL_REVIEW else None,
+        expected_lead=sign * analysis.value,
+        moves=[AnalysisMove(pair_index=pair_ids.index(move.pair_id) if move.pair_id is not None else None,
+                            pair=CardPair.from_index(move.pair_id) if move.pair_id is not None else None,
+                            collection=move.collection, expected_lead=sign * move.value)
+               for move in analysis.moves],
+        conversions=list(analysis.conversions),
+        depth=analysis.depth,
+        nodes=analysis.nodes,
+        table_hit_rate=analysis.table_hits / analysis.table_probes if analysis.table_probes else 0.0,
+        elapsed=analysis.elapsed)
+
+@router.get("/games/{game_id}/policy", response_model=PolicyResponse)
+async def get_policy(game_id: str, player_uuid: str):
+    """
+    Look up the precomputed best action of the player to act in the server's policy table.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    table = policy_table()
+    if table is None:
+        raise HTTPException(status_code=503, detail="No policy table loaded")
+    context = game_manager.context
+    if context.get_current_player() is None or context.get_current_player().uuid != player_uuid:
+        raise HTTPException(status_code=409, detail="Not the player's move")
+
+    entry = table.lookup(context, context.get_player(player_uuid).player_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No policy for this state")
+    return PolicyResponse(current_phase=entry.phase, pick_red=entry.pick_red, collection=entry.collection,
+                          expected_lead=entry.value, margin=entry.margin)
+
+@router.get("/games/{game_id}/poll", response_model=PollResponse)
+async def poll_notifications(
+    game_id: str,
+    player_uuid: str,
+    since: int = 0,
+    timeout: float = Query(POLL_TIMEOUT, ge=0, le=60)
+):
+    """
+    Long-poll for the notifications a WebSocket would have received after sequence number `since`.
+    Returns as soon as there is one, or with no messages after `timeout` seconds.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    feed = notification_feed.get(game_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    with game_manager.hold():
+        while True:
+            messages, missed = feed.since(since, player_uuid)
+            remaining = deadline - loop.time()
+            if messages or missed or feed.closed or remaining <= 0 or \
+                    not await feed.wait(max(since, feed.seq), remaining):
+                break
+    return PollResponse(
+        seq=feed.seq,
+        missed=missed,
+        messages=[FeedMessage(seq=m.seq, type=m.type, content=m.content) for m in messages]
+    )
+
+@router.get("/games/{game_id}/events")
+async def stream_notifications(
+    game_id: str,
+    player_uuid: str,
+    last_event_id: Optional[int] = Header(default=None)
+) -> StreamingResponse:
+    """
+    Stream notifications as Server-Sent Events. The event id is the sequence number,
+    browsers resume with Last-Event-ID after reconnecting, and get a `resync` event when the
+    notifications since that id are gone. The stream ends when the game leaves this worker,
+    e.g. when it is migrated.
+    """
+    game_manager = get_player_game(game_id, player_uuid)
+    feed = notification_feed.get(game_id)
+
+    async def events():
+        with game_manager.hold():
+            seq = last_event_id if last_event_id is not None else feed.seq
+            while not feed.closed:
+                messages, missed = feed.since(seq, player_uuid)
+                seq = feed.seq
+                if missed:
+                    # the last event id is gone, e.g. the game moved since: the client fetches the board again
+                    yield f"id: {seq}\nevent: resync\ndata: {seq}\n\n"
+                else:
+                    for message in messages:
+                        data = "".join(f"data: {line}\n" for line in message.content.split("\n"))
+                        yield f"id: {message.seq}\nevent: {message.type}\n{data}\n"
+                if not await feed.wait(seq, SSE_KEEPALIVE):
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/games/{game_id}/actions:batch", response_model=BatchActionResponse)
+async def take_actions(game_id: str, request: BatchActionRequest):
+    """
+    Apply an ordered list of actions atomically.
+    Intermediate notifications are suppressed, each player receives one final board.
+    """
+    game_manager = session_registry.get_game(game_id)
+    if game_manager is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    for action in request.actions:
+        if action.action == GameAction.JOIN_GAME:
+            raise HTTPException(status_code=400, detail="Players join through /games/join")
+        if game_manager.context.get_player(action.player_uuid) is None:
+            raise HTTPException(status_code=403, detail="Player not part of this game")
+
+    try:
+        await game_manager.take_actions([action.model_dump() for action in request.actions])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return BatchActionResponse(
+        status="success",
+        game_id=game_id,
+        applied=len(request.actions),
+        current_phase=game_manager.context.current_phase
+    )
+
 @ws_router.websocket("/games/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -230,14 +531,13 @@ async def websocket_endpoint(
             print(f"Error in WebSocket connection: {str(e)}")
             await websocket_manager.disconnect(websocket, game_id, player_uuid)
 
-    # Check if game exists
-    if game_id not in game_sessions:
-        await websocket.close(code=4004, reason="Game not found")
-        return
-
-    # Check if player is part of the game
-    if game_id not in game_players or player_uuid not in game_players[game_id]:
-        await websocket.close(code=4003, reason="Player not part of this game")
+    # Check that the game exists and the player is part of it
+    game_manager = session_registry.resolve(player_uuid)
+    if game_manager is None or game_manager.game_id != game_id:
+        if session_registry.get_game(game_id) is None:
+            await websocket.close(code=4004, reason="Game not found")
+        else:
+            await websocket.close(code=4003, reason="Player not part of this game")
         return
     # Register the connection with the WebSocket manager
     await websocket_manager.connect(websocket, game_id, player_uuid)
@@ -245,6 +545,241 @@ async def websocket_endpoint(
 
 
 
+# admin queries over the session registry
+@router.get("/games/phases", response_model=Dict[str, int])
+async def get_phase_counts():
+    """
+    Get the number of games in each phase.
+    """
+    return session_registry.phase_counts()
+
+@router.get("/games/phases/{phase}", response_model=List[str])
+async def get_games_in_phase(phase: GamePhase):
+    """
+    Get the ids of all games in a phase.
+    """
+    return session_registry.games_in_phase(phase)
+
+@router.get("/games/stats", response_model=GameStatsResponse)
+async def get_game_stats():
+    """
+    Get aggregate statistics over all finished games.
+    """
+    return game_stats.summary()
+
+
+# player profiles and the leaderboard
+def player_rating(profile_id: str) -> PlayerRating:
+    profile = player_ratings.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlayerRating(rank=player_ratings.rank(profile), **profile._asdict())
+
+def leaderboard_entries(ranks) -> List[LeaderboardEntry]:
+    entries = []
+    for rank, profile_id in ranks:
+        profile = player_ratings.get(profile_id)
+        entries.append(LeaderboardEntry(rank=rank, profile_id=profile_id, name=profile.name, rating=profile.rating))
+    return entries
+
+@router.post("/players", response_model=PlayerRating)
+async def create_profile(request: CreateProfileRequest):
+    """
+    Create a profile; pass its id when joining games to play rated games.
+    """
+    return player_rating(player_ratings.create(request.name).profile_id)
+
+@router.get("/players/{profile_id}", response_model=PlayerRating)
+async def get_profile(profile_id: str):
+    """
+    Get a player's rating and rank.
+    """
+    return player_rating(profile_id)
+
+@router.get("/leaderboard", response_model=LeaderboardPage)
+async def get_leaderboard(offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    """
+    Get a page of the leaderboard, best rating first.
+    """
+    leaderboard = player_ratings.leaderboard
+    return LeaderboardPage(total=len(leaderboard), entries=leaderboard_entries(leaderboard.page(offset, limit)))
+
+@router.get("/leaderboard/around/{profile_id}", response_model=LeaderboardPage)
+async def get_leaderboard_around(profile_id: str, radius: int = Query(5, ge=0, le=250)):
+    """
+    Get the leaderboard entries around a player.
+    """
+    profile = player_ratings.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    leaderboard = player_ratings.leaderboard
+    return LeaderboardPage(total=len(leaderboard), entries=leaderboard_entries(leaderboard.around(profile, radius)))
+
+
+# rating-aware matchmaking, an alternative to /games/join
+MATCH_WAIT_TIMEOUT = 25  # longest wait for a match in one request, in seconds
+
+def match_ticket(ticket) -> MatchTicket:
+    return MatchTicket(ticket_id=ticket.ticket_id, status="matched" if ticket.match else "waiting", match=ticket.match)
+
+@router.post("/matchmaking/queue", response_model=MatchTicket)
+async def enqueue_player(request: JoinGameRequest):
+    """
+    Wait for an opponent with a similar rating. Players are paired on the matchmaker's periodic tick.
+    """
+    rating = INITIAL_RATING
+    if request.profile_id is not None:
+        try:
+            profile = await profile_directory.get(request.profile_id)
+        except ProfilesUnavailable:
+            raise HTTPException(status_code=503, detail="Profiles are unavailable")
+        rating = profile.rating if profile else INITIAL_RATING
+    return match_ticket(matchmaker.enqueue(request.player_name, request.profile_id, rating))
+
+@router.get("/matchmaking/queue/{ticket_id}", response_model=MatchTicket)
+async def get_match(ticket_id: str, wait: float = Query(0, ge=0, le=MATCH_WAIT_TIMEOUT)):
+    """
+    Get a ticket's match, waiting up to `wait` seconds for it. A match is handed out once.
+    """
+    ticket = matchmaker.tickets.get(ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    if ticket.match is None and wait:
+        try:
+            await asyncio.wait_for(ticket.matched.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
+    return match_ticket(matchmaker.collect(ticket_id))
+
+@router.delete("/matchmaking/queue/{ticket_id}")
+async def leave_queue(ticket_id: str) -> None:
+    """
+    Leave the queue.
+    """
+    if not matchmaker.cancel(ticket_id):
+        raise HTTPException(status_code=409, detail="Ticket is not waiting")
+
+@router.get("/matchmaking/stats", response_model=MatchmakingStats)
+async def get_matchmaking_stats():
+    """
+    Get the queue size and recent queue waits.
+    """
+    return matchmaker.stats()
+
+
+# game migration between sharded workers, called by the gateway when rebalancing
+@internal_router.post("/games/{game_id}/export")
+async def export_game(game_id: str) -> dict:
+    """
+    Remove a game from this worker and return its state.
+    """
+    game_manager = session_registry.get_game(game_id)
+    if game_manager is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    data = game_manager.dump()
+    data["bots"] = bot_manager.dump(game_manager)
+    # sockets reconnect through the gateway to the new owner, pollers resume there
+    await game_manager.close(code=4010, reason="Game moved")
+    return data
+
+@internal_router.post("/games/import")
+async def import_game(data: dict) -> GameResponse:
+    """
+    Adopt a game exported by another worker.
+    """
+    game_id = data.get("game_id")
+    if not isinstance(game_id, str) or session_registry.get_game(game_id) is not None:
+        raise HTTPException(status_code=409, detail="Game already on this worker")
+    game_manager = game_pool.acquire(game_id)
+    try:
+        game_manager.load(data)
+        bots = [[player_uuid, Difficulty(difficulty), GamePhase(done_in) if done_in else None]
+                for player_uuid, difficulty, done_in in data.get("bots", [])]
+    except (KeyError, TypeError, ValueError) as e:
+        game_pool.release(game_manager)
+        raise HTTPException(status_code=400, detail=str(e))
+    session_registry.register(game_manager)
+    for player in game_manager.context.players:
+        session_registry.add_player(game_manager, player.uuid)
+    for player_uuid, difficulty, done_in in bots:
+        bot_manager.start(game_manager, player_uuid, difficulty, done_in)
+    if game_manager.context.current_phase == GamePhase.GAME_END:
+        game_manager.schedule_expiry()
+    return GameResponse(status="success", game_id=game_manager.game_id, player_uuid="")
+
+@internal_router.get("/games", response_model=List[str])
+async def list_games() -> List[str]:
+    """
+    Get the ids of every game on this worker, for the gateway to find the games a rebalance moves.
+    """
+    return list(session_registry.games)
+
+@internal_router.put("/ring")
+async def set_ring(workers: List[int] = Body(..., embed=True)) -> None:
+    """
+    Switch to the gateway's new set of workers, games created here from now on hash onto this worker in it.
+    """
+    if shard_config.worker_id is not None and shard_config.worker_id not in workers:
+        raise HTTPException(status_code=400, detail="Ring without this worker")
+    set_workers(workers)
+
+
+# player profiles, kept by a single worker of the cluster (see profiles.py)
+@internal_router.get("/profiles/{profile_id}")
+async def get_profile_record(profile_id: str) -> dict:
+    """
+    Get a profile for a worker rating its player.
+    """
+    profile = await profile_directory.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile._asdict()
+
+@internal_router.put("/profiles/{profile_id}")
+async def ensure_profile(profile_id: str, name: str = Body(..., embed=True)) -> dict:
+    """
+    Get a profile, creating it for a player joining a game on another worker.
+    """
+    return (await profile_directory.get_or_create(profile_id, name))._asdict()
+
+@internal_router.post("/profiles/rate")
+async def rate_profiles(profile_ids: List[Optional[str]] = Body(..., min_length=2, max_length=2),
+                        score: float = Body(..., ge=0.0, le=1.0)) -> None:
+    """
+    Rate a game finished on another worker, `score` being the first player's.
+    """
+    await profile_directory.rate(tuple(profile_ids), score)
+
+@internal_router.post("/profiles/import")
+async def import_profiles(profiles: List[list] = Body(...)) -> None:
+    """
+    Take over every profile from the previous owner.
+    """
+    try:
+        restored = [Profile(*profile) for profile in profiles]
+    except TypeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    profile_directory.restore(restored)
+
+@internal_router.post("/profiles/handoff")
+async def hand_off_profiles(owner: int = Body(..., embed=True)) -> None:
+    """
+    Send every profile to the new home worker of a rebalance.
+    """
+    try:
+        await profile_directory.handoff(owner)
+    except ProfilesUnavailable as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+@internal_router.put("/profiles/owner")
+async def set_profile_owner(owner: int = Body(..., embed=True)) -> None:
+    """
+    Send ratings to the worker the profiles were handed over to.
+    """
+    profile_directory.owner_id = owner
+
+
 # an endpoint to ask server to ping the client
 @router.post("/games/ping")
 async def ping(game_id: str):
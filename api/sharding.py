@@ -0,0 +1,105 @@
+"""
+Consistent hashing of game ids onto server workers.
+"""
+import bisect
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+VIRTUAL_NODES = 64  # points per worker on the ring
+
+
+def hash_key(key: str) -> int:
+    """Stable 64-bit hash of a key, identical in every process."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def socket_path(socket_dir: str, worker_id: int) -> str:
+    """Get the unix socket a worker listens on."""
+    return os.path.join(socket_dir, f"axkan-worker-{worker_id}.sock")
+
+
+class HashRing:
+    """Maps game ids to workers so that adding or removing a worker only moves ~1/n of the games."""
+
+    def __init__(self, workers: Iterable[int], virtual_nodes: int = VIRTUAL_NODES):
+        self.workers: List[int] = sorted(set(workers))
+        self.virtual_nodes = virtual_nodes
+        points = sorted(
+            (hash_key(f"worker-{worker_id}#{i}"), worker_id)
+            for worker_id in self.workers
+            for i in range(virtual_nodes)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [worker_id for _, worker_id in points]
+
+    def lookup(self, game_id: str) -> int:
+        """Get the worker owning a game."""
+        if not self._points:
+            raise ValueError("Hash ring has no workers")
+        index = bisect.bisect(self._points, hash_key(game_id))
+        if index == len(self._points):
+            index = 0
+        return self._owners[index]
+
+    def with_worker(self, worker_id: int) -> "HashRing":
+        return HashRing(self.workers + [worker_id], self.virtual_nodes)
+
+    def without_worker(self, worker_id: int) -> "HashRing":
+        return HashRing([w for w in self.workers if w != worker_id], self.virtual_nodes)
+
+
+@dataclass
+class ShardConfig:
+    """Sharding settings of the current process, read from the environment set by cluster.py."""
+    worker_id: Optional[int] = None
+    workers: List[int] = field(default_factory=list)
+    socket_dir: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "ShardConfig":
+        worker_id = os.getenv("AXKAN_WORKER_ID")
+        workers = os.getenv("AXKAN_WORKER_IDS")
+        return cls(
+            worker_id=int(worker_id) if worker_id is not None else None,
+            workers=[int(w) for w in workers.split(",")] if workers else [],
+            socket_dir=os.getenv("AXKAN_SOCKET_DIR"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.worker_id is not None and len(self.workers) > 0
+
+
+shard_config = ShardConfig.from_env()
+_local_ring: Optional[HashRing] = None
+_previous_ring: Optional[HashRing] = None  # the gateway may still route by it while it rebalances
+
+
+def set_workers(workers: List[int]) -> None:
+    """Switch to the ring the gateway rebalanced to, so new games are created for their new owner."""
+    global _local_ring, _previous_ring
+    if _local_ring is not None and shard_config.worker_id in _local_ring.workers:
+        _previous_ring = _local_ring
+    shard_config.workers = sorted(workers)
+    _local_ring = HashRing(shard_config.workers)
+
+
+def new_game_id() -> str:
+    """
+    Create a new game id. When running as a sharded worker, the id is drawn until it hashes onto
+    this worker, so games created locally (e.g. by matchmaking) are routed back here. After a
+    rebalance it must hash here on the previous ring too, whichever one the gateway routes by.
+    """
+    game_id = str(uuid.uuid4())
+    if not shard_config.enabled:
+        return game_id
+    global _local_ring
+    if _local_ring is None:
+        _local_ring = HashRing(shard_config.workers)
+    rings = [ring for ring in (_local_ring, _previous_ring) if ring is not None]
+    while any(ring.lookup(game_id) != shard_config.worker_id for ring in rings):
+        game_id = str(uuid.uuid4())
+    return game_id
@@ -1,11 +1,16 @@
 import json
+import logging
 from dataclasses import dataclass
-from venv import logger
 
 from fastapi import WebSocket
 from typing import Dict, List, Optional
 from asyncio import Queue
 
+from .bus import DeliveryError, MessageBus, InProcessBus, create_bus
+from .feed import notification_feed
+
+logger = logging.getLogger(__name__)
+
 @dataclass
 class WebSocketMessage:
     game_id: str
@@ -13,9 +18,11 @@ class WebSocketMessage:
     text: str
 
 class WebSocketManager:
-    def __init__(self):
+    def __init__(self, bus: Optional[MessageBus] = None):
         # Store active connections per game
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {} # game_id -> player_uuid -> WebSocket
+        self.bus = bus or InProcessBus()
+        self.bus.bind(self.deliver)
         
     async def connect(self, websocket: WebSocket, game_id: str, player_uuid: str):
         """Connect a WebSocket and store it with its game_id."""
@@ -29,6 +36,7 @@ class WebSocketManager:
 
         if game_id not in self.active_connections:
             self.active_connections[game_id] = {}
+            await self.bus.subscribe(game_id)
 
         self.active_connections[game_id][player_uuid] = websocket
         # Accept the connection
@@ -50,33 +58,51 @@ class WebSocketManager:
             ws = self.active_connections[game_id].pop(player_uuid)
             if not self.active_connections[game_id]:
                 del self.active_connections[game_id]
+                await self.bus.unsubscribe(game_id)
             try:
                 await ws.close()
             except Exception as e:
                 pass
 
+    async def close_game(self, game_id: str, code: int = 1000, reason: str = ""):
+        """Close and forget every connection of a game."""
+        connections = self.active_connections.pop(game_id, {})
+        if connections:
+            await self.bus.unsubscribe(game_id)
+        for ws in connections.values():
+            try:
+                await ws.close(code=code, reason=reason)
+            except Exception as e:
+                pass
+
     async def send(self, game_id: str, player_uuids: Optional[list[str]], message_type: str, message: str):
-        """Broadcast a message to all connections in a game."""
-        if player_uuids is None:
-            if game_id in self.active_connections:
-                for connection in self.active_connections[game_id].values():
-                    try:
-                        await connection.send_json({
-                            "type": message_type,
-                            "content": message})
-                    except:
-                        raise Exception("Error sending message")
-        else:
-            if game_id in self.active_connections:
-                for player_uuid in player_uuids:
-                    if player_uuid in self.active_connections[game_id]:
-                        connection = self.active_connections[game_id][player_uuid]
-                        try:
-                            await connection.send_json({
-                                "type": message_type,
-                                "content": message})
-                        except Exception as e:
-                            raise Exception("Error sending message")
+        """Broadcast a message to all connections in a game, wherever they are connected."""
+        notification_feed.append(game_id, player_uuids, message_type, message)
+        await self.bus.publish([game_id, player_uuids, message_type, message], game_id in self.active_connections)
+
+    async def deliver(self, frames: List[list]):
+        """
+        Send frames from the message bus to the connections held by this worker. A failing connection
+        does not stop the others, DeliveryError is raised once every frame was tried.
+        """
+        failed = None
+        for game_id, player_uuids, message_type, message in frames:
+            connections = self.active_connections.get(game_id)
+            if not connections:
+                continue
+            if player_uuids is None:
+                targets = list(connections.values())
+            else:
+                targets = [connections[player_uuid] for player_uuid in player_uuids if player_uuid in connections]
+            for connection in targets:
+                try:
+                    await connection.send_json({
+                        "type": message_type,
+                        "content": message})
+                except Exception as e:
+                    failed = e
+        if failed is not None:
+            raise DeliveryError(f"Error sending message: {failed}") from failed
 
 # Global WebSocket manager instance
-websocket_manager = WebSocketManager()
+websocket_manager = WebSocketManager(create_bus())
@@ -2,13 +2,12 @@ import pytest
 from fastapi.testclient import TestClient
 from api import app
 from api.models import GameResponse
-from api.routes import game_sessions, game_players
+from api.registry import session_registry
 
 @pytest.fixture(autouse=True)
 def clear_game_state():
     """Clear game state before each test"""
-    game_sessions.clear()
-    game_players.clear()
+    session_registry.clear()
     yield
 
 client = TestClient(app)
@@ -0,0 +1,125 @@
+"""
+Append-only archive of finished games as fixed-width NumPy records, scanned through a memory map.
+
+    records = open_archive("games.axa")
+    win_rate(records, records["prices"][:, 1] >= 15)   # win rates when the price after turn 1 is >= 15
+
+Every field is a column of the structured array, so a scan only builds NumPy arrays and never one
+Python object per game. Set AXKAN_ARCHIVE_PATH to archive the games a server finishes.
+"""
+import os
+from typing import Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from game_record import GameRecorder, PAIRS_PER_TURN, TURNS
+
+if TYPE_CHECKING:
+    from game_context import GameResult
+
+MAGIC = b"AXKANGA1"
+HEADER_SIZE = 16  # magic, record size (uint32), reserved
+NO_PAIR = 0xFFFF
+MAX_DICE = 3
+ROLLS = TURNS + 1  # the initial roll and one per turn
+
+RECORD_DTYPE = np.dtype([
+    ("seed", "<u8"),
+    ("prices", "i1", (ROLLS,)),  # [0] initial price, [t] price after the roll ending turn t
+    ("dice", "i1", (ROLLS, MAX_DICE)),  # signed die values, 0 for unused dice
+    ("dice_extra", "i1", (ROLLS,)),
+    ("collection", "u1", (ROLLS,)),  # DiceCollectionType code, see game_record.COLLECTION_CODES
+    ("available", "<u2", (TURNS, PAIRS_PER_TURN)),  # pair ids offered each turn
+    ("selected", "<u2", (2, TURNS)),  # pair ids picked by each player id, in turn order
+    ("hidden", "<u2", (2,)),
+    ("sevens", "u1", (2, 2)),  # seven card ids dealt to each player id
+    ("conversions", "u1", (2,)),  # bitmask of converted pairs, bit 7 for the hidden pair
+    ("winner", "i1"),  # player id, -1 for a draw
+    ("pnl", "<i2", (2,)),
+    ("cost", "<i2", (2,)),
+    ("value", "<i2", (2,)),
+])
+
+
+def pack_game(recorder: GameRecorder, result: "GameResult") -> np.ndarray:
+    """Pack a finished game into one archive record."""
+    record = np.zeros((), dtype=RECORD_DTYPE)
+    record["seed"] = recorder.seed or 0
+    record["available"] = NO_PAIR
+    record["selected"] = NO_PAIR
+    record["hidden"] = NO_PAIR
+    for index, (collection, dice, extra, price) in enumerate(recorder.rolls[:ROLLS]):
+        record["collection"][index] = collection
+        record["dice"][index, :len(dice)] = dice
+        record["dice_extra"][index] = extra
+        record["prices"][index] = price
+    for turn, pairs in enumerate(recorder.available[:TURNS]):
+        record["available"][turn, :len(pairs)] = pairs
+    for player_id in (0, 1):
+        picks = recorder.selected[player_id][:TURNS]
+        record["selected"][player_id, :len(picks)] = picks
+        if player_id in recorder.hidden:
+            record["hidden"][player_id] = recorder.hidden[player_id]
+        record["sevens"][player_id, :len(recorder.sevens[player_id])] = recorder.sevens[player_id]
+        record["conversions"][player_id] = recorder.conversions[player_id]
+    record["winner"] = result.winner
+    for player_id, view in enumerate((result.player_1, result.player_2)):
+        record["pnl"][player_id] = view.pnl
+        record["cost"][player_id] = view.cost
+        record["value"][player_id] = view.value
+    return record
+
+
+class GameArchive:
+    """Appends records to an archive file, creating it with a header when needed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._prepare()
+
+    def _prepare(self) -> None:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, "wb") as f:
+                f.write(_header())
+            return
+        _check_header(self.path)
+        # drop a record cut short by a crash, so appends stay aligned
+        size = os.path.getsize(self.path) - HEADER_SIZE
+        if size % RECORD_DTYPE.itemsize:
+            with open(self.path, "r+b") as f:
+                f.truncate(HEADER_SIZE + size - size % RECORD_DTYPE.itemsize)
+
+    def append(self, record: np.ndarray) -> None:
+        with open(self.path, "ab") as f:
+            f.write(record.tobytes())
+
+
+def open_archive(path: str) -> np.ndarray:
+    """Memory-map an archive read-only. Pages are only read when a scan touches them."""
+    _check_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def win_rate(records: np.ndarray, where: Optional[np.ndarray] = None) -> Tuple[float, float, float]:
+    """Win rates of player id 0 and 1 and the draw rate, over the games selected by a boolean mask."""
+    winners = records["winner"] if where is None else records["winner"][where]
+    if len(winners) == 0:
+        return 0.0, 0.0, 0.0
+    counts = np.bincount(winners.astype(np.int64) + 1, minlength=3)  # draw, player 0, player 1
+    return counts[1] / len(winners), counts[2] / len(winners), counts[0] / len(winners)
+
+
+def _header() -> bytes:
+    return MAGIC + np.array(RECORD_DTYPE.itemsize, dtype="<u4").tobytes() + bytes(HEADER_SIZE - len(MAGIC) - 4)
+
+
+def _check_header(path: str) -> None:
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a game archive")
+    if np.frombuffer(header[len(MAGIC):len(MAGIC) + 4], dtype="<u4")[0] != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} was written with a different record layout")
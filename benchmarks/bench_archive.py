@@ -0,0 +1,69 @@
+"""
+Scan speed of the memory-mapped game archive.
+
+    python -m benchmarks.bench_archive --games 2000000
+
+Plays a few hundred real games, repeats their records up to --games in a temporary archive and times
+opening it plus "win rate when the price after turn 1 is >= 15".
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from archive import GameArchive, open_archive, pack_game, win_rate
+from enums import GamePhase
+from game_context import GameContext
+from player import Player
+
+
+def play(seed: int) -> np.ndarray:
+    context = GameContext()
+    context.add_player(Player(uuid="a", name="A"))
+    context.add_player(Player(uuid="b", name="B"))
+    context.initialize_game(seed)
+    context.roll_dice()
+    while context.current_phase != GamePhase.FINAL_REVIEW:
+        context.start_turn()
+        context.select_pair(context.available_pairs[context.rng.randrange(3)])
+        context.select_pair(context.available_pairs[context.rng.randrange(2)])
+        context.roll_dice()
+    context.start_review()
+    return pack_game(context.recorder, context.calculate_final_results())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2_000_000)
+    parser.add_argument("--distinct", type=int, default=500, help="real games played and repeated")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):  # selections are printed
+        sample = np.stack([play(seed) for seed in range(args.distinct)])
+    records = np.resize(sample, args.games)
+    records["seed"] = np.arange(args.games)
+
+    with tempfile.TemporaryDirectory(prefix="axkan-archive-") as directory:
+        path = os.path.join(directory, "games.axa")
+        GameArchive(path)
+        start = time.perf_counter()
+        with open(path, "ab") as f:
+            f.write(records.tobytes())
+        written = time.perf_counter() - start
+        size = os.path.getsize(path) / 2**20
+        print(f"games={args.games}  record={records.itemsize} B  archive={size:.0f} MiB  write={written:.2f}s")
+
+        start = time.perf_counter()
+        archive = open_archive(path)
+        rates = win_rate(archive, archive["prices"][:, 1] >= 15)
+        elapsed = time.perf_counter() - start
+        print(f"win rate when turn-1 price >= 15: p0={rates[0]:.3f} p1={rates[1]:.3f} draw={rates[2]:.3f}")
+        print(f"scan={elapsed:.2f}s  ({args.games / elapsed / 1e6:.1f}M games/s)")
+
+
+if __name__ == "__main__":
+    main()
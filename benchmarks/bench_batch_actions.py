@@ -0,0 +1,88 @@
+"""
+Full-game throughput through /games/{id}/actions:batch versus one request per action.
+
+    python -m benchmarks.bench_batch_actions --games 200
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+import api
+from api import app
+from api.registry import session_registry
+
+API_KEY = "bench"
+
+
+def turn_actions(p1, p2):
+    actions = [{"player_uuid": p1, "action": "roll_dice"}]
+    for turn in range(1, 8):
+        first, second = (p1, p2) if turn % 2 == 1 else (p2, p1)
+        actions += [
+            {"player_uuid": first, "action": "select_pair", "pair_index": 0},
+            {"player_uuid": second, "action": "select_pair", "pair_index": 1},
+            {"player_uuid": second, "action": "roll_dice"},
+        ]
+    return actions + [{"player_uuid": p1, "action": "end_review"}, {"player_uuid": p2, "action": "end_review"}]
+
+
+ROUTES = {
+    "ready": "ready",
+    "roll_dice": "roll-dice",
+    "select_pair": "select-pair",
+    "end_review": "end-review",
+}
+
+
+def start_game(client):
+    a = client.post("/api/v1/games/join", json={"player_name": "A"}).json()
+    b = client.post("/api/v1/games/join", json={"player_name": "B"}).json()
+    return a["game_id"], a["player_uuid"], b["player_uuid"]
+
+
+def seats(game_id):
+    context = session_registry.get_game(game_id).context
+    return context.player_1.uuid, context.player_2.uuid
+
+
+def play_batched(client):
+    game_id, a, b = start_game(client)
+    client.post(f"/api/v1/games/{game_id}/actions:batch", json={"actions": [
+        {"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}]})
+    response = client.post(f"/api/v1/games/{game_id}/actions:batch", json={"actions": turn_actions(*seats(game_id))})
+    assert response.json()["current_phase"] == "game_end"
+
+
+def play_single(client):
+    game_id, a, b = start_game(client)
+    client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": a})
+    client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": b})
+    for action in turn_actions(*seats(game_id)):
+        params = {"game_id": game_id, **{k: v for k, v in action.items() if k != "action"}}
+        client.post(f"/api/v1/games/{ROUTES[action['action']]}", params=params)
+
+
+def measure(play, client, games):
+    session_registry.clear()
+    start = time.perf_counter()
+    for _ in range(games):
+        play(client)
+    return games / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=200)
+    args = parser.parse_args()
+
+    api.api_key_internal = API_KEY
+    client = TestClient(app, headers={api.API_KEY_NAME: API_KEY})
+    single = measure(play_single, client, args.games)
+    batched = measure(play_batched, client, args.games)
+    print(f"per-action requests: {single:8.1f} games/s")
+    print(f"batched requests:    {batched:8.1f} games/s  ({batched / single:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
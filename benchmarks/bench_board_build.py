@@ -0,0 +1,57 @@
+"""
+Board build + JSON dump time with strict validation versus trusted construction.
+
+    python -m benchmarks.bench_board_build --iterations 5000
+"""
+import argparse
+import time
+
+import validation
+from enums import GamePhase
+from game_context import GameContext
+from player import Player
+
+
+def mid_game_context() -> GameContext:
+    context = GameContext()
+    context.add_player(Player(uuid="a", name="A"))
+    context.add_player(Player(uuid="b", name="B"))
+    context.initialize_game()
+    context.set_initial_price(4)
+    for _ in range(4):
+        context.current_phase = GamePhase.TURN_START
+        context.start_turn()
+        context.select_pair(context.available_pairs[0])
+        context.select_pair(context.available_pairs[1])
+        context.current_turn += 1
+    context.current_phase = GamePhase.TURN_START
+    context.start_turn()
+    return context
+
+
+def measure(context: GameContext, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        context.create_board(0).model_dump_json()
+        context.create_board(1).model_dump_json()
+    return (time.perf_counter() - start) / (2 * iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    context = mid_game_context()
+    results = {}
+    for strict in (True, False):
+        validation.set_strict_validation(strict)
+        measure(context, 100)
+        results[strict] = measure(context, args.iterations)
+        label = "strict" if strict else "trusted"
+        print(f"{label:<8} {results[strict] * 1e6:8.1f} us per board")
+    print(f"speedup  {results[True] / results[False]:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Load test of the bots: latency of human games played over HTTP, alone and next to hundreds of
+bot-vs-bot games kept running in the same server process.
+
+    python -m benchmarks.bench_bots --bot-games 300 --difficulty medium --duration 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+import httpx
+
+import api
+from api import app
+from api.bots import bot_manager
+from api.registry import session_registry
+from bot import Difficulty
+from enums import GamePhase
+from game_manager import GameManager
+
+API_KEY = "bench-key"
+
+
+def percentile(samples, q):
+    return statistics.quantiles(samples, n=100)[q - 1] * 1000 if len(samples) > 1 else 0.0
+
+
+THINK_TIME = 0.005  # seconds between a human's requests, in-process requests would otherwise never yield
+
+
+async def human_game(client, latencies):
+    """One game of two scripted humans, one request per action, timing every request."""
+    async def post(url, **params):
+        await asyncio.sleep(THINK_TIME)
+        start = time.perf_counter()
+        response = await client.post(url, params=params)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        return response
+
+    first = (await client.post("/api/v1/games/join", json={"player_name": "Human 1"})).json()
+    second = (await client.post("/api/v1/games/join", json={"player_name": "Human 2"})).json()
+    game_id = first["game_id"]
+    for player in (first, second):
+        await post("/api/v1/games/ready", game_id=game_id, player_uuid=player["player_uuid"])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    await post("/api/v1/games/roll-dice", game_id=game_id, player_uuid=p1)
+    for turn in range(1, 8):
+        first_selector, second_selector = (p1, p2) if turn % 2 == 1 else (p2, p1)
+        await post("/api/v1/games/select-pair", game_id=game_id, player_uuid=first_selector, pair_index=0)
+        await post("/api/v1/games/select-pair", game_id=game_id, player_uuid=second_selector, pair_index=1)
+        await post("/api/v1/games/roll-dice", game_id=game_id, player_uuid=second_selector)
+    for player_uuid in (p1, p2):
+        await post("/api/v1/games/end-review", game_id=game_id, player_uuid=player_uuid)
+    session_registry.remove(game_id)
+
+
+async def new_bot_game(index, difficulty):
+    game_manager = GameManager(game_id=f"bot-{index}")
+    session_registry.register(game_manager)
+    for _ in range(2):
+        await bot_manager.add(game_manager, difficulty)
+    return game_manager
+
+
+async def keep_bot_games(count, difficulty, stop, finished):
+    """Run `count` bot games, replacing each one as it ends."""
+    games = [await new_bot_game(i, difficulty) for i in range(count)]
+    created = count
+    while not stop.is_set():
+        for i, game_manager in enumerate(games):
+            if game_manager.context.current_phase == GamePhase.GAME_END:
+                session_registry.remove(game_manager.game_id)
+                finished.append(game_manager.game_id)
+                games[i] = await new_bot_game(created, difficulty)
+                created += 1
+                await asyncio.sleep(0)  # like joins arriving over the network, one at a time
+        await asyncio.sleep(0.1)
+    for game_manager in games:
+        session_registry.remove(game_manager.game_id)
+
+
+async def loop_lag(stop, lags, interval=0.01):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def measure(client, duration, bot_games, difficulty):
+    latencies, lags, finished = [], [], []
+    stop = asyncio.Event()
+    background = []
+    if bot_games:
+        background.append(asyncio.create_task(keep_bot_games(bot_games, difficulty, stop, finished)))
+        await asyncio.sleep(2)  # let every bot game get going, and the pool start its workers
+    background.append(asyncio.create_task(loop_lag(stop, lags)))
+    moves_before = sum(bot.moves for bot in bot_manager.bots.values())
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        await human_game(client, latencies)
+    elapsed = time.perf_counter() - start
+    moves = sum(bot.moves for bot in bot_manager.bots.values()) - moves_before
+    timeouts = sum(bot.timeouts for bot in bot_manager.bots.values())
+    stop.set()
+    await asyncio.gather(*background)
+    label = f"{bot_games} {difficulty.value} bot games" if bot_games else "no bots"
+    print(f"{label:>24}: request p50 {percentile(latencies, 50):6.2f} ms  p99 {percentile(latencies, 99):6.2f} ms"
+          f"  loop lag p99 {percentile(lags, 99):6.2f} ms  bot games finished {len(finished)}"
+          f"  bot moves/s ~{max(moves, 0) / elapsed:.0f}  timeouts {timeouts}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bot-games", type=int, default=300)
+    parser.add_argument("--difficulty", choices=[d.value for d in Difficulty], default=Difficulty.MEDIUM.value)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of human games per measurement")
+    args = parser.parse_args()
+
+    api.api_key_internal = API_KEY
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={api.API_KEY_NAME: API_KEY}) as client:
+        with contextlib.redirect_stdout(io.StringIO()) as quiet:  # select_pair prints every pick
+            await measure(client, args.duration, 0, None)
+            await measure(client, args.duration, args.bot_games, Difficulty(args.difficulty))
+            await bot_manager.shutdown()
+        print("\n".join(line for line in quiet.getvalue().splitlines() if ": request p50" in line))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
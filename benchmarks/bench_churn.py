@@ -0,0 +1,101 @@
+"""
+Sustained game churn through GameManager: games created, played to the end, rematched once and
+dropped, with fresh managers against managers recycled by the game pool. Reports the garbage
+collections and pauses per game.
+
+    python -m benchmarks.bench_churn --games 500
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import statistics
+import time
+import tracemalloc
+
+import api  # noqa: F401, imported first for the game manager's api dependencies
+from enums import GameAction, GamePhase
+from game_manager import GameManager, GamePool
+
+
+class GcPauses:
+    """Times every garbage collection through gc.callbacks."""
+
+    def __init__(self):
+        self.pauses = []
+        self.start = 0.0
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self.start = time.perf_counter()
+        else:
+            self.pauses.append(time.perf_counter() - self.start)
+
+    def __enter__(self):
+        gc.callbacks.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        gc.callbacks.remove(self)
+
+
+async def play(game_manager):
+    """Both players join, play a game with the first pairs on offer and rematch once."""
+    for name in ("A", "B"):
+        await game_manager.take_action(name, GameAction.JOIN_GAME, player_name=name)
+    for _ in range(2):
+        for name in ("A", "B"):
+            await game_manager.take_action(name, GameAction.READY)
+        context = game_manager.context
+        p1, p2 = context.player_1.uuid, context.player_2.uuid
+        await game_manager.take_action(p1, GameAction.ROLL_DICE)
+        while context.current_phase != GamePhase.FINAL_REVIEW:
+            first, second = context.first_selector.uuid, context.second_selector.uuid
+            await game_manager.take_action(first, GameAction.SELECT_PAIR, pair_index=0)
+            await game_manager.take_action(second, GameAction.SELECT_PAIR, pair_index=1)
+            await game_manager.take_action(second, GameAction.ROLL_DICE)
+        for player_uuid in (p1, p2):
+            await game_manager.take_action(player_uuid, GameAction.END_REVIEW)
+
+
+async def churn(games, pool):
+    for index in range(games):
+        game_manager = pool.acquire(str(index)) if pool else GameManager(str(index))
+        await play(game_manager)
+        if pool:
+            pool.release(game_manager)
+
+
+def measure(label, games, pool):
+    gc.collect()
+    counts = [stats["collections"] for stats in gc.get_stats()]
+    with GcPauses() as pauses:
+        start = time.perf_counter()
+        asyncio.run(churn(games, pool))
+        elapsed = time.perf_counter() - start
+    collections = [stats["collections"] - count for stats, count in zip(gc.get_stats(), counts)]
+    tracemalloc.start()
+    asyncio.run(churn(20, pool))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    per_game = ", ".join(f"gen{generation} {count / games:.2f}" for generation, count in enumerate(collections))
+    pause_total = sum(pauses.pauses) * 1000
+    pause_max = max(pauses.pauses, default=0.0) * 1000
+    pause_p99 = statistics.quantiles(pauses.pauses, n=100)[98] * 1000 if len(pauses.pauses) > 1 else pause_max
+    print(f"{label:>6}: {games / elapsed:6.1f} games/s  collections/game {per_game}  gc pauses {pause_total:.1f} ms"
+          f" total, p99 {pause_p99:.2f} ms, max {pause_max:.2f} ms  peak traced {peak / 1024:.0f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=500)
+    args = parser.parse_args()
+    with contextlib.redirect_stdout(io.StringIO()) as quiet:  # select_pair prints every pick
+        measure("fresh", args.games, None)
+        measure("pooled", args.games, GamePool())
+    print("\n".join(line for line in quiet.getvalue().splitlines() if "games/s" in line))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Time to first request: process start until the first /openapi.json and /games/phases responses.
+
+    python -m benchmarks.bench_cold_start --runs 5
+
+Each run starts a fresh interpreter so import and schema generation costs are paid again, once with
+the prebuilt openapi.json and once with AXKAN_PREBUILT_OPENAPI=0.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import api
+api.api_key_internal = "bench"
+from main import app
+imported = time.perf_counter()
+with TestClient(app, headers={"AXKAN": "bench"}) as client:
+    client.get("/openapi.json").raise_for_status()
+    client.get("/api/v1/games/phases").raise_for_status()
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_request": done - start}))
+"""
+
+
+def run_once(prebuilt: bool) -> dict:
+    env = dict(os.environ, AXKAN_PREBUILT_OPENAPI="1" if prebuilt else "0")
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for prebuilt in (True, False):
+        results = [run_once(prebuilt) for _ in range(args.runs)]
+        imports = statistics.median(r["import"] for r in results) * 1000
+        first = statistics.median(r["first_request"] for r in results) * 1000
+        label = "prebuilt openapi" if prebuilt else "generated openapi"
+        print(f"{label:<18}  import={imports:7.1f} ms  first request={first:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
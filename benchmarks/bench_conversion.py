@@ -0,0 +1,43 @@
+"""
+Cost of planning the final review conversions, with cold and warm caches.
+
+    python -m benchmarks.bench_conversion --plans 100000
+"""
+import argparse
+import random
+import time
+
+from card_pile import CardPile
+from conversion import best_conversions, flipped_pair_id, gain_by_price_id
+from pricing import PRICES
+
+
+def portfolios(count, rng):
+    for _ in range(count):
+        pile = CardPile(rng=rng)
+        pairs = [pile.draw_pair() for _ in range(8)]
+        yield rng.choice(PRICES), tuple(pair.to_index() for pair in pairs[:7]), pairs[7].to_index(), rng.randint(0, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plans", type=int, default=100_000)
+    args = parser.parse_args()
+    cases = list(portfolios(min(args.plans, 5000), random.Random(0)))
+
+    def run(label, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for case in cases:
+                best_conversions(*case)
+        print(f"{label}: {(time.perf_counter() - start) / (repeat * len(cases)) * 1e6:6.2f} us per plan")
+
+    for cached in (best_conversions, flipped_pair_id, gain_by_price_id):
+        cached.cache_clear()
+    run("cold caches", 1)
+    best_conversions.cache_clear()
+    run("new portfolio, pair gains cached", 1)
+    run("repeated portfolio", max(args.plans // len(cases), 1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Deck odds: cost of a new pile state against a cached one, over the seats' views of played games.
+
+    python -m benchmarks.bench_deck --games 50
+"""
+import argparse
+import random
+import time
+
+from deck import BIG_MASK, SMALL_MASK, deck_odds, odds_by_counts, seen_mask
+from game_record import PAIRS_PER_TURN, TURNS
+
+SMALL_IDS = [card_id for card_id in range(52) if SMALL_MASK >> card_id & 1]
+BIG_IDS = [card_id for card_id in range(52) if BIG_MASK >> card_id & 1]
+
+
+def views(games):
+    """Cards seen by a seat before every draw of games dealt at random: its hidden pair, then the offers."""
+    rng = random.Random(0)
+    for _ in range(games):
+        smalls, bigs = rng.sample(SMALL_IDS, len(SMALL_IDS)), rng.sample(BIG_IDS, len(BIG_IDS))
+        pairs = [s * 52 + b for s, b in zip(smalls, bigs)]
+        for turn in range(TURNS):
+            yield seen_mask(pairs[1:2 + turn * PAIRS_PER_TURN])  # pairs[0] is the opponent's hidden pair
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=50)
+    args = parser.parse_args()
+    masks = list(views(args.games))
+
+    odds_by_counts.cache_clear()
+    start = time.perf_counter()
+    for mask in masks:
+        deck_odds(mask, PAIRS_PER_TURN)
+    cold = time.perf_counter() - start
+    info = odds_by_counts.cache_info()
+    start = time.perf_counter()
+    for mask in masks:
+        deck_odds(mask, PAIRS_PER_TURN)
+    warm = time.perf_counter() - start
+    print(f"{len(masks)} views, {info.misses} pile states: first pass {cold / len(masks) * 1000:.2f} ms/view,"
+          f" cached {warm / len(masks) * 1e6:.1f} us/view")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Cost of scoring the dice collections of a roll, for new portfolios and for repeated requests.
+
+    python -m benchmarks.bench_dice_advice --positions 2000
+"""
+import argparse
+import random
+import time
+
+from card_pile import CardPile
+from dice_advice import dice_options
+from pricing import PRICES
+
+
+def positions(count, rng):
+    for _ in range(count):
+        pile = CardPile(rng=rng)
+        turn = rng.randint(1, 7)
+        pairs = [pile.draw_pair().to_index() for _ in range(2 * turn + 1)]
+        yield (rng.choice(PRICES), 8 - turn, tuple(pairs[:turn]), pairs[-1] if turn == 7 else None,
+               rng.randint(1, 2), tuple(pairs[turn:2 * turn]), rng.randint(0, 2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=2000)
+    args = parser.parse_args()
+    cases = list(positions(args.positions, random.Random(0)))
+
+    for label in ("new position", "repeated position"):
+        start = time.perf_counter()
+        for case in cases:
+            options = dice_options(*case)
+        print(f"{label}: {(time.perf_counter() - start) / len(cases) * 1e6:7.1f} us for {len(options)} options")
+
+
+if __name__ == "__main__":
+    main()
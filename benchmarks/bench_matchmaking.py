@@ -0,0 +1,60 @@
+"""
+Matchmaking tick cost and queue waits with tens of thousands of waiting players.
+
+    python -m benchmarks.bench_matchmaking --waiting 20000 --arrivals 2000 --seconds 30
+
+Simulated time: every second --arrivals players with normally distributed ratings join and one tick
+runs. Game creation is stubbed out to time the matcher itself.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from api import matchmaking
+from api.matchmaking import Matchmaker
+from api.ratings import Profile, player_ratings
+
+
+async def no_game(first, second):
+    return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--waiting", type=int, default=20000, help="players already waiting")
+    parser.add_argument("--arrivals", type=int, default=2000, help="players joining per second")
+    parser.add_argument("--seconds", type=int, default=30)
+    args = parser.parse_args()
+    matchmaking.start_game = no_game
+    rng = random.Random(0)
+
+    pool = Matchmaker()
+    count = 0
+
+    def arrive(n, now):
+        nonlocal count
+        for _ in range(n):
+            profile_id = f"p{count}"
+            count += 1
+            player_ratings.profiles[profile_id] = Profile(profile_id, profile_id, rating=rng.gauss(1500, 300))
+            pool.enqueue(profile_id, profile_id, now=now)
+
+    arrive(args.waiting, 0.0)
+    tick_times = []
+    for second in range(1, args.seconds + 1):
+        arrive(args.arrivals, float(second))
+        start = time.perf_counter()
+        asyncio.run(pool.tick(now=float(second)))
+        tick_times.append(time.perf_counter() - start)
+        for ticket_id in [t for t, ticket in pool.tickets.items() if ticket.match is not None]:
+            pool.collect(ticket_id)
+
+    tick_times.sort()
+    print(f"waiting at end={len(pool.pool)}  matches={pool.matches}")
+    print(f"tick: median={tick_times[len(tick_times) // 2] * 1000:.1f} ms  max={tick_times[-1] * 1000:.1f} ms")
+    print(f"queue wait: p50={pool.wait_percentile(50):.1f}s  p99={pool.wait_percentile(99):.1f}s")
+
+
+if __name__ == "__main__":
+    main()
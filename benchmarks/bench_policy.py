@@ -0,0 +1,51 @@
+"""
+Policy table lookups: build time, lookup latency and the memory a worker pays for the mapping.
+
+    python -m benchmarks.bench_policy --path /tmp/policy.axp --lookups 100000
+"""
+import argparse
+import os
+import random
+import time
+
+from policy import DIMS, EXPOSURE_LIMIT, PHASES, PolicyTable, build_policy_table
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/tmp/axkan-policy.axp")
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        start = time.perf_counter()
+        built = build_policy_table(args.path, args.depth)
+        print(f"built {built} entries at depth {args.depth} in {time.perf_counter() - start:.1f}s")
+    print(f"file size {os.path.getsize(args.path) / 1024:.0f} KiB")
+
+    rng = random.Random(0)
+    keys = [(rng.randint(1, DIMS[0]), rng.choice(PHASES), rng.randint(1, 20), rng.randint(0, 2), rng.randint(0, 2),
+             rng.randint(-EXPOSURE_LIMIT, EXPOSURE_LIMIT), rng.randint(-EXPOSURE_LIMIT, EXPOSURE_LIMIT))
+            for _ in range(args.lookups)]
+    before = rss_kb()
+    table = PolicyTable(args.path)
+    start = time.perf_counter()
+    for key in keys:
+        table.get(*key)
+    elapsed = time.perf_counter() - start
+    print(f"lookup: {elapsed / len(keys) * 1e6:.2f} us")
+    # resident pages of a shared file mapping are page cache, counted once however many workers map it
+    print(f"RSS growth after {len(keys)} random lookups: {rss_kb() - before} KiB")
+
+
+if __name__ == "__main__":
+    main()
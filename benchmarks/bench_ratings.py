@@ -0,0 +1,54 @@
+"""
+Cost of rating updates and leaderboard queries with a large population of rated players.
+
+    python -m benchmarks.bench_ratings --players 1000000 --games 100000
+"""
+import argparse
+import random
+import time
+
+from api.ratings import PlayerRatings, Profile, Leaderboard
+
+
+class Result:
+    def __init__(self, winner):
+        self.winner = winner
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1_000_000)
+    parser.add_argument("--games", type=int, default=100_000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    ratings = PlayerRatings()
+    ratings.profiles = {f"player-{i}": Profile(f"player-{i}", f"Player {i}", rating=rng.gauss(1500, 200))
+                        for i in range(args.players)}
+    ratings.leaderboard = Leaderboard(ratings.profiles.values())
+    print(f"players={args.players}  load={time.perf_counter() - start:.2f}s")
+
+    ids = list(ratings.profiles)
+    pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(args.games)]
+    winners = [rng.choice((0, 1, -1)) for _ in range(args.games)]
+    start = time.perf_counter()
+    for (a, b), winner in zip(pairs, winners):
+        ratings.record(Result(winner), (a, b))
+    elapsed = time.perf_counter() - start
+    print(f"game end (two rating updates): {elapsed / args.games * 1e6:6.1f} us")
+
+    start = time.perf_counter()
+    for a, _ in pairs:
+        ratings.rank(ratings.get(a))
+    elapsed = time.perf_counter() - start
+    print(f"rank lookup:                   {elapsed / args.games * 1e6:6.1f} us")
+
+    start = time.perf_counter()
+    for a, _ in pairs[:10000]:
+        ratings.leaderboard.around(ratings.get(a), 10)
+    print(f"around-me page (21 entries):   {(time.perf_counter() - start) / 10000 * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
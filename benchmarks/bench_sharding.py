@@ -0,0 +1,142 @@
+"""
+Throughput scaling of the sharded registry: full games per second with 1, 2, 4... workers.
+
+    python -m benchmarks.bench_sharding --workers 1 2 4 --clients 8 --games 40
+
+Client processes place games with the same hash ring as the gateway and talk to the owning worker's
+unix socket directly (--via-gateway sends everything through the gateway instead). Each worker owns
+its games exclusively, so throughput should grow close to linearly with workers while cores remain.
+The scaling itself is unverified: it was only measured on a single core, where 2 workers ran at 0.85x
+of 1 worker (7.6 games/s with 4 clients), as expected without spare cores.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+
+import httpx
+
+API_KEY = "bench"
+os.environ["API_KEY_INTERNAL"] = API_KEY
+
+from api.sharding import HashRing, socket_path  # noqa: E402
+from cluster import Cluster  # noqa: E402
+
+
+class GameClient:
+    def __init__(self, clients, ring: HashRing):
+        self.clients = clients
+        self.ring = ring
+
+    def client(self, game_id):
+        return self.clients[self.ring.lookup(game_id) if self.ring else 0]
+
+    async def post(self, game_id, path, **params):
+        response = await self.client(game_id).post(f"/api/v1/games/{path}", params={"game_id": game_id, **params})
+        return response.status_code == 200
+
+    async def play(self):
+        game_id = str(uuid.uuid4())
+        client = self.client(game_id)
+        a = (await client.post("/api/v1/games/join", params={"game_id": game_id}, json={"player_name": "A"})).json()
+        b = (await client.post("/api/v1/games/join", params={"game_id": game_id}, json={"player_name": "B"})).json()
+        game_id = a["game_id"]
+        a, b = a["player_uuid"], b["player_uuid"]
+        await self.post(game_id, "ready", player_uuid=a)
+        await self.post(game_id, "ready", player_uuid=b)
+        await self.post(game_id, "roll-dice", player_uuid=a)
+
+        # seats are assigned by a coin flip, find player 1 from the first selection
+        p1, p2 = (a, b) if await self.post(game_id, "select-pair", player_uuid=a, pair_index=0) else (b, a)
+        if p1 == b:
+            await self.post(game_id, "select-pair", player_uuid=p1, pair_index=0)
+        for turn in range(1, 8):
+            first, second = (p1, p2) if turn % 2 == 1 else (p2, p1)
+            if turn > 1:
+                await self.post(game_id, "select-pair", player_uuid=first, pair_index=0)
+            await self.post(game_id, "select-pair", player_uuid=second, pair_index=1)
+            await self.post(game_id, "roll-dice", player_uuid=second)
+        await self.post(game_id, "end-review", player_uuid=p1)
+        await self.post(game_id, "end-review", player_uuid=p2)
+
+
+def run_client(socket_dir, workers, games, via_gateway, gateway_url, result_queue):
+    async def main():
+        headers = {"AXKAN": API_KEY}
+        if via_gateway:
+            clients = [httpx.AsyncClient(base_url=gateway_url, headers=headers, timeout=None)]
+            ring = None
+        else:
+            clients = {w: httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=socket_path(socket_dir, w)),
+                                            base_url="http://worker", headers=headers, timeout=None)
+                       for w in workers}
+            ring = HashRing(workers)
+        game_client = GameClient(clients, ring)
+        for _ in range(games):
+            await game_client.play()
+    asyncio.run(main())
+    result_queue.put(games)
+
+
+async def measure(workers: int, clients: int, games: int, via_gateway: bool) -> float:
+    with tempfile.TemporaryDirectory(prefix="axkan-bench-") as socket_dir:
+        cluster = Cluster(socket_dir, workers)
+        await cluster.start()
+        server = None
+        gateway_url = "http://127.0.0.1:8799"
+        try:
+            if via_gateway:
+                from hypercorn.asyncio import serve
+                from hypercorn.config import Config
+                config = Config()
+                config.bind = ["127.0.0.1:8799"]
+                config.accesslog = None
+                shutdown = asyncio.Event()
+                server = asyncio.create_task(serve(cluster.gateway, config, shutdown_trigger=shutdown.wait))
+                await asyncio.sleep(0.5)
+
+            queue = multiprocessing.Queue()
+            processes = [multiprocessing.Process(
+                target=run_client,
+                args=(socket_dir, cluster.worker_ids, games, via_gateway, gateway_url, queue))
+                for _ in range(clients)]
+            start = time.perf_counter()
+            for process in processes:
+                process.start()
+            loop = asyncio.get_running_loop()
+            total = 0
+            for _ in processes:
+                total += await loop.run_in_executor(None, queue.get)
+            elapsed = time.perf_counter() - start
+            for process in processes:
+                process.join()
+            return total / elapsed
+        finally:
+            if server is not None:
+                shutdown.set()
+                await server
+            cluster.stop()
+            await cluster.broker.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--games", type=int, default=20, help="games per client")
+    parser.add_argument("--via-gateway", action="store_true")
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}")
+    baseline = None
+    for workers in args.workers:
+        throughput = asyncio.run(measure(workers, args.clients, args.games, args.via_gateway))
+        baseline = baseline or throughput
+        print(f"workers={workers:2d}  games/s={throughput:8.1f}  speedup={throughput / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
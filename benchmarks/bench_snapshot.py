@@ -0,0 +1,60 @@
+"""
+Cost of keeping a copy of a game after every action: deep copies against structurally shared snapshots.
+
+    python -m benchmarks.bench_snapshot --games 50
+"""
+import argparse
+import contextlib
+import copy
+import io
+import time
+import tracemalloc
+
+from enums import GamePhase
+from game_context import GameContext
+from player import Player
+
+
+def play(copier, games):
+    """Play seeded games, copying the context after every action. Returns the copies of the last game."""
+    for seed in range(games):
+        context = GameContext()
+        for i in range(2):
+            context.add_player(Player(uuid=str(i), name=f"Player {i}"))
+        context.initialize_game(seed=seed)
+        copies = [copier(context)]
+        context.roll_dice()
+        while context.current_phase != GamePhase.FINAL_REVIEW:
+            context.start_turn()
+            copies.append(copier(context))
+            for index in (0, 1):
+                context.select_pair(context.available_pairs[index])
+                copies.append(copier(context))
+            context.roll_dice()
+            copies.append(copier(context))
+    return copies
+
+
+def measure(label, copier, games):
+    with contextlib.redirect_stdout(io.StringIO()):  # select_pair prints every pick
+        start = time.perf_counter()
+        play(copier, games)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        copies = play(copier, 1)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    print(f"{label:>9}: {elapsed / games * 1000:7.2f} ms/game, {len(copies)} copies holding {size / 1024:7.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=50)
+    args = parser.parse_args()
+    measure("none", lambda context: None, args.games)
+    measure("deepcopy", copy.deepcopy, args.games)
+    measure("snapshot", GameContext.snapshot, args.games)
+
+
+if __name__ == "__main__":
+    main()
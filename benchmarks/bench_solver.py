@@ -0,0 +1,61 @@
+"""
+Search speed of the solver: nodes per second and transposition table hit rate by depth.
+
+    python -m benchmarks.bench_solver --games 5 --depth 6
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import api  # noqa: F401, imported first to settle the import order of the game modules
+from game_context import GameContext
+from player import Player
+from solver import Solver, TranspositionTable, root_state
+
+
+def positions(games):
+    """The first selection of every turn of games played by always taking the first pairs."""
+    for seed in range(games):
+        context = GameContext()
+        for i in range(2):
+            context.add_player(Player(uuid=str(i), name=f"Player {i}"))
+        context.initialize_game(seed=seed)
+        context.roll_dice()
+        context.start_turn()
+        while True:
+            yield root_state(context, 0)
+            context.select_pair(context.available_pairs[0])
+            context.select_pair(context.available_pairs[1])
+            context.roll_dice()
+            if context.current_phase != context.current_phase.TURN_START:
+                break
+            context.start_turn()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--table-size", type=int, default=1 << 18)
+    args = parser.parse_args()
+    with contextlib.redirect_stdout(io.StringIO()):  # select_pair prints every pick
+        states = list(positions(args.games))
+
+    for depth in range(2, args.depth + 1):
+        for label in ("cold", "warm"):
+            solver = Solver(TranspositionTable(args.table_size)) if label == "cold" else solver
+            nodes = probes = hits = 0
+            start = time.perf_counter()
+            for state in states:
+                analysis = solver.search(state, depth, time_budget=float("inf"))
+                nodes += analysis.nodes
+                probes += analysis.table_probes
+                hits += analysis.table_hits
+            elapsed = time.perf_counter() - start
+            print(f"depth {depth} {label}: {nodes / elapsed:9.0f} nodes/s  {elapsed / len(states) * 1000:8.1f} ms/search"
+                  f"  hit rate {hits / probes if probes else 0:.2f}")
+
+
+if __name__ == "__main__":
+    main()
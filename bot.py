@@ -0,0 +1,84 @@
+"""
+Move choice of the server's bots. A choice is a plain function of a SearchState, so it can run in a
+worker process away from the event loop:
+
+    easy    a random pair, regular dice
+    medium  the policy table when the worker has one mapped, else the best move one ply deep
+    hard    the solver, deepening until the move's time budget runs out
+"""
+import random
+import time
+from typing import NamedTuple, Optional, TYPE_CHECKING
+
+from card import CARD_COUNT
+from dice import DiceCollectionType
+from enums import Difficulty, GamePhase
+from solver import MAX_DEPTH, SearchState, Solver, expected_lead, pick, transposition_table
+
+if TYPE_CHECKING:
+    from policy import PolicyTable
+
+
+# seconds a bot may think per move
+MOVE_BUDGETS = {Difficulty.EASY: 0.0, Difficulty.MEDIUM: 0.1, Difficulty.HARD: 1.0}
+
+_policy_table: Optional["PolicyTable"] = None  # mapped once per worker process
+
+
+class BotMove(NamedTuple):
+    pair_id: Optional[int]  # for pair selections
+    collection: Optional[DiceCollectionType]  # for rolls
+
+
+def init_worker(policy_path: Optional[str]) -> None:
+    """Process pool initializer: map the server's policy table, if it has one."""
+    global _policy_table
+    if policy_path is not None:
+        # numpy is only imported by workers that serve a policy table
+        from policy import PolicyTable
+        _policy_table = PolicyTable(policy_path)
+
+
+def choose_move(state: SearchState, difficulty: Difficulty, time_budget: float,
+                deadline: Optional[float] = None) -> BotMove:
+    """
+    Move of the player to act in `state`, a state seen from that player's seat. The search stops at
+    `deadline`, a time.time() since it is compared across processes, and a choice that only starts
+    after it, e.g. one left queued in a busy pool, is random.
+    """
+    if deadline is not None:
+        time_budget = min(time_budget, deadline - time.time())
+    if difficulty == Difficulty.EASY or time_budget <= 0:
+        return random_move(state, random.Random())
+    if difficulty == Difficulty.MEDIUM:
+        move = policy_move(state) if _policy_table is not None else None
+        if move is not None:
+            return move
+        max_depth = 1
+    else:
+        max_depth = MAX_DEPTH
+    best = Solver(transposition_table).search(state, max_depth, time_budget).moves[0]
+    return BotMove(best.pair_id, best.collection)
+
+
+def random_move(state: SearchState, rng: random.Random) -> BotMove:
+    if state.phase == GamePhase.TURN_COMPLETE:
+        return BotMove(None, DiceCollectionType.REGULAR)
+    return BotMove(rng.choice(state.offered), None)
+
+
+def policy_move(state: SearchState) -> Optional[BotMove]:
+    """The policy table's action, the best pair one ply deep of the color it picks. None when not covered."""
+    from policy import RED_SUITS, exposure
+    mover = state.mover()
+    own = state.held[mover] + ((state.hidden[mover],) if state.hidden[mover] is not None else ())
+    entry = _policy_table.get(state.turn, state.phase, state.price, state.sevens[mover], state.sevens[1 - mover],
+                              exposure(own), exposure(state.held[1 - mover]))
+    if entry is None:
+        return None
+    if entry.collection is not None:
+        return BotMove(None, entry.collection)
+    colored = [pair_id for pair_id in state.offered
+               if ((pair_id % CARD_COUNT) // 13 in RED_SUITS) == entry.pick_red] or list(state.offered)
+    sign = 1 if mover == 0 else -1
+    return BotMove(max(colored, key=lambda pair_id: sign * expected_lead(pick(state, pair_id))), None)
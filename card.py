@@ -35,6 +35,11 @@ class CardType(Enum):
     BIG = "big"  # 8-K
     SPECIAL = "special"  # 7
 
+SUITS = list(CardSuit)
+SUIT_INDEX = {suit: index for index, suit in enumerate(SUITS)}
+CARD_COUNT = len(SUITS) * 13
+
+
 class Card(BaseModel):
     """Represents a single card in the game."""
     suit: CardSuit
@@ -77,6 +82,14 @@ class Card(BaseModel):
         else:  # black
             return max(rank_value - stock_price, 0)
     
+    def to_index(self) -> int:
+        """Compact card id in 0..51 (suit-major), used by the game archive."""
+        return SUIT_INDEX[self.suit] * 13 + self.rank.value - 1
+
+    @classmethod
+    def from_index(cls, index: int) -> 'Card':
+        return cls(suit=SUITS[index // 13], rank=CardRank(index % 13 + 1))
+
     def convert_color(self) -> 'Card':
         """Convert card color (hearts ↔ spades, diamonds ↔ clubs)."""
         new_suit = {
@@ -158,6 +171,14 @@ class CardPair(BaseModel):
         else:  # black
             return f"<={price}"
     
+    def to_index(self) -> int:
+        """Compact pair id in 0..2703, used by the game archive."""
+        return self.small_card.to_index() * CARD_COUNT + self.big_card.to_index()
+
+    @classmethod
+    def from_index(cls, index: int) -> 'CardPair':
+        return cls(small_card=Card.from_index(index // CARD_COUNT), big_card=Card.from_index(index % CARD_COUNT))
+
     def convert_big_card_color(self) -> 'CardPair':
         """Convert the color of the big card only."""
         return CardPair(
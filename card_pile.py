@@ -1,36 +1,85 @@
 """
 CardPile module for managing draw and discard piles.
 """
-from typing import List, Optional, Dict
+from functools import reduce
+from operator import xor
+from typing import Any, List, NamedTuple, Optional, Dict, Tuple
 import random
 from sortedcontainers import SortedList
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+import zobrist
 from card import Card, CardPair, CardSuit, CardRank, CardType
 
 
+# cards are never changed in place, so every pile deals the same instances instead of creating its own
+DECK = tuple(Card(suit=suit, rank=rank) for suit in CardSuit for rank in CardRank)
+SMALL_CARDS = tuple(card for card in DECK if card.card_type == CardType.SMALL)
+BIG_CARDS = tuple(card for card in DECK if card.card_type == CardType.BIG)
+SEVEN_CARDS = tuple(card for card in DECK if card.rank == CardRank.SEVEN)
+FULL_PILE_KEY = reduce(xor, (zobrist.PILE[card.to_index()] for card in SMALL_CARDS + BIG_CARDS))
+
+
+class PileState(NamedTuple):
+    """Immutable copy of the piles, sharing their cards."""
+    small_card_draw_pile: Tuple[Card, ...]
+    big_card_draw_pile: Tuple[Card, ...]
+    discard_pile: Tuple[Card, ...]
+    initial_seven_cards: Tuple[Card, ...]
+    key: int
+
+
 class CardPile(BaseModel):
     small_card_draw_pile: list[Card] = Field(default_factory=list)
     big_card_draw_pile: list[Card] = Field(default_factory=list)
     discard_pile: List[Card] = Field(default_factory=list)
     initial_seven_cards: List[Card] = Field(default_factory=list)
+    _rng: Any = PrivateAttr(default=None)  # random.Random of the game, None for the random module
+    _key: int = PrivateAttr(default=0)  # zobrist hash of the cards in the draw piles
+    _state: Optional[PileState] = PrivateAttr(default=None)  # until the next draw or discard
 
-    def __init__(self, **data):
+    def __init__(self, rng: Optional[random.Random] = None, **data):
         super().__init__(**data)
+        self._rng = rng
         self._initialize_piles()
+
+    def state(self) -> PileState:
+        """Immutable copy of the piles, the same object until they change."""
+        if self._state is None:
+            self._state = PileState(tuple(self.small_card_draw_pile), tuple(self.big_card_draw_pile),
+                                    tuple(self.discard_pile), tuple(self.initial_seven_cards), self._key)
+        return self._state
+
+    def restore(self, state: PileState) -> None:
+        """Set the piles back to a state, in place."""
+        self.small_card_draw_pile[:] = state.small_card_draw_pile
+        self.big_card_draw_pile[:] = state.big_card_draw_pile
+        self.discard_pile[:] = state.discard_pile
+        self.initial_seven_cards[:] = state.initial_seven_cards
+        self._key = state.key
+        self._state = state
+
+    @property
+    def key(self) -> int:
+        """Zobrist hash of the cards left to draw."""
+        return self.__pydantic_private__["_key"]  # pydantic's __getattr__ for private attributes takes microseconds
+
+    @property
+    def rng(self):
+        return self._rng or random
     
     def _initialize_piles(self):
-        """Initialize all card piles."""
-        # Create all possible cards
-        for suit in CardSuit:
-            for rank in CardRank:
-                card = Card(suit=suit, rank=rank)
-                if card.card_type == CardType.SMALL:
-                    self.small_card_draw_pile.append(card)
-                elif card.card_type == CardType.BIG:
-                    self.big_card_draw_pile.append(card)
-
-        # Save initial seven cards, directly create cards
-        self.initial_seven_cards = [Card(suit=suit, rank=CardRank.SEVEN) for suit in CardSuit]
+        """Fill all card piles, reusing their lists."""
+        self.small_card_draw_pile[:] = SMALL_CARDS
+        self.big_card_draw_pile[:] = BIG_CARDS
+        self.discard_pile.clear()
+        self.initial_seven_cards[:] = SEVEN_CARDS
+        self._key = FULL_PILE_KEY
+        self._state = None
+
+    def reset(self, rng: Optional[random.Random] = None) -> None:
+        """Refill the piles in place for a new game."""
+        self._rng = rng
+        self._initialize_piles()
 
     def draw_seven_cards(self) -> List[Card]:
         """
@@ -40,7 +89,7 @@ class CardPile(BaseModel):
             List[Card]: List of seven cards drawn
         """
         # pop two seven cards
-        seven_cards = random.sample(self.initial_seven_cards, 2)
+        seven_cards = self.rng.sample(self.initial_seven_cards, 2)
         return seven_cards
 
     def draw_pair(self) -> Optional[CardPair]:
@@ -55,10 +104,12 @@ class CardPile(BaseModel):
             return None
 
         # Find a suit with both small and big cards
-        small_card_rand_idx = random.randint(0, len(self.small_card_draw_pile) - 1)
+        small_card_rand_idx = self.rng.randint(0, len(self.small_card_draw_pile) - 1)
         small_card = self.small_card_draw_pile.pop(small_card_rand_idx)
-        big_card_rand_idx = random.randint(0, len(self.big_card_draw_pile) - 1)
+        big_card_rand_idx = self.rng.randint(0, len(self.big_card_draw_pile) - 1)
         big_card = self.big_card_draw_pile.pop(big_card_rand_idx)
+        self._key ^= zobrist.PILE[small_card.to_index()] ^ zobrist.PILE[big_card.to_index()]
+        self._state = None
         return CardPair(small_card=small_card, big_card=big_card)
     
     def discard_pair(self, pair: CardPair):
@@ -69,6 +120,7 @@ class CardPile(BaseModel):
             pair: The card pair to discard
         """
         self.discard_pile.extend([pair.small_card, pair.big_card])
+        self._state = None
     
     def shuffle_discard_into_draw(self):
         """Shuffle discard pile back into draw pile."""
@@ -76,6 +128,7 @@ class CardPile(BaseModel):
         for card in self.discard_pile:
             self.draw_pile[card.suit].add(card)
         self.discard_pile.clear()
+        self._state = None
     
     @property
     def draw_pile_size(self) -> int:
@@ -0,0 +1,124 @@
+"""
+Run one server worker per core behind a gateway that shards games across them.
+
+    python cluster.py --bind "[::]:8000" --workers 4
+
+Each worker is a hypercorn process serving main:app on a unix socket. The gateway listens on the
+public address and forwards every request to the worker owning its game (see api/gateway.py), and
+the broker relays WebSocket notifications between workers (see api/bus.py).
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+from typing import Dict
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from api.bus import Broker
+from api.gateway import Gateway
+from api.sharding import socket_path
+
+
+class Cluster:
+    def __init__(self, socket_dir: str, workers: int):
+        self.socket_dir = socket_dir
+        self.worker_ids = list(range(workers))
+        self.processes: Dict[int, subprocess.Popen] = {}
+        self.broker = Broker(os.path.join(socket_dir, "axkan-broker.sock"))
+        # new for every cluster, so only its gateway and workers can call the internal endpoints
+        self.secret = secrets.token_urlsafe(32)
+        self.gateway = Gateway(socket_dir, self.worker_ids, cluster_secret=self.secret)
+        self.gateway.spawn_worker = self.spawn_worker
+        self.gateway.stop_worker = self.stop_worker
+
+    def start_worker(self, worker_id: int, worker_ids) -> None:
+        path = socket_path(self.socket_dir, worker_id)
+        if os.path.exists(path):
+            os.unlink(path)
+        env = dict(os.environ,
+                   AXKAN_WORKER_ID=str(worker_id),
+                   AXKAN_WORKER_IDS=",".join(str(w) for w in worker_ids),
+                   AXKAN_SOCKET_DIR=self.socket_dir,
+                   AXKAN_BROKER_SOCKET=self.broker.path,
+                   AXKAN_CLUSTER_SECRET=self.secret)
+        # each worker counts and archives its own games, the gateway adds the counts up. The ratings
+        # are shared: their single owner snapshots them to AXKAN_RATINGS_PATH (see api/profiles.py)
+        for name in ("AXKAN_STATS_PATH", "AXKAN_ARCHIVE_PATH"):
+            if os.getenv(name):
+                env[name] = f"{os.environ[name]}.{worker_id}"
+        self.processes[worker_id] = subprocess.Popen(
+            [sys.executable, "-m", "hypercorn", "main:app", "--bind", f"unix:{path}"],
+            env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    async def wait_for_worker(self, worker_id: int, timeout: float = 30.0) -> None:
+        path = socket_path(self.socket_dir, worker_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(path)
+                writer.close()
+                return
+            except OSError:
+                pass
+            if self.processes[worker_id].poll() is not None:
+                raise RuntimeError(f"Worker {worker_id} exited during startup")
+            if loop.time() > deadline:
+                raise TimeoutError(f"Worker {worker_id} did not start")
+            await asyncio.sleep(0.05)
+
+    async def start(self) -> None:
+        await self.broker.start()
+        for worker_id in self.worker_ids:
+            self.start_worker(worker_id, self.worker_ids)
+        await asyncio.gather(*(self.wait_for_worker(w) for w in self.worker_ids))
+
+    async def spawn_worker(self, worker_id: int) -> None:
+        """Start an extra worker during rebalancing."""
+        self.start_worker(worker_id, self.gateway.ring.workers + [worker_id])
+        await self.wait_for_worker(worker_id)
+
+    async def stop_worker(self, worker_id: int) -> None:
+        process = self.processes.pop(worker_id, None)
+        if process is not None:
+            process.terminate()
+            await asyncio.get_running_loop().run_in_executor(None, process.wait)
+
+    def stop(self) -> None:
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.wait()
+
+
+async def run(bind: str, workers: int) -> None:
+    with tempfile.TemporaryDirectory(prefix="axkan-") as socket_dir:
+        cluster = Cluster(socket_dir, workers)
+        await cluster.start()
+
+        shutdown = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, shutdown.set)
+
+        config = Config()
+        config.bind = [bind]
+        try:
+            await serve(cluster.gateway, config, shutdown_trigger=shutdown.wait)
+        finally:
+            cluster.stop()
+            await cluster.broker.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run sharded Axkan II workers behind a gateway")
+    parser.add_argument("--bind", default="127.0.0.1:8000")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("AXKAN_WORKERS", os.cpu_count() or 1)))
+    args = parser.parse_args()
+    asyncio.run(run(args.bind, args.workers))
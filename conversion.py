@@ -0,0 +1,50 @@
+"""
+Best use of the remaining seven cards in the final review.
+
+Once the price is final, flipping a pair's big card changes its P&L by a fixed amount, and each
+seven card flips one pair, so the best plan flips the pairs with the largest positive gains. Gains
+come from the cached P&L tables of pricing.py and plans are cached by (price, pair ids, seven cards).
+"""
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+from card import CardPair
+from pricing import pnl_by_price_id
+
+HIDDEN_PAIR_INDEX = -1  # pair index of the hidden pair in GameContext.convert_color
+
+
+class ConversionPlan(NamedTuple):
+    pair_indexes: Tuple[int, ...]  # pairs to flip, best first, -1 for the hidden pair
+    gains: Tuple[int, ...]  # P&L gained by each flip
+    total_gain: int
+
+
+@lru_cache(maxsize=None)
+def flipped_pair_id(pair_id: int) -> int:
+    return CardPair.from_index(pair_id).convert_big_card_color().to_index()
+
+
+@lru_cache(maxsize=None)
+def gain_by_price_id(pair_id: int) -> Tuple[int, ...]:
+    """P&L change of flipping a pair's big card at every final price, indexed by price."""
+    return tuple(flipped - held for flipped, held in zip(pnl_by_price_id(flipped_pair_id(pair_id)), pnl_by_price_id(pair_id)))
+
+
+def conversion_gain(pair_id: int, price: int) -> int:
+    return gain_by_price_id(pair_id)[price]
+
+
+@lru_cache(maxsize=65536)
+def best_conversions(price: int, pair_ids: Tuple[int, ...], hidden_pair_id: Optional[int],
+                     seven_cards: int) -> ConversionPlan:
+    """
+    P&L-maximizing conversions with `seven_cards` cards at a final price. Flipping a pair twice
+    undoes the first flip, so every pair is flipped at most once and the gains simply add up.
+    """
+    candidates = [(conversion_gain(pair_id, price), index) for index, pair_id in enumerate(pair_ids)]
+    if hidden_pair_id is not None:
+        candidates.append((conversion_gain(hidden_pair_id, price), HIDDEN_PAIR_INDEX))
+    chosen = sorted((c for c in candidates if c[0] > 0), key=lambda c: c[0], reverse=True)[:seven_cards]
+    return ConversionPlan(tuple(index for _, index in chosen), tuple(gain for gain, _ in chosen),
+                          sum(gain for gain, _ in chosen))
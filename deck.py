@@ -0,0 +1,129 @@
+"""
+Exact odds of the pairs still to be drawn, from the cards a seat has seen.
+
+The piles deal without replacement, so from a seat's point of view the next draw matches an ordered
+sample of its unseen small cards with an ordered sample of its unseen big cards. Unseen cards are
+bitmasks of card ids. A pair's breakeven only depends on the small card's rank and the big card's rank
+and color, so the odds are computed from the unseen counts of each and cached by those counts:
+
+    P(a given unseen pair is drawn) = draws / (small cards * big cards)
+    P(no drawn pair has breakeven b) = inclusion-exclusion over the draw positions, the big cards making
+                                      b with small cards of different ranks being disjoint
+"""
+from functools import lru_cache
+from itertools import combinations, product
+from math import perm
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+from card import CARD_COUNT
+
+SMALL_RANKS = range(1, 7)
+BIG_RANKS = range(8, 14)
+RED_SUITS = (0, 1)  # card ids are suit-major over HEARTS, DIAMONDS, SPADES, CLUBS
+
+
+def _mask(card_ids: Iterable[int]) -> int:
+    mask = 0
+    for card_id in card_ids:
+        mask |= 1 << card_id
+    return mask
+
+
+SMALL_MASK = _mask(suit * 13 + rank - 1 for suit in range(4) for rank in SMALL_RANKS)
+BIG_MASK = _mask(suit * 13 + rank - 1 for suit in range(4) for rank in BIG_RANKS)
+# card ids of each small rank, and of each big rank by color
+SMALL_RANK_MASKS = tuple(_mask(suit * 13 + rank - 1 for suit in range(4)) for rank in SMALL_RANKS)
+BIG_RANK_MASKS = tuple(tuple(_mask(suit * 13 + rank - 1 for suit in range(4) if (suit in RED_SUITS) == red)
+                             for rank in BIG_RANKS) for red in (False, True))
+
+
+class BreakevenOdds(NamedTuple):
+    breakeven: str  # as CardPair.breakeven, ">=X" for red big cards and "<=X" for black ones
+    per_pair: float  # probability that a drawn pair has this breakeven
+    expected_count: float  # in the next draw
+    at_least_one: float  # probability that the next draw has a pair with this breakeven
+
+
+class DeckOdds(NamedTuple):
+    small_cards: int  # unseen by the seat, the opponent's hidden pair included
+    big_cards: int
+    draws: int  # pairs in the next draw
+    pair_probability: float  # of every unseen pair being in the next draw
+    breakevens: Tuple[BreakevenOdds, ...]  # most likely first
+
+
+def seen_mask(pair_ids: Iterable[int]) -> int:
+    """Bitmask of the card ids of pairs."""
+    mask = 0
+    for pair_id in pair_ids:
+        small, big = divmod(pair_id, CARD_COUNT)
+        mask |= (1 << small) | (1 << big)
+    return mask
+
+
+def deck_odds(seen: int, draws: int) -> DeckOdds:
+    """Odds of the next `draws` pairs for a seat that has seen the cards of the `seen` mask."""
+    unseen = ~seen
+    small_counts = tuple((mask & unseen).bit_count() for mask in SMALL_RANK_MASKS)
+    big_counts = tuple(tuple((mask & unseen).bit_count() for mask in masks) for masks in BIG_RANK_MASKS)
+    return odds_by_counts(small_counts, big_counts, draws)
+
+
+@lru_cache(maxsize=4096)
+def odds_by_counts(small_counts: Tuple[int, ...], big_counts: Tuple[Tuple[int, ...], Tuple[int, ...]],
+                   draws: int) -> DeckOdds:
+    """Odds from the unseen small cards by rank and big cards by color and rank."""
+    small_total, big_total = sum(small_counts), sum(map(sum, big_counts))
+    draws = min(draws, small_total, big_total)
+    if draws == 0:
+        return DeckOdds(small_total, big_total, 0, 0.0, ())
+
+    # probability of the small ranks of the draw, summed over their orders since the odds do not depend on it
+    sequences: Dict[Tuple[int, ...], float] = {}
+    for ranks in product(range(len(SMALL_RANKS)), repeat=draws):
+        probability = 1.0
+        for position, rank in enumerate(ranks):
+            probability *= (small_counts[rank] - ranks[:position].count(rank)) / (small_total - position)
+        if probability:
+            key = tuple(sorted(ranks))
+            sequences[key] = sequences.get(key, 0.0) + probability
+
+    breakevens = []
+    for red in (True, False):
+        for price in _breakeven_prices(red):
+            # big cards making the breakeven with a small card of each rank
+            hits = tuple(_big_count(big_counts, red, price - rank if red else price + rank) for rank in SMALL_RANKS)
+            per_pair = sum(small_counts[s] * hits[s] for s in range(len(SMALL_RANKS))) / (small_total * big_total)
+            if per_pair == 0:
+                continue
+            none = sum(probability * _no_hit(ranks, hits, big_total) for ranks, probability in sequences.items())
+            breakevens.append(BreakevenOdds(f">={price}" if red else f"<={price}", per_pair, draws * per_pair,
+                                            1.0 - none))
+    breakevens.sort(key=lambda odds: odds.at_least_one, reverse=True)
+    return DeckOdds(small_total, big_total, draws, draws / (small_total * big_total), tuple(breakevens))
+
+
+def _breakeven_prices(red: bool) -> range:
+    if red:
+        return range(BIG_RANKS[0] + SMALL_RANKS[0], BIG_RANKS[-1] + SMALL_RANKS[-1] + 1)
+    return range(BIG_RANKS[0] - SMALL_RANKS[-1], BIG_RANKS[-1] - SMALL_RANKS[0] + 1)
+
+
+def _big_count(big_counts, red: bool, rank: int) -> int:
+    return big_counts[red][rank - BIG_RANKS[0]] if rank in BIG_RANKS else 0
+
+
+def _no_hit(ranks: Tuple[int, ...], hits: Tuple[int, ...], big_total: int) -> float:
+    """
+    Probability that no position of the draw gets a big card making the breakeven with its small card.
+    Positions with small cards of one rank share their hitting big cards and other ranks' are disjoint,
+    so the ways of hitting a set of positions are a product of falling factorials.
+    """
+    total = 0.0
+    for size in range(len(ranks) + 1):
+        for positions in combinations(ranks, size):
+            ways = 1
+            for rank in set(positions):
+                ways *= perm(hits[rank], positions.count(rank))
+            total += (-1) ** size * ways / perm(big_total, size)
+    return total
@@ -29,14 +29,17 @@ class Dice:
         self.is_positive = is_positive
         self.current_value = 0
     
-    def roll(self) -> int:
+    def roll(self, rng=random) -> int:
         """
         Roll the die and return a random value between 1 and 6.
         
+        Args:
+            rng: random.Random of the game, or the random module
+
         Returns:
             int: Random value between 1 and 6
         """
-        self.current_value = random.randint(1, 6)
+        self.current_value = rng.randint(1, 6)
         return self.current_value
     
     def __str__(self) -> str:
@@ -73,18 +76,19 @@ def create_dice_collection(collection_type: DiceCollectionType) -> List[Dice]:
         return [Dice(is_positive=True)]
     raise ValueError(f"Unknown collection type: {collection_type}")
 
-def roll_collection(collection_type: DiceCollectionType) -> tuple[int, List[int], int]:
+def roll_collection(collection_type: DiceCollectionType, rng=random) -> tuple[int, List[int], int]:
     """
     Roll all dice and return list of values and total sum.
     
     Args:
         collection_type: Type of dice collection to roll
+        rng: random.Random of the game, or the random module
 
     Returns:
         tuple[int, List[int], int]: Total sum, list of values, extra modifier
     """
     dice_list = create_dice_collection(collection_type)
-    values = [dice.roll() if dice.is_positive else -dice.roll() for dice in dice_list]
+    values = [dice.roll(rng) if dice.is_positive else -dice.roll(rng) for dice in dice_list]
     # Calculate base sum
     total = sum(values)
     
@@ -0,0 +1,63 @@
+"""
+Which dice collection the roller should spend a seven card on, if any.
+
+Every collection is scored by the roller's expected final P&L and expected lead over the opponent's
+visible portfolio, from the exact final price distribution after this roll and regular rolls until
+the end. Keeping the card is scored as a regular roll with one more seven card for the conversions of
+the final review. Portfolios only hold the pairs picked so far.
+"""
+from functools import lru_cache
+from operator import mul
+from typing import NamedTuple, Optional, Tuple
+
+from conversion import gain_by_price_id
+from dice import DiceCollectionType
+from pricing import MAX_PRICE, pnl_by_price_id, price_distribution
+
+SPECIAL_COLLECTIONS = tuple(collection for collection in DiceCollectionType
+                            if collection not in (DiceCollectionType.INITIAL, DiceCollectionType.REGULAR))
+
+
+class DiceOption(NamedTuple):
+    collection: DiceCollectionType
+    spends_seven_card: bool
+    expected_pnl: float
+    expected_lead: float  # over the opponent's visible pairs
+    win_probability: float  # probability that the lead is positive
+
+
+@lru_cache(maxsize=4096)
+def final_pnl(pair_ids: Tuple[int, ...], hidden_pair_id: Optional[int], seven_cards: int) -> Tuple[int, ...]:
+    """P&L at every final price, indexed by price, with the best conversions made at that price."""
+    ids = pair_ids if hidden_pair_id is None else pair_ids + (hidden_pair_id,)
+    # column sums over the pairs' P&L tables, index 0 stays 0
+    pnl = [sum(column) for column in zip(*(pnl_by_price_id(pair_id) for pair_id in ids))] or [0] * (MAX_PRICE + 1)
+    if seven_cards:
+        # same plan as conversion.best_conversions, without building it for every price
+        for price, gains in enumerate(zip(*(gain_by_price_id(pair_id) for pair_id in ids))):
+            pnl[price] += sum(gain for gain in sorted(gains, reverse=True)[:seven_cards] if gain > 0)
+    return tuple(pnl)
+
+
+@lru_cache(maxsize=4096)
+def dice_options(price: int, rolls: int, pair_ids: Tuple[int, ...], hidden_pair_id: Optional[int], seven_cards: int,
+                 opponent_pair_ids: Tuple[int, ...], opponent_seven_cards: int) -> Tuple[DiceOption, ...]:
+    """
+    Options of a roller about to roll with `rolls` rolls left including this one, best lead first.
+    Special collections are only offered while the roller holds a seven card.
+    """
+    opponent = final_pnl(opponent_pair_ids, None, opponent_seven_cards)
+    options = [(DiceCollectionType.REGULAR, False, seven_cards)]
+    if seven_cards > 0:
+        options += [(collection, True, seven_cards - 1) for collection in SPECIAL_COLLECTIONS]
+
+    scored = []
+    for collection, spends, kept in options:
+        distribution = price_distribution(price, rolls, collection)  # index 0 has probability 0
+        own = final_pnl(pair_ids, hidden_pair_id, kept)
+        scored.append(DiceOption(
+            collection, spends,
+            sum(map(mul, distribution, own)),
+            sum(q * (mine - theirs) for q, mine, theirs in zip(distribution, own, opponent)),
+            sum(q for q, mine, theirs in zip(distribution, own, opponent) if mine > theirs)))
+    return tuple(sorted(scored, key=lambda option: option.expected_lead, reverse=True))
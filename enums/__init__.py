@@ -1,4 +1,5 @@
 from .game_phase import GamePhase
 from .game_action import GameAction
+from .difficulty import Difficulty
 
-__all__ = ['GamePhase', 'GameAction'] 
\ No newline at end of file
+__all__ = ['GamePhase', 'GameAction', 'Difficulty'] 
\ No newline at end of file
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class Difficulty(Enum):
+    EASY = "easy"
+    MEDIUM = "medium"
+    HARD = "hard"
@@ -6,5 +6,6 @@ class GameAction(Enum):
     ROLL_DICE = "roll_dice"
     SELECT_PAIR = "select_pair"
     COLOR_CONVERT = "color_convert"
+    AUTO_CONVERT = "auto_convert"
     END_REVIEW = "end_review"
     RETURN_TO_LOBBY = "return_to_lobby"
\ No newline at end of file
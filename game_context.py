@@ -1,14 +1,29 @@
 import random
-from typing import List, Optional, Dict
+from functools import reduce
+from operator import xor
+from typing import List, NamedTuple, Optional, Dict, Tuple
 
 from pydantic import BaseModel
 
+import zobrist
 from card import CardPair, Card
-from card_pile import CardPile
+from card_pile import CardPile, PileState
+from conversion import ConversionPlan, best_conversions
+from deck import DeckOdds, deck_odds, seen_mask
+from dice_advice import DiceOption, dice_options
 from enums import GamePhase, GameAction
 from player import Player, PlayerView
+from portfolio import Portfolio, PortfolioState
 from dice import roll_collection, DiceCollectionType, create_dice_collection, Dice
 from board import Board
+from game_record import PAIRS_PER_TURN, GameRecorder, RecordState
+from pricing import PortfolioRisk, portfolio_risk, rolls_remaining
+from transitions import TRANSITIONS
+from validation import build_trusted
+
+TURN_PHASES = (GamePhase.TURN_START, GamePhase.TURN_SELECT_FIRST, GamePhase.TURN_SELECT_SECOND,
+               GamePhase.TURN_COMPLETE)
+
 
 class GameResult(BaseModel):
     winner: int
@@ -44,12 +59,107 @@ class GameResult(BaseModel):
         }
 
 
+class PlayerState(NamedTuple):
+    uuid: str
+    player_id: int
+    name: str
+    profile_id: Optional[str]
+    portfolio: PortfolioState
+
+
+class GameState(NamedTuple):
+    """
+    Immutable version of a game, from GameContext.snapshot. Portfolios and the pile keep their state
+    until they change, so successive snapshots share every part the actions in between did not touch.
+    """
+    phase: GamePhase
+    players: Tuple[PlayerState, ...]  # in joining order
+    pile: Optional[PileState]
+    available_pairs: Tuple[CardPair, ...]
+    selected_pair_index: Tuple[Tuple[str, int], ...]
+    initial_price: Optional[int]
+    current_price: Optional[int]
+    current_turn: int
+    first_selector: Optional[str]  # player uuid
+    dice_result: Tuple[int, ...]
+    dice_extra: int
+    seed: Optional[int]
+    rng: tuple  # random.Random state
+    record: RecordState
+
+    def to_dict(self) -> dict:
+        """JSON-compatible version of the state, cards and pairs by id, e.g. to move the game to another worker."""
+        pile = self.pile
+        return {
+            "phase": self.phase.value,
+            "players": [[player.uuid, player.player_id, player.name, player.profile_id,
+                         _ids(player.portfolio.regular_pairs), _ids(player.portfolio.hidden_pairs),
+                         _ids(player.portfolio.seven_cards)] for player in self.players],
+            "pile": None if pile is None else [_ids(pile.small_card_draw_pile), _ids(pile.big_card_draw_pile),
+                                               _ids(pile.discard_pile), _ids(pile.initial_seven_cards)],
+            "available_pairs": _ids(self.available_pairs),
+            "selected_pair_index": dict(self.selected_pair_index),
+            "initial_price": self.initial_price,
+            "current_price": self.current_price,
+            "current_turn": self.current_turn,
+            "first_selector": self.first_selector,
+            "dice_result": list(self.dice_result),
+            "dice_extra": self.dice_extra,
+            "seed": self.seed,
+            "rng": [self.rng[0], list(self.rng[1]), self.rng[2]],
+            "record": list(self.record),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GameState":
+        """Inverse of to_dict. Raises ValueError on malformed data."""
+        try:
+            players = tuple(
+                PlayerState(uuid, player_id, name, profile_id,
+                            Portfolio(regular_pairs=_pairs(regular), hidden_pairs=_pairs(hidden),
+                                      seven_cards=_cards(sevens)).state())
+                for uuid, player_id, name, profile_id, regular, hidden, sevens in data["players"])
+            pile = None
+            if data["pile"] is not None:
+                small, big, discard, sevens = (tuple(_cards(ids)) for ids in data["pile"])
+                pile = PileState(small, big, discard, sevens,
+                                 reduce(xor, (zobrist.PILE[card.to_index()] for card in small + big), 0))
+            version, internal, gauss = data["rng"]
+            return cls(GamePhase(data["phase"]), players, pile, tuple(_pairs(data["available_pairs"])),
+                       tuple(data["selected_pair_index"].items()), data["initial_price"], data["current_price"],
+                       data["current_turn"], data["first_selector"], tuple(data["dice_result"]), data["dice_extra"],
+                       data["seed"], (version, tuple(internal), gauss), RecordState(*data["record"]))
+        except (KeyError, TypeError, IndexError) as e:
+            raise ValueError(f"Malformed game state: {e!r}") from e
+
+
+def _ids(items) -> List[int]:
+    return [item.to_index() for item in items]
+
+
+def _pairs(pair_ids) -> List[CardPair]:
+    return [CardPair.from_index(pair_id) for pair_id in pair_ids]
+
+
+def _cards(card_ids) -> List[Card]:
+    return [Card.from_index(card_id) for card_id in card_ids]
+
 
 class GameContext:
     def __init__(self):
+        self.rng = random.Random()  # all draws and rolls of the game, seeded in initialize_game
+        self.card_pile: Optional[CardPile] = None
+        self._spare_pile: Optional[CardPile] = None  # of a previous game, refilled by the next one
+        self.reset()
+
+    def reset(self) -> None:
+        """Back to an empty lobby, keeping the random generator and pile to reuse them in the next game"""
         self.current_phase: GamePhase = GamePhase.LOBBY
         self.players: List[Player] = []
-        self.card_pile: Optional[CardPile] = None
+        self.players_by_uuid: Dict[str, Player] = {}  # player uuid -> player
+        self.players_by_seat: Dict[int, Player] = {}  # player id -> player
+        self._spare_pile = self.card_pile or self._spare_pile
+        self.card_pile = None
         self.available_pairs: List[CardPair] = []
         self.selected_pair_index: Dict[str, int] = {}
         self.initial_price: Optional[int] = None
@@ -58,23 +168,123 @@ class GameContext:
         self.first_selector: Optional[Player] = None  # Track who selects first in current turn
         self.dice_result: list[int] = []
         self.dice_extra: int = 0
+        self.seed: Optional[int] = None
+        self._rng_state: Optional[tuple] = None  # of self.rng for snapshots, until the next draw or roll
+        self._offered_key = 0  # zobrist hash of the available pairs not selected yet
+        self.recorder = GameRecorder()
+
+    def _refill_pile(self) -> None:
+        """Give the game a full pile drawing with its random generator, the previous game's one if any"""
+        if self.card_pile is None:
+            self.card_pile, self._spare_pile = self._spare_pile or CardPile(), None
+        self.card_pile.reset(self.rng)
+
+    def _public_key(self) -> int:
+        key = zobrist.PHASE[self.current_phase] ^ zobrist.TURN[self.current_turn] ^ self._offered_key
+        if self.current_price:
+            key ^= zobrist.PRICE[self.current_price]
+        return key
+
+    @property
+    def state_key(self) -> int:
+        """
+        zobrist.game_hash of the phase, turn, price, pairs on offer, portfolios, seven cards and draw piles.
+        The pairs on offer, portfolios and pile keep their part up to date as they change, so this is a few XORs.
+        """
+        key = self._public_key()
+        for player in self.players:
+            key ^= player.portfolio.key(player.player_id)
+        if self.card_pile is not None:
+            key ^= self.card_pile.key
+        return key
+
+    def search_key(self, player_id: int) -> int:
+        """zobrist.state_hash of the game as seen by a seat, which only knows its own hidden pair."""
+        key = self._public_key()
+        for player in self.players:
+            key ^= player.portfolio.search_key(player.player_id, player.player_id == player_id)
+        return key
+
+    def _hash_offered(self) -> None:
+        taken = self.selected_pair_index.values()
+        self._offered_key = 0
+        for index, pair in enumerate(self.available_pairs):
+            if index not in taken:
+                self._offered_key ^= zobrist.OFFERED[pair.to_index()]
+
+    def snapshot(self) -> GameState:
+        """Immutable version of the game, for undoing actions or trying moves on a copy"""
+        return GameState(
+            self.current_phase,
+            tuple(PlayerState(player.uuid, player.player_id, player.name, player.profile_id, player.portfolio.state())
+                  for player in self.players),
+            self.card_pile.state() if self.card_pile else None,
+            tuple(self.available_pairs), tuple(self.selected_pair_index.items()), self.initial_price,
+            self.current_price, self.current_turn, self.first_selector.uuid if self.first_selector else None,
+            tuple(self.dice_result), self.dice_extra, self.seed, self._random_state(), self.recorder.state())
+
+    def _random_state(self) -> tuple:
+        if self._rng_state is None:
+            self._rng_state = self.rng.getstate()
+        return self._rng_state
+
+    def restore(self, state: GameState) -> None:
+        """Set the game back to a snapshot, players still seated keeping their objects"""
+        players = []
+        for player_state in state.players:
+            player = self.players_by_uuid.get(player_state.uuid) or Player(uuid=player_state.uuid)
+            player.player_id, player.name, player.profile_id = (player_state.player_id, player_state.name,
+                                                                player_state.profile_id)
+            player.portfolio.restore(player_state.portfolio)
+            players.append(player)
+        self.players = players
+        self.players_by_uuid = {player.uuid: player for player in players}
+        self._index_seats()
+
+        self.rng.setstate(state.rng)
+        self._rng_state = state.rng
+        if state.pile is None:
+            self._spare_pile, self.card_pile = self.card_pile or self._spare_pile, None
+        else:
+            self._refill_pile()
+            self.card_pile.restore(state.pile)
+        self.current_phase = state.phase
+        self.available_pairs = list(state.available_pairs)
+        self.selected_pair_index = dict(state.selected_pair_index)
+        self._hash_offered()
+        self.initial_price = state.initial_price
+        self.current_price = state.current_price
+        self.current_turn = state.current_turn
+        self.first_selector = self.players_by_uuid.get(state.first_selector) if state.first_selector else None
+        self.dice_result = list(state.dice_result)
+        self.dice_extra = state.dice_extra
+        self.seed = state.seed
+        self.recorder = GameRecorder.from_state(state.record)
+
+    @classmethod
+    def from_state(cls, state: GameState) -> "GameContext":
+        """A new game at a snapshot, e.g. to play what-if moves without touching the real one"""
+        context = cls()
+        context.restore(state)
+        return context
 
     def create_board(self, player_id: int) -> Board:
         current_player = self.player_1 if player_id == 0 else self.player_2
         opponent_player = self.player_2 if player_id == 0 else self.player_1
 
-        board = Board(
+        board = build_trusted(
+            Board,
             current_phase=self.current_phase,
             turn_number=self.current_turn,
-            dice_result=self.dice_result,
+            dice_result=list(self.dice_result),
             dice_extra=self.dice_extra,
             stock_price=self.current_price,
             first_selector=self.first_selector.player_id if self.first_selector else None,
             second_selector=self.second_selector.player_id if self.second_selector else None,
             dice_roller=self.dice_roller.player_id if self.dice_roller else None,
-            available_pairs=self.available_pairs,
-            selected_pair_index=self.selected_pair_index,
-            current_player=current_player.get_player_view(self.current_price),
+            available_pairs=list(self.available_pairs),
+            selected_pair_index=dict(self.selected_pair_index),
+            current_player=current_player.get_player_view(self.current_price, self.portfolio_risk(player_id)),
             opponent=opponent_player.get_opponent_view(self.current_price)
         )
 
@@ -123,6 +333,8 @@ class GameContext:
         # Draw new pairs
         self.selected_pair_index = {}
         self.available_pairs = self.draw_pairs()
+        self._hash_offered()
+        self.recorder.offer(self.available_pairs)
 
         # Move to selection phase
         self.current_phase = GamePhase.TURN_SELECT_FIRST
@@ -134,15 +346,18 @@ class GameContext:
         # Move to review phase
         self.selected_pair_index = {}
         self.available_pairs = []
+        self._offered_key = 0
 
 
     def roll_dice(self, dice_collection_type: DiceCollectionType = DiceCollectionType.REGULAR) -> None:
         """Handle dice rolling and price update"""
+        self._rng_state = None
         if self.current_phase == GamePhase.GAME_INIT:
             # Roll dice and set initial price
             # = roll_collection(DiceCollectionType.INITIAL)
-            roll_result, dice_result, dice_extra = roll_collection(DiceCollectionType.INITIAL)
+            roll_result, dice_result, dice_extra = roll_collection(DiceCollectionType.INITIAL, self.rng)
             self.set_initial_price(roll_result)
+            self.recorder.initial_roll(dice_result, self.current_price)
             self.dice_result = dice_result
             self.dice_extra = dice_extra
             self.current_phase = GamePhase.TURN_START
@@ -150,10 +365,11 @@ class GameContext:
             
         elif self.current_phase == GamePhase.TURN_COMPLETE:
             # Roll dice and update price
-            roll_result, dice_result, dice_extra = roll_collection(dice_collection_type)
+            roll_result, dice_result, dice_extra = roll_collection(dice_collection_type, self.rng)
             self.dice_result = dice_result
             self.dice_extra = dice_extra
             self.update_price(roll_result)
+            self.recorder.roll(dice_collection_type, dice_result, dice_extra, self.current_price)
             
         # Move to next turn
         if not self.is_last_turn():
@@ -164,6 +380,7 @@ class GameContext:
 
     def draw_pairs(self) -> List[CardPair]:
         """Draw pairs for current turn"""
+        self._rng_state = None
         pairs = []
         num_pairs = 3
         for _ in range(num_pairs):
@@ -174,58 +391,50 @@ class GameContext:
 
     def is_valid_action(self, action: GameAction) -> bool:
         """Check if an action is valid for the current phase"""
-        if action == GameAction.JOIN_GAME:
-            return self.current_phase == GamePhase.LOBBY and len(self.players) < 2
-        elif action == GameAction.READY:
-            if self.current_phase == GamePhase.LOBBY:
-                return len(self.players) == 2
-            elif self.current_phase == GamePhase.TURN_COMPLETE:
-                return True
+        if (self.current_phase, action) not in TRANSITIONS:
             return False
-        elif action == GameAction.START_GAME:
-            return self.current_phase == GamePhase.GAME_START
-        elif action == GameAction.INITIALIZE_GAME:
-            return self.current_phase == GamePhase.GAME_INIT
-        elif action == GameAction.SELECT_PAIR:
-            return self.current_phase in [GamePhase.TURN_SELECT_FIRST, GamePhase.TURN_SELECT_SECOND]
-        elif action == GameAction.ROLL_DICE:
-            return self.current_phase in [GamePhase.TURN_COMPLETE, GamePhase.GAME_INIT]
-        elif action == GameAction.COLOR_CONVERT:
-            return self.current_phase == GamePhase.FINAL_REVIEW
-        elif action == GameAction.CALCULATE_SCORES:
-            return self.current_phase == GamePhase.GAME_END
-        elif action == GameAction.RETURN_TO_LOBBY:
-            return self.current_phase == GamePhase.GAME_END
-        return False
+        if action == GameAction.JOIN_GAME:
+            return len(self.players) < 2
+        return True
 
     @property
     def player_1(self) -> Optional[Player]:
-        # check player_id == 0
-        for player in self.players:
-            if player.player_id == 0:
-                return player
-        return None
+        return self.players_by_seat.get(0)
 
     @property
     def player_2(self) -> Optional[Player]:
-        # check player_id == 1
-        for player in self.players:
-            if player.player_id == 1:
-                return player
-        return None
+        return self.players_by_seat.get(1)
+
+    def get_player(self, player_uuid: str) -> Optional[Player]:
+        """Get a player by uuid"""
+        return self.players_by_uuid.get(player_uuid)
+
+    def get_player_by_seat(self, player_id: int) -> Optional[Player]:
+        """Get a player by player id"""
+        return self.players_by_seat.get(player_id)
+
+    def _index_seats(self) -> None:
+        """Rebuild the player id index after seats are assigned"""
+        self.players_by_seat = {player.player_id: player for player in self.players}
 
     def add_player(self, player: Player) -> bool:
         """Add a player to the game"""
         if len(self.players) < 2:
             self.players.append(player)
+            self.players_by_uuid[player.uuid] = player
+            self._index_seats()
             if len(self.players) == 2:
                 self.current_phase = GamePhase.GAME_START
             return True
         return False
 
-    def initialize_game(self):
-        """Initialize game components according to rules"""
-        self.card_pile = CardPile()
+    def initialize_game(self, seed: Optional[int] = None):
+        """Initialize game components according to rules, replaying a game when given its seed"""
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.rng.seed(self.seed)
+        self._rng_state = None
+        self.recorder = GameRecorder(self.seed)
+        self._refill_pile()
         self.current_turn = 1
         self.current_phase = GamePhase.GAME_INIT
         self.current_price = None
@@ -234,9 +443,10 @@ class GameContext:
         self.dice_extra = 0
 
         # flip a coin to determine who has player id 1 or 0
-        rand = random.randint(0, 1)
+        rand = self.rng.randint(0, 1)
         self.players[0].player_id = rand
         self.players[1].player_id = 1 - rand
+        self._index_seats()
 
         # reset portfolio
         for player in self.players:
@@ -254,6 +464,7 @@ class GameContext:
             seven_cards = self.card_pile.draw_seven_cards()
             player.portfolio.add_seven_card(seven_cards[0])
             player.portfolio.add_seven_card(seven_cards[1])
+            self.recorder.deal(player.player_id, player.hidden_pair, seven_cards)
 
 
     def set_initial_price(self, roll_result: int) -> None:
@@ -287,13 +498,17 @@ class GameContext:
         if self.current_phase == GamePhase.TURN_SELECT_FIRST:
             print(f"{current_player.name} selected {pair}")
             current_player.select_pair(pair)
+            self.recorder.select(current_player.player_id, pair)
             self.selected_pair_index[current_player.uuid] = self.available_pairs.index(pair)
+            self._offered_key ^= zobrist.OFFERED[pair.to_index()]
             self.current_phase = GamePhase.TURN_SELECT_SECOND
             return True
         elif self.current_phase == GamePhase.TURN_SELECT_SECOND:
             print(f"{current_player.name} selected {pair}")
             current_player.select_pair(pair)
+            self.recorder.select(current_player.player_id, pair)
             self.selected_pair_index[current_player.uuid] = self.available_pairs.index(pair)
+            self._offered_key ^= zobrist.OFFERED[pair.to_index()]
             self.current_phase = GamePhase.TURN_COMPLETE
             return True
         return False
@@ -311,7 +526,8 @@ class GameContext:
         - Selected Pairs
         - Hidden Pair
         """
-        game_result = GameResult(
+        game_result = build_trusted(
+            GameResult,
             winner=-1,
             stock_price=self.current_price,
             player_1=self.player_1.get_player_view(self.current_price),
@@ -334,4 +550,50 @@ class GameContext:
         """Convert color of a pair for a player"""
         player = self.player_1 if player_id == 0 else self.player_2
         pair = player.portfolio.regular_pairs[pair_index] if pair_index >= 0 else player.hidden_pair
-        return player.convert_card_color(pair, special_card_index)
\ No newline at end of file
+        converted = player.convert_card_color(pair, special_card_index)
+        if converted:
+            self.recorder.convert(player_id, pair_index)
+        return converted
+
+    def conversion_plan(self, player_id: int) -> ConversionPlan:
+        """Best conversions for a player's remaining seven cards at the current price"""
+        player = self.player_1 if player_id == 0 else self.player_2
+        hidden_pair = player.hidden_pair
+        return best_conversions(self.current_price, tuple(pair.to_index() for pair in player.portfolio.regular_pairs),
+                                hidden_pair.to_index() if hidden_pair else None, len(player.seven_cards))
+
+    def auto_convert(self, player_id: int) -> ConversionPlan:
+        """Apply a player's best conversions"""
+        plan = self.conversion_plan(player_id)
+        for pair_index in plan.pair_indexes:
+            self.convert_color(player_id, pair_index, 0)
+        return plan
+
+    def dice_options(self, player_id: int) -> Tuple[DiceOption, ...]:
+        """Dice collections a player could roll now, best expected lead over the opponent first"""
+        player = self.player_1 if player_id == 0 else self.player_2
+        opponent = self.player_2 if player_id == 0 else self.player_1
+        hidden_pair = player.hidden_pair
+        return dice_options(self.current_price, rolls_remaining(self.current_turn),
+                            tuple(pair.to_index() for pair in player.selected_pairs),
+                            hidden_pair.to_index() if hidden_pair else None, len(player.seven_cards),
+                            tuple(pair.to_index() for pair in opponent.selected_pairs), len(opponent.seven_cards))
+
+    def portfolio_risk(self, player_id: int) -> Optional[PortfolioRisk]:
+        """Risk of a player's pairs against the opponent's visible ones while the price can still move, else None"""
+        if self.current_phase not in TURN_PHASES:
+            return None
+        player = self.player_1 if player_id == 0 else self.player_2
+        opponent = self.player_2 if player_id == 0 else self.player_1
+        return portfolio_risk(self.current_price, rolls_remaining(self.current_turn), player.portfolio.pnl_by_price(),
+                              opponent.portfolio.pnl_by_price(include_hidden=False))
+
+    def deck_odds(self, player_id: int) -> DeckOdds:
+        """Odds of the next turn's pairs from the cards a player has seen: every pair offered and their hidden pair"""
+        player = self.player_1 if player_id == 0 else self.player_2
+        seen = [pair_id for pair_ids in self.recorder.available for pair_id in pair_ids]
+        if player.hidden_pair is not None:
+            seen.append(player.hidden_pair.to_index())
+        upcoming = self.current_phase == GamePhase.GAME_INIT or (
+            self.current_phase in TURN_PHASES and not self.is_last_turn())
+        return deck_odds(seen_mask(seen), PAIRS_PER_TURN if upcoming else 0)
@@ -1,3 +1,6 @@
+import asyncio
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 
 from api.models import PlayerMetadata
@@ -5,17 +8,80 @@ from card import CardPair
 from card_pile import CardPile
 from dice import roll_collection, DiceCollectionType, create_dice_collection, Dice
 from enums import GameAction, GamePhase
-from game_context import GameContext
+from game_context import GameContext, GameResult, GameState
+from game_record import GameRecorder
 from player import Player
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from api.feed import notification_feed
 from api.websocket import WebSocketMessage, websocket_manager
+from api.registry import session_registry
+from api.analytics import record_finished_game
+from transitions import TRANSITIONS, ACTIVE_PHASES, BoardUpdate
+
+TransitionHook = Callable[[GamePhase, GameAction, float], None]
+FinishedGame = Tuple[GameResult, Tuple[Optional[str], Optional[str]], GameRecorder]  # record_finished_game arguments
+
+POOL_SIZE = 256  # dropped games kept for reuse
+END_GRACE = 120.0  # seconds a finished game waits for a rematch before it is dropped
+
+
+@dataclass
+class ActionRequest:
+    player_uuid: str
+    action: GameAction
+    player_name: Optional[str] = None
+    pair_index: Optional[int] = None
+    special_card_index: Optional[int] = None
+    dice_collection_type: Optional[str] = None
+
 
 class GameManager:
+    # (phase, action) -> handler, compiled from transitions.TRANSITIONS below the class
+    _handlers: Dict[Tuple[GamePhase, GameAction], Callable] = {}
+    transition_hooks: List[TransitionHook] = []
+
     def __init__(self, game_id: str):
         self.game_id = game_id
         self.context = GameContext()
         self.ready_player_count = 0
         self.game_running = False
+        self.muted = False  # notifications are dropped while applying a batch
+        self.version = 0  # bumped after every transition, used as the board ETag
+        self._board_cache: Dict[int, Tuple[int, str]] = {}  # player_id -> (version, board json)
+        self._finished: List[FinishedGame] = []  # games ended in the current batch, recorded once it commits
+        self._expiry: Optional[asyncio.Task] = None  # drops the game once it ended and nobody acts on it
+        self.holds = 0  # actions, streams and bots using the manager, it goes back to the pool once they are done
+        self.retired = False  # dropped from the worker, waiting for the holds to end
+
+    def dump(self) -> Dict[str, Any]:
+        """JSON-compatible state of the game, to move it to another worker."""
+        return {"game_id": self.game_id, "version": self.version, "ready_player_count": self.ready_player_count,
+                "game_running": self.game_running, "state": self.context.snapshot().to_dict()}
+
+    def load(self, data: Dict[str, Any]) -> None:
+        """Take over a game from its dump. Raises ValueError on malformed data."""
+        state = GameState.from_dict(data["state"])
+        self.game_id = data["game_id"]
+        # ahead of the old owner's version, so no ETag or bot move of the old owner matches
+        self.version = max(self.version, data["version"]) + 1
+        self.ready_player_count = data["ready_player_count"]
+        self.game_running = data["game_running"]
+        self.context.restore(state)
+
+    def reset(self, game_id: str) -> None:
+        """Reuse the manager for a new game. The version keeps counting, so no stale ETag or bot move matches."""
+        self.game_id = game_id
+        self.context.reset()
+        self.ready_player_count = 0
+        self.game_running = False
+        self.muted = False
+        self.version += 1
+        self._board_cache.clear()
+        self._finished.clear()
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+        self.retired = False
 
     async def take_action(self,
                     player_uuid: str,
@@ -25,154 +91,311 @@ class GameManager:
                     special_card_index: Optional[int] = None,
                     dice_collection_type: Optional[str] = None
                     ) -> None:
-        # if-else for each phase
-        current_phase = self.context.current_phase
-        if current_phase == GamePhase.LOBBY:
-            if action == GameAction.JOIN_GAME:
-                if len(self.context.players) < 2:
-                    if player_name:
-                        player = Player(uuid=player_uuid, player_id=len(self.context.players), name=player_name)
-                        # when the second player joined, the game phase is automatically set to GAME_START
-
-                        player_metadata = PlayerMetadata(
-                            game_id=self.game_id,
-                            player_uuid=player.uuid,
-                            player_name=player.name,
-                            opponent_uuid=self.context.players[0].uuid if len(self.context.players) > 0 else None,
-                            opponent_name=self.context.players[0].name if len(self.context.players) > 0 else None
-                        )
-                        self.context.add_player(player)
-                        await self.notify_all("join", player_metadata.model_dump_json())
-                    else:
-                        raise ValueError("Player name and uuid required to create a player")
-                else:
-                    raise ValueError("Game already has two players")
-
-        elif current_phase == GamePhase.GAME_START:
-            if action == GameAction.READY:
-                if self.ready_player_count == 0:
-                    self.ready_player_count += 1
-                    await self.notify_all("ready", player_uuid)
-                elif self.ready_player_count == 1:
-                    self.ready_player_count = 0
-                    await self.notify_all("ready", player_uuid)
-                    self.context.initialize_game()
-
-                    player1 = self.context.player_1
-                    player2 = self.context.player_2
-                    await self.notify_all("init", f"{player1.uuid},{player2.uuid}")
-
-
-        elif current_phase == GamePhase.GAME_INIT:
-            if action == GameAction.ROLL_DICE:
-                self.context.roll_dice()
-                self.context.start_turn()
-                player1 = self.context.player_1
-                player2 = self.context.player_2
-                await self.notify(player1.uuid, "board", self.context.create_board(player1.player_id).model_dump_json())
-                await self.notify(player2.uuid, "board", self.context.create_board(player2.player_id).model_dump_json())
-
-        elif current_phase == GamePhase.TURN_SELECT_FIRST:
-            if action == GameAction.SELECT_PAIR:
-                if pair_index is None:
-                    raise ValueError("Card index required to select a pair")
-                if player_uuid != self.context.first_selector.uuid:
-                    raise ValueError("Only the first selector can choose a pair now")
-                pair = self.context.available_pairs[pair_index]
-                self.context.select_pair(pair)
-                player1 = self.context.player_1
-                player2 = self.context.player_2
-                await self.notify(player1.uuid, "board", self.context.create_board(player1.player_id).model_dump_json())
-                await self.notify(player2.uuid, "board", self.context.create_board(player2.player_id).model_dump_json())
-
-        elif current_phase == GamePhase.TURN_SELECT_SECOND:
-            if action == GameAction.SELECT_PAIR:
-                if pair_index is None:
-                    raise ValueError("Card index required to select a pair")
-                if player_uuid != self.context.second_selector.uuid:
-                    raise ValueError("Only the second selector can choose a pair now")
-                pair = self.context.available_pairs[pair_index]
-                self.context.select_pair(pair)
-                player1 = self.context.player_1
-                player2 = self.context.player_2
-                await self.notify(player1.uuid, "board", self.context.create_board(player1.player_id).model_dump_json())
-                await self.notify(player2.uuid, "board", self.context.create_board(player2.player_id).model_dump_json())
-
-
-        elif current_phase == GamePhase.TURN_COMPLETE:
-            if action == GameAction.ROLL_DICE:
-                if player_uuid != self.context.dice_roller.uuid:
-                    raise ValueError("Only the dice roller can roll the dice")
-
-                if special_card_index is not None and dice_collection_type is not None:
-                    self.context.roll_dice(DiceCollectionType(dice_collection_type))
-                    player = self.context.player_1 if player_uuid == self.context.player_1.uuid else self.context.player_2
-                    seven_card = player.seven_cards[special_card_index]
-                    player.remove_seven_card(seven_card)
-                else:
-                    self.context.roll_dice()
-
-                if self.context.current_phase == GamePhase.TURN_START:
-                    self.context.start_turn()
-                    player1 = self.context.player_1
-                    player2 = self.context.player_2
-                    await self.notify(player1.uuid, "board",
-                                self.context.create_board(player1.player_id).model_dump_json())
-                    await self.notify(player2.uuid, "board",
-                                self.context.create_board(player2.player_id).model_dump_json())
-                elif self.context.current_phase == GamePhase.FINAL_REVIEW:
-                    self.context.start_review()
-                    player1 = self.context.player_1
-                    player2 = self.context.player_2
-                    await self.notify(player1.uuid, "board",
-                                self.context.create_board(player1.player_id).model_dump_json())
-                    await self.notify(player2.uuid, "board",
-                                self.context.create_board(player2.player_id).model_dump_json())
-
-        elif current_phase == GamePhase.FINAL_REVIEW:
-            if action == GameAction.COLOR_CONVERT:
-                if special_card_index is None:
-                    raise ValueError("Special card index required to convert color")
-                if pair_index is None:
-                    raise ValueError("Pair index required to convert color")
-                player = self.context.player_1 if player_uuid == self.context.player_1.uuid else self.context.player_2
-                self.context.convert_color(player.player_id, pair_index, special_card_index)
-                await self.notify(player_uuid, "board", self.context.create_board(player.player_id).model_dump_json())
-
-            elif action == GameAction.END_REVIEW:
-                if self.ready_player_count == 0:
-                    self.ready_player_count += 1
-                    await self.notify_all("end", player_uuid)
-                elif self.ready_player_count == 1:
-                    self.ready_player_count = 0
-                    self.context.end_review()
-
-                    # send over the final result
-                    await self.notify_all("result", self.context.calculate_final_results().model_dump_json())
-
-        elif current_phase == GamePhase.GAME_END:
-            if action == GameAction.READY:
-                if self.ready_player_count == 0:
-                    self.ready_player_count += 1
-                    await self.notify_all("ready", player_uuid)
-                elif self.ready_player_count == 1:
-                    self.ready_player_count = 0
-                    self.context.initialize_game()
-                    await self.notify_all("ready", player_uuid)
+        with self.hold():
+            # look up the transition for the current phase
+            current_phase = self.context.current_phase
+            key = (current_phase, action)
+            transition = TRANSITIONS.get(key)
+            if transition is None:
+                if self.muted:
+                    # a batch is applied whole or not at all, so it may not skip an action
+                    raise ValueError(f"{action.value} is not allowed in {current_phase.value}")
+                if current_phase not in ACTIVE_PHASES:
+                    await self.notify_all("error", player_uuid)
+                return
+
+            request = ActionRequest(player_uuid, action, player_name, pair_index, special_card_index, dice_collection_type)
+            start = time.perf_counter()
+            try:
+                await self._handlers[key](self, request)
+            finally:
+                # a failing handler may have changed part of the state, phase included
+                self.version += 1
+                session_registry.update_phase(self)
+
+            # notify once per transition
+            if transition.boards == BoardUpdate.ALL:
+                await self.notify_boards()
+            elif transition.boards == BoardUpdate.ACTOR:
+                await self.notify_board(player_uuid)
 
+            if self.context.current_phase == GamePhase.GAME_END and not self.muted:
+                self.schedule_expiry()
+            if self.transition_hooks:
+                elapsed = time.perf_counter() - start
+                for hook in self.transition_hooks:
+                    hook(current_phase, action, elapsed)
+
+    @classmethod
+    def add_transition_hook(cls, hook: TransitionHook) -> None:
+        """Register a callback receiving (phase, action, seconds) after every transition."""
+        cls.transition_hooks.append(hook)
+
+    @classmethod
+    def remove_transition_hook(cls, hook: TransitionHook) -> None:
+        cls.transition_hooks.remove(hook)
+
+    # --- transition handlers, one per entry of transitions.TRANSITIONS ---
+
+    async def _on_join(self, request: ActionRequest) -> None:
+        if len(self.context.players) >= 2:
+            raise ValueError("Game already has two players")
+        if not request.player_name:
+            raise ValueError("Player name and uuid required to create a player")
+
+        player = Player(uuid=request.player_uuid, player_id=len(self.context.players), name=request.player_name)
+        opponent = self.context.players[0] if len(self.context.players) > 0 else None
+        player_metadata = PlayerMetadata(
+            game_id=self.game_id,
+            player_uuid=player.uuid,
+            player_name=player.name,
+            opponent_uuid=opponent.uuid if opponent else None,
+            opponent_name=opponent.name if opponent else None
+        )
+        # when the second player joined, the game phase is automatically set to GAME_START
+        self.context.add_player(player)
+        await self.notify_all("join", player_metadata.model_dump_json())
+
+    async def _on_ready(self, request: ActionRequest) -> None:
+        if self.ready_player_count == 0:
+            self.ready_player_count += 1
+            await self.notify_all("ready", request.player_uuid)
+        else:
+            self.ready_player_count = 0
+            await self.notify_all("ready", request.player_uuid)
+            self.context.initialize_game()
+            await self.notify_all("init", f"{self.context.player_1.uuid},{self.context.player_2.uuid}")
+
+    async def _on_initial_roll(self, request: ActionRequest) -> None:
+        self.context.roll_dice()
+        self.context.start_turn()
+
+    async def _on_select_first(self, request: ActionRequest) -> None:
+        if request.player_uuid != self.context.first_selector.uuid:
+            raise ValueError("Only the first selector can choose a pair now")
+        self._select_pair(request)
+
+    async def _on_select_second(self, request: ActionRequest) -> None:
+        if request.player_uuid != self.context.second_selector.uuid:
+            raise ValueError("Only the second selector can choose a pair now")
+        self._select_pair(request)
+
+    def _select_pair(self, request: ActionRequest) -> None:
+        if request.pair_index is None:
+            raise ValueError("Card index required to select a pair")
+        pair = self.context.available_pairs[request.pair_index]
+        self.context.select_pair(pair)
+
+    async def _on_roll(self, request: ActionRequest) -> None:
+        if request.player_uuid != self.context.dice_roller.uuid:
+            raise ValueError("Only the dice roller can roll the dice")
+
+        if request.special_card_index is not None and request.dice_collection_type is not None:
+            self.context.roll_dice(DiceCollectionType(request.dice_collection_type))
+            player = self.context.get_player(request.player_uuid)
+            seven_card = player.seven_cards[request.special_card_index]
+            player.remove_seven_card(seven_card)
         else:
-            await self.notify_all("error", player_uuid)
+            self.context.roll_dice()
+
+        if self.context.current_phase == GamePhase.TURN_START:
+            self.context.start_turn()
+        elif self.context.current_phase == GamePhase.FINAL_REVIEW:
+            self.context.start_review()
+
+    async def _on_convert_color(self, request: ActionRequest) -> None:
+        if request.special_card_index is None:
+            raise ValueError("Special card index required to convert color")
+        if request.pair_index is None:
+            raise ValueError("Pair index required to convert color")
+        player = self.context.get_player(request.player_uuid)
+        self.context.convert_color(player.player_id, request.pair_index, request.special_card_index)
+
+    async def _on_auto_convert(self, request: ActionRequest) -> None:
+        player = self.context.get_player(request.player_uuid)
+        self.context.auto_convert(player.player_id)
+
+    async def _on_end_review(self, request: ActionRequest) -> None:
+        if self.ready_player_count == 0:
+            self.ready_player_count += 1
+            await self.notify_all("end", request.player_uuid)
+        else:
+            self.ready_player_count = 0
+            self.context.end_review()
+            result = self.context.calculate_final_results()
+            # the recorder is replaced, not cleared, by a rematch, so it can be recorded later
+            finished = (result, (self.context.player_1.profile_id, self.context.player_2.profile_id),
+                        self.context.recorder)
+            if self.muted:
+                self._finished.append(finished)
+            else:
+                record_finished_game(*finished)
+
+            # send over the final result
+            await self.notify_all("result", result.model_dump_json())
+
+    async def _on_rematch(self, request: ActionRequest) -> None:
+        if self.ready_player_count == 0:
+            self.ready_player_count += 1
+            await self.notify_all("ready", request.player_uuid)
+        else:
+            self.ready_player_count = 0
+            self.context.initialize_game()
+            await self.notify_all("ready", request.player_uuid)
+
+    async def take_actions(self, actions: List[Dict[str, Any]]) -> None:
+        """
+        Apply a list of take_action keyword arguments in order as a single unit.
+        Either every action is applied or, if one fails or has no transition in its phase, the game
+        is left untouched.
+        Intermediate notifications are suppressed and each player gets one final board.
+        """
+        with self.hold():
+            snapshot, ready_player_count = self.context.snapshot(), self.ready_player_count
+            self.muted = True
+            self._finished.clear()
+            try:
+                for index, action in enumerate(actions):
+                    try:
+                        await self.take_action(**action)
+                    except Exception as e:
+                        raise ValueError(f"Action {index} ({action['action'].value}) failed: {e}") from e
+            except ValueError:
+                self.context.restore(snapshot)
+                self.ready_player_count = ready_player_count
+                self._finished.clear()
+                # keep versions monotonic so no client keeps a board of the discarded actions
+                self.version += 1
+                raise
+            finally:
+                self.muted = False
+                session_registry.update_phase(self)
+
+            finished, self._finished = self._finished, []
+            for game in finished:
+                record_finished_game(*game)
+            if self.context.current_phase == GamePhase.GAME_END:
+                self.schedule_expiry()
+                await self.notify_all("result", self.context.calculate_final_results().model_dump_json())
+            await self.notify_boards()
+
+    def schedule_expiry(self) -> None:
+        """Drop the game once it has ended and nobody acted on it, e.g. to ask for a rematch, for END_GRACE seconds."""
+        if not self.retired and (self._expiry is None or self._expiry.done()):
+            self._expiry = asyncio.create_task(self._expire(self.game_id))
+
+    async def _expire(self, game_id: str) -> None:
+        while True:
+            version = self.version
+            await asyncio.sleep(END_GRACE)
+            if session_registry.get_game(game_id) is not self or self.context.current_phase != GamePhase.GAME_END:
+                return
+            if self.version == version:
+                self._expiry = None
+                await self.close(reason="Game over")
+                return
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        """
+        Drop the game from this worker: unregister it, end its feed and close its sockets.
+        The manager goes back to the pool once nothing holds it any more.
+        """
+        if session_registry.get_game(self.game_id) is self:
+            session_registry.remove(self.game_id)
+        notification_feed.drop(self.game_id)
+        await websocket_manager.close_game(self.game_id, code=code, reason=reason)
+        self.retire()
+
+    def retire(self) -> None:
+        """Give the manager back to the pool, once the game was removed and its holds have ended."""
+        self.retired = True
+        if self.holds == 0:
+            game_pool.release(self)
+
+    @contextmanager
+    def hold(self):
+        """Keep the manager out of the pool while a request, stream or bot uses it."""
+        self.holds += 1
+        try:
+            yield self
+        finally:
+            self.holds -= 1
+            if self.retired and self.holds == 0:
+                game_pool.release(self)
+
+    async def notify_boards(self) -> None:
+        """Send each player their own board."""
+        if self.muted or len(self.context.players) < 2:
+            return
+        for player in (self.context.player_1, self.context.player_2):
+            await self.notify(player.uuid, "board", self.board_json(player.player_id))
+
+    async def notify_board(self, player_uuid: str) -> None:
+        """Send a player their own board."""
+        if self.muted:
+            return
+        player = self.context.get_player(player_uuid)
+        await self.notify(player_uuid, "board", self.board_json(player.player_id))
+
+    def board_json(self, player_id: int) -> str:
+        """Get a player's serialized board, built at most once per version."""
+        cached = self._board_cache.get(player_id)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        board = self.context.create_board(player_id).model_dump_json()
+        self._board_cache[player_id] = (self.version, board)
+        return board
 
     async def notify(self, player_uuid: str, message_type: str, message: str) -> None:
+        # a dropped game has no feed or sockets left to notify
+        if self.muted or self.retired:
+            return
         await websocket_manager.send(self.game_id, [player_uuid], message_type, message)
 
     async def notify_all(self, message_type: str, message: str) -> None:
+        if self.muted or self.retired:
+            return
         await websocket_manager.send(self.game_id, None, message_type, message)
 
     def get_player_uuid(self, player_id: int) -> str:
-        for player in self.context.players:
-            if player.player_id == player_id:
-                return player.uuid
-        raise ValueError("Player not found")
+        player = self.context.get_player_by_seat(player_id)
+        if player is None:
+            raise ValueError("Player not found")
+        return player.uuid
+
+
+        
+
+
+GameManager._handlers = {
+    key: getattr(GameManager, f"_on_{transition.name}") for key, transition in TRANSITIONS.items()
+}
+
+
+class GamePool:
+    """
+    Free list of dropped games. New games reuse their manager, context, random generator and pile,
+    reset in place, instead of allocating them.
+    """
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self.free: List[GameManager] = []
+
+    def acquire(self, game_id: str) -> GameManager:
+        if not self.free:
+            return GameManager(game_id)
+        game_manager = self.free.pop()
+        game_manager.reset(game_id)
+        return game_manager
+
+    def release(self, game_manager: GameManager) -> None:
+        """Hand back a game nothing refers to any more, see GameManager.retire."""
+        if len(self.free) < self.size and game_manager not in self.free:
+            self.free.append(game_manager)
+
+    def clear(self) -> None:
+        self.free.clear()
+
 
-        
\ No newline at end of file
+# Global game pool instance
+game_pool = GamePool()
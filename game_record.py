@@ -0,0 +1,75 @@
+"""
+Compact log of a game's seed, dice and choices, kept while it is played and archived when it ends.
+"""
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from card import Card, CardPair
+from dice import DiceCollectionType
+
+TURNS = 7
+PAIRS_PER_TURN = 3
+HIDDEN_PAIR_SLOT = 7  # conversion bit of the hidden pair, regular pairs use their index
+
+COLLECTION_CODES = {collection: code for code, collection in enumerate(DiceCollectionType)}
+
+
+class RecordState(NamedTuple):
+    """Immutable copy of a recorder. Rolls and offers are never changed once logged, so they are shared."""
+    seed: Optional[int]
+    initial_price: Optional[int]
+    rolls: Tuple[tuple, ...]
+    available: Tuple[List[int], ...]
+    selected: Tuple[Tuple[int, ...], Tuple[int, ...]]  # by player id
+    hidden: Tuple[Tuple[int, int], ...]  # (player id, hidden pair id)
+    sevens: Tuple[Tuple[int, ...], Tuple[int, ...]]  # by player id
+    conversions: Tuple[int, int]  # by player id
+
+
+class GameRecorder:
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = seed
+        self.initial_price: Optional[int] = None
+        self.rolls: List[tuple] = []  # (collection code, dice values, extra, price after) per turn
+        self.available: List[List[int]] = []  # pair ids offered each turn
+        self.selected: Dict[int, List[int]] = {0: [], 1: []}  # player id -> pair ids in turn order
+        self.hidden: Dict[int, int] = {}  # player id -> hidden pair id
+        self.sevens: Dict[int, List[int]] = {0: [], 1: []}  # player id -> seven card ids dealt
+        self.conversions: Dict[int, int] = {0: 0, 1: 0}  # player id -> bitmask of converted pair slots
+
+    def deal(self, player_id: int, hidden_pair: CardPair, seven_cards: List[Card]) -> None:
+        self.hidden[player_id] = hidden_pair.to_index()
+        self.sevens[player_id] = [card.to_index() for card in seven_cards]
+
+    def initial_roll(self, dice_result: List[int], price: int) -> None:
+        self.initial_price = price
+        self.rolls.append((COLLECTION_CODES[DiceCollectionType.INITIAL], list(dice_result), 0, price))
+
+    def roll(self, collection: DiceCollectionType, dice_result: List[int], dice_extra: int, price: int) -> None:
+        self.rolls.append((COLLECTION_CODES[collection], list(dice_result), dice_extra, price))
+
+    def offer(self, pairs: List[CardPair]) -> None:
+        self.available.append([pair.to_index() for pair in pairs])
+
+    def select(self, player_id: int, pair: CardPair) -> None:
+        self.selected[player_id].append(pair.to_index())
+
+    def convert(self, player_id: int, pair_index: int) -> None:
+        # a conversion toggles the color, so converting a pair twice brings it back
+        self.conversions[player_id] ^= 1 << (pair_index if pair_index >= 0 else HIDDEN_PAIR_SLOT)
+
+    def state(self) -> RecordState:
+        return RecordState(self.seed, self.initial_price, tuple(self.rolls), tuple(self.available),
+                           (tuple(self.selected[0]), tuple(self.selected[1])), tuple(self.hidden.items()),
+                           (tuple(self.sevens[0]), tuple(self.sevens[1])), (self.conversions[0], self.conversions[1]))
+
+    @classmethod
+    def from_state(cls, state: RecordState) -> "GameRecorder":
+        recorder = cls(state.seed)
+        recorder.initial_price = state.initial_price
+        recorder.rolls = list(state.rolls)
+        recorder.available = list(state.available)
+        recorder.selected = {player_id: list(pair_ids) for player_id, pair_ids in enumerate(state.selected)}
+        recorder.hidden = dict(state.hidden)
+        recorder.sevens = {player_id: list(card_ids) for player_id, card_ids in enumerate(state.sevens)}
+        recorder.conversions = dict(enumerate(state.conversions))
+        return recorder
@@ -1,22 +1,32 @@
-import asyncio
+from startup import profiling_enabled, startup_profiler
 
-import uvicorn
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from api import app
+if profiling_enabled():
+    startup_profiler.start()
 
+with startup_profiler.phase("import api"):
+    from fastapi.middleware.cors import CORSMiddleware
+    from api import app
 
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
-    allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
-)
+with startup_profiler.phase("build app"):
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allows all origins
+        allow_credentials=True,
+        allow_methods=["*"],  # Allows all methods
+        allow_headers=["*"],  # Allows all headers
+    )
+
+if profiling_enabled():
+    startup_profiler.stop()
+    print(startup_profiler.report())
 
 if __name__ == "__main__":
+    # only needed when running the development server directly
+    import asyncio
+    import uvicorn
+
     asyncio.get_event_loop().set_debug(True)
 
 
@@ -29,4 +39,3 @@ if __name__ == "__main__":
         loop="asyncio",
         log_level="info"  # Set uvicorn log level to info
     )
-
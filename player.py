@@ -6,6 +6,8 @@ from pydantic import BaseModel, Field
 
 from card import Card, CardPair
 from portfolio import Portfolio
+from pricing import PortfolioRisk
+from validation import build_trusted
 
 
 class OpponentView(BaseModel):
@@ -18,6 +20,12 @@ class OpponentView(BaseModel):
     cost: int
     value: int
 
+class RiskView(BaseModel):
+    expected_pnl: float
+    pnl_std: float
+    win_probability: float  # probability of a final P&L above the opponent's visible P&L
+    delta: float  # P&L change per point of price
+
 class PlayerView(BaseModel):
     uuid: str
     player_id: int
@@ -28,12 +36,14 @@ class PlayerView(BaseModel):
     pnl: int
     cost: int
     value: int
+    risk: Optional[RiskView] = None  # until the end of the game, from the exact final price distribution
 
 class Player(BaseModel):
     uuid: str = Field(default_factory=str)
     player_id: int = Field(default_factory=int)
     name: str = Field(default_factory=str)
     portfolio: Portfolio = Field(default_factory=Portfolio)
+    profile_id: Optional[str] = None  # persistent identity used for ratings, None for guests
 
     @property
     def selected_pairs(self) -> List[CardPair]:
@@ -87,28 +97,31 @@ class Player(BaseModel):
         """Get player's total value."""
         return self.portfolio.get_value(stock_price, include_hidden)
 
-    def get_player_view(self, stock_price: Optional[int]) -> PlayerView:
+    def get_player_view(self, stock_price: Optional[int], risk: Optional[PortfolioRisk] = None) -> PlayerView:
         """Get player's view."""
-        return PlayerView(
+        return build_trusted(
+            PlayerView,
             uuid=self.uuid,
             player_id=self.player_id,
             name=self.name,
-            selected_pairs=self.selected_pairs,
-            seven_cards=self.seven_cards,
+            selected_pairs=list(self.selected_pairs),
+            seven_cards=list(self.seven_cards),
             hidden_pair=self.hidden_pair,
             pnl=self.get_pnl(stock_price) if stock_price else 0,
             cost=self.get_cost(),
-            value=self.get_value(stock_price) if stock_price else 0
+            value=self.get_value(stock_price) if stock_price else 0,
+            risk=build_trusted(RiskView, **risk._asdict()) if risk else None
         )
 
     def get_opponent_view(self, stock_price: Optional[int]) -> OpponentView:
         """Get player's view."""
-        return OpponentView(
+        return build_trusted(
+            OpponentView,
             uuid=self.uuid,
             name=self.name,
             player_id=self.player_id,
-            selected_pairs=self.selected_pairs,
-            seven_cards=self.seven_cards,
+            selected_pairs=list(self.selected_pairs),
+            seven_cards=list(self.seven_cards),
             pnl=self.get_pnl(stock_price, False) if stock_price else 0,
             cost=self.get_cost(False),
             value=self.get_value(stock_price, False) if stock_price else 0
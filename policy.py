@@ -0,0 +1,191 @@
+"""
+Precomputed policy and value tables in a fixed-layout file, memory-mapped read-only.
+
+    python -m policy policy.axp --depth 2          # build offline
+    PolicyTable("policy.axp").lookup(context, player_id)
+
+States are summarized by turn, phase, price, the seven cards of both players and the net red exposure
+of both players' visible pairs. Every entry holds the best action of the player to act (the color of
+the pair to pick, or the dice collection to roll), its expected lead and its margin over the next best
+action, from a solver search of a representative state of the summary. Lookups are an index
+computation, and workers mapping the same file share its pages through the page cache.
+"""
+import argparse
+import itertools
+import os
+from math import prod
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+
+import zobrist
+from card import CARD_COUNT, SUITS, CardSuit
+from dice import DiceCollectionType
+from enums import GamePhase
+from game_record import COLLECTION_CODES, TURNS
+from pricing import MAX_PRICE
+from solver import SearchState, Solver, TranspositionTable
+
+MAGIC = b"AXKANPT1"
+HEADER_SIZE = 32  # magic, entry size (uint32), dimensions (uint16 each), reserved
+PHASES = (GamePhase.TURN_SELECT_FIRST, GamePhase.TURN_SELECT_SECOND, GamePhase.TURN_COMPLETE)
+EXPOSURE_LIMIT = 3  # net red pairs are clamped to -3..3
+DIMS = (TURNS, len(PHASES), MAX_PRICE, zobrist.MAX_SEVEN_CARDS + 1, zobrist.MAX_SEVEN_CARDS + 1,
+        2 * EXPOSURE_LIMIT + 1, 2 * EXPOSURE_LIMIT + 1)
+ENTRY_COUNT = prod(DIMS)
+
+PICK_RED, PICK_BLACK = 0, 1  # actions of the selection phases
+NO_ACTION = 0xFF  # entries that were not built
+COLLECTIONS = {code: collection for collection, code in COLLECTION_CODES.items()}
+
+ENTRY_DTYPE = np.dtype([
+    ("action", "u1"),  # PICK_RED / PICK_BLACK, or the DiceCollectionType code of the roll
+    ("value", "<f4"),  # expected final lead of the player to act
+    ("margin", "<f4"),  # lead given up by the next best action
+])
+
+RED_SUITS = frozenset(SUITS.index(suit) for suit in (CardSuit.HEARTS, CardSuit.DIAMONDS))
+
+
+class PolicyEntry(NamedTuple):
+    phase: GamePhase
+    pick_red: Optional[bool]  # in the selection phases
+    collection: Optional[DiceCollectionType]  # in TURN_COMPLETE
+    value: float
+    margin: float
+
+
+def exposure(pair_ids: Iterable[int]) -> int:
+    """Net number of red pairs, clamped to the table's range."""
+    net = sum(1 if (pair_id % CARD_COUNT) // 13 in RED_SUITS else -1 for pair_id in pair_ids)
+    return max(-EXPOSURE_LIMIT, min(net, EXPOSURE_LIMIT))
+
+
+def entry_index(turn: int, phase: GamePhase, price: int, sevens: int, opponent_sevens: int,
+                own_exposure: int, opponent_exposure: int) -> int:
+    """Position of a state summary in the table, row-major over DIMS."""
+    index = 0
+    for value, size in zip((turn - 1, PHASES.index(phase), price - 1, sevens, opponent_sevens,
+                            own_exposure + EXPOSURE_LIMIT, opponent_exposure + EXPOSURE_LIMIT), DIMS):
+        index = index * size + value
+    return index
+
+
+class PolicyTable:
+    def __init__(self, path: str):
+        self.path = path
+        _check_header(path)
+        self.entries = np.memmap(path, dtype=ENTRY_DTYPE, mode="r", offset=HEADER_SIZE, shape=(ENTRY_COUNT,))
+        # field views of the mapping, reading one element of a field is cheaper than a whole record
+        self.actions, self.values, self.margins = (self.entries[name] for name in ENTRY_DTYPE.names)
+
+    def get(self, turn: int, phase: GamePhase, price: int, sevens: int, opponent_sevens: int,
+            own_exposure: int, opponent_exposure: int) -> Optional[PolicyEntry]:
+        index = entry_index(turn, phase, price, sevens, opponent_sevens, own_exposure, opponent_exposure)
+        action = int(self.actions[index])
+        if action == NO_ACTION:
+            return None
+        select = phase != GamePhase.TURN_COMPLETE
+        return PolicyEntry(phase, action == PICK_RED if select else None, None if select else COLLECTIONS[action],
+                           float(self.values[index]), float(self.margins[index]))
+
+    def lookup(self, context, player_id: int) -> Optional[PolicyEntry]:
+        """Entry of a player about to act in a game, None when the state is not covered."""
+        if context.current_phase not in PHASES:
+            return None
+        player = context.get_player_by_seat(player_id)
+        opponent = context.get_player_by_seat(1 - player_id)
+        own = [pair.to_index() for pair in player.selected_pairs]
+        if player.hidden_pair is not None:
+            own.append(player.hidden_pair.to_index())
+        return self.get(context.current_turn, context.current_phase, context.current_price,
+                        len(player.seven_cards), len(opponent.seven_cards),
+                        exposure(own), exposure(pair.to_index() for pair in opponent.selected_pairs))
+
+
+def _card(suit: CardSuit, rank: int) -> int:
+    return SUITS.index(suit) * 13 + rank - 1
+
+
+# cards of the representative states: the exposure pairs, then one pair of each color on offer
+RED_BIG = [_card(suit, rank) for rank in (10, 11, 9) for suit in (CardSuit.HEARTS, CardSuit.DIAMONDS)]
+BLACK_BIG = [_card(suit, rank) for rank in (10, 11, 9) for suit in (CardSuit.SPADES, CardSuit.CLUBS)]
+SMALL = [_card(suit, rank) for rank in (3, 4) for suit in SUITS]
+OFFERED = (_card(CardSuit.CLUBS, 2) * CARD_COUNT + _card(CardSuit.HEARTS, 12),
+           _card(CardSuit.HEARTS, 2) * CARD_COUNT + _card(CardSuit.SPADES, 12))  # red queen, black queen
+
+
+def representative_state(turn: int, phase: GamePhase, price: int, sevens: int, opponent_sevens: int,
+                         own_exposure: int, opponent_exposure: int) -> SearchState:
+    """A search state with the given summary, the player to act holding `own_exposure`."""
+    probe = SearchState(0, phase, turn, price, (), ((), ()), (None, None), (0, 0))
+    mover = probe.mover()
+    red, black, small = iter(RED_BIG), iter(BLACK_BIG), iter(SMALL)
+    held = [(), ()]
+    for player_id, net in ((mover, own_exposure), (1 - mover, opponent_exposure)):
+        bigs = red if net > 0 else black
+        held[player_id] = tuple(next(small) * CARD_COUNT + next(bigs) for _ in range(abs(net)))
+    seven_cards = [0, 0]
+    seven_cards[mover], seven_cards[1 - mover] = sevens, opponent_sevens
+    offered = () if phase == GamePhase.TURN_COMPLETE else OFFERED
+    key = zobrist.state_hash(phase, turn, price, offered, held, (None, None), tuple(seven_cards))
+    return SearchState(key, phase, turn, price, offered, tuple(held), (None, None), tuple(seven_cards))
+
+
+def build_policy_table(path: str, depth: int = 1, turns: Iterable[int] = range(1, TURNS + 1)) -> int:
+    """Solve the representative state of every summary of `turns` and write the table. Returns the entries built."""
+    entries = np.zeros(ENTRY_COUNT, dtype=ENTRY_DTYPE)
+    entries["action"] = NO_ACTION
+    solver = Solver(TranspositionTable())
+    built = 0
+    for key in itertools.product(turns, PHASES, range(1, MAX_PRICE + 1), *(range(size) for size in DIMS[3:5]),
+                                 *(range(-EXPOSURE_LIMIT, EXPOSURE_LIMIT + 1),) * 2):
+        state = representative_state(*key)
+        analysis = solver.search(state, depth, time_budget=float("inf"))
+        sign = 1 if state.mover() == 0 else -1
+        best = analysis.moves[0]
+        entry = entries[entry_index(*key)]
+        if best.collection is not None:
+            entry["action"] = COLLECTION_CODES[best.collection]
+        else:
+            entry["action"] = PICK_RED if best.pair_id == OFFERED[0] else PICK_BLACK
+        entry["value"] = sign * best.value
+        entry["margin"] = sign * (best.value - analysis.moves[1].value) if len(analysis.moves) > 1 else 0.0
+        built += 1
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_header())
+        f.write(entries.tobytes())
+    os.replace(tmp_path, path)
+    return built
+
+
+def _header() -> bytes:
+    header = MAGIC + np.array(ENTRY_DTYPE.itemsize, dtype="<u4").tobytes() + np.array(DIMS, dtype="<u2").tobytes()
+    return header + bytes(HEADER_SIZE - len(header))
+
+
+def _check_header(path: str) -> None:
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a policy table")
+    if header != _header():
+        raise ValueError(f"{path} was built with a different table layout")
+    if os.path.getsize(path) != HEADER_SIZE + ENTRY_COUNT * ENTRY_DTYPE.itemsize:
+        raise ValueError(f"{path} is truncated")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a policy table offline.")
+    parser.add_argument("path")
+    parser.add_argument("--depth", type=int, default=1, help="solver depth in plies for every entry")
+    parser.add_argument("--turns", type=int, nargs="*", default=list(range(1, TURNS + 1)))
+    args = parser.parse_args()
+    built = build_policy_table(args.path, args.depth, args.turns)
+    print(f"{built} entries written to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,152 @@
 """
 Portfolio module for managing a player's selected card pairs and calculating portfolio metrics.
 """
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, List, NamedTuple, Optional, Tuple
+from pydantic import BaseModel, Field, PrivateAttr
+import zobrist
 from card import Card, CardPair
+from pricing import MAX_PRICE, MIN_PRICE, pnl_by_price_id, value_by_price_id
+
+NO_PRICES = (0,) * (MAX_PRICE + 1)
+
+
+class PortfolioTotals(NamedTuple):
+    """Running totals of a portfolio's pairs, value and P&L at every final price indexed by price."""
+    visible_cost: int
+    cost: int
+    visible_value: Tuple[int, ...]
+    value: Tuple[int, ...]
+    visible_pnl: Tuple[int, ...]
+    pnl: Tuple[int, ...]
+    # zobrist hashes by player id 0 and 1, see zobrist.game_hash
+    held_keys: Tuple[int, int]  # of the regular pairs
+    hidden_keys: Tuple[int, int]  # of the hidden pair
+    seven_keys: Tuple[int, int]  # of which seven cards are held
+
+
+NO_TOTALS = PortfolioTotals(0, 0, NO_PRICES, NO_PRICES, NO_PRICES, NO_PRICES, (0, 0), (0, 0), (0, 0))
+
+
+def _add(vector: Tuple[int, ...], sign: int, other: Tuple[int, ...]) -> Tuple[int, ...]:
+    return tuple(a + sign * b for a, b in zip(vector, other))
+
+
+class PortfolioState(NamedTuple):
+    """Immutable copy of a portfolio, sharing its cards and pairs."""
+    regular_pairs: Tuple[CardPair, ...]
+    hidden_pairs: Tuple[CardPair, ...]
+    seven_cards: Tuple[Card, ...]
+    totals: PortfolioTotals
+
 
 class Portfolio(BaseModel):
     regular_pairs: List[CardPair] = Field(default_factory=list)  # Pairs selected during turns
     hidden_pairs: List[CardPair] = Field(default_factory=list)  # Hidden pair selected during turn 7
     seven_cards: List[Card] = Field(default_factory=list)  # Seven cards for special actions
+    # kept up to date by the methods below so reading them does not re-price every pair
+    _totals: PortfolioTotals = PrivateAttr(default=NO_TOTALS)
+    _state: Optional[PortfolioState] = PrivateAttr(default=None)  # until the next change
+
+    def model_post_init(self, __context: Any) -> None:
+        for pair in self.regular_pairs:
+            self._add_totals(pair, 1, hidden=False)
+        for pair in self.hidden_pairs:
+            self._add_totals(pair, 1, hidden=True)
+        for card in self.seven_cards:
+            self._toggle_seven_card(card)
+
+    @property
+    def totals(self) -> PortfolioTotals:
+        # read straight from the private storage, pydantic's __getattr__ for private attributes takes microseconds
+        return self.__pydantic_private__["_totals"]
+
+    def _add_totals(self, pair: CardPair, sign: int, hidden: bool) -> None:
+        totals = self.totals
+        pair_id = pair.to_index()
+        cost, value, pnl = sign * pair.cost, value_by_price_id(pair_id), pnl_by_price_id(pair_id)
+        # XOR adds and removes alike
+        held_keys, hidden_keys = totals.held_keys, totals.hidden_keys
+        if hidden:
+            hidden_keys = (hidden_keys[0] ^ zobrist.HIDDEN[0][pair_id], hidden_keys[1] ^ zobrist.HIDDEN[1][pair_id])
+        else:
+            held_keys = (held_keys[0] ^ zobrist.HELD[0][pair_id], held_keys[1] ^ zobrist.HELD[1][pair_id])
+        self._totals = PortfolioTotals(
+            totals.visible_cost if hidden else totals.visible_cost + cost, totals.cost + cost,
+            totals.visible_value if hidden else _add(totals.visible_value, sign, value),
+            _add(totals.value, sign, value),
+            totals.visible_pnl if hidden else _add(totals.visible_pnl, sign, pnl), _add(totals.pnl, sign, pnl),
+            held_keys, hidden_keys, totals.seven_keys)
+
+    def _toggle_seven_card(self, card: Card) -> None:
+        keys, card_id = self.totals.seven_keys, card.to_index()
+        self._totals = self.totals._replace(seven_keys=(keys[0] ^ zobrist.SEVEN_CARD[0][card_id],
+                                                        keys[1] ^ zobrist.SEVEN_CARD[1][card_id]))
+
+    def search_key(self, player_id: int, hidden: bool) -> int:
+        """Part of zobrist.state_hash for the portfolio held by a player id, with or without its hidden pair."""
+        totals = self.totals
+        key = totals.held_keys[player_id] ^ zobrist.SEVENS[player_id][len(self.seven_cards)]
+        return key ^ totals.hidden_keys[player_id] if hidden else key
+
+    def key(self, player_id: int) -> int:
+        """Part of zobrist.game_hash for the portfolio held by a player id."""
+        totals = self.totals
+        return (totals.held_keys[player_id] ^ totals.hidden_keys[player_id] ^ totals.seven_keys[player_id]
+                ^ zobrist.SEVENS[player_id][len(self.seven_cards)])
+
+    def state(self) -> PortfolioState:
+        """Immutable copy of the portfolio, the same object until it changes."""
+        if self._state is None:
+            self._state = PortfolioState(tuple(self.regular_pairs), tuple(self.hidden_pairs), tuple(self.seven_cards),
+                                         self.totals)
+        return self._state
+
+    def restore(self, state: PortfolioState) -> None:
+        """Set the portfolio back to a state, without re-pricing its pairs."""
+        self.regular_pairs = list(state.regular_pairs)
+        self.hidden_pairs = list(state.hidden_pairs)
+        self.seven_cards = list(state.seven_cards)
+        self._totals = state.totals
+        self._state = state
+
+    def pnl_by_price(self, include_hidden: bool = True) -> Tuple[int, ...]:
+        """P&L at every final price, indexed by price."""
+        return self.totals.pnl if include_hidden else self.totals.visible_pnl
 
     def get_cost(self, include_hidden: bool = True) -> int:
         """Calculate total cost of all pairs."""
-        cost = sum([pair.cost for pair in self.regular_pairs])
-        if include_hidden:
-            return cost + sum([pair.cost for pair in self.hidden_pairs])
-        return cost
-        
+        return self.totals.cost if include_hidden else self.totals.visible_cost
+
     def get_value(self, stock_price: int, include_hidden: bool = True) -> int:
         """Calculate total value based on given stock price."""
-        value = sum([pair.get_value(stock_price) for pair in self.regular_pairs])
-        if include_hidden:
-            return value + sum([pair.get_value(stock_price) for pair in self.hidden_pairs])
-        return value
-        
+        if MIN_PRICE <= stock_price <= MAX_PRICE:
+            return (self.totals.value if include_hidden else self.totals.visible_value)[stock_price]
+        pairs = self.regular_pairs + self.hidden_pairs if include_hidden else self.regular_pairs
+        return sum(pair.get_value(stock_price) for pair in pairs)
+
     def get_pnl(self, stock_price: int, include_hidden: bool = True) -> int:
         """Calculate profit and loss (total value - total cost)."""
         return self.get_value(stock_price, include_hidden) - self.get_cost(include_hidden)
-        
+
     def add_pair(self, pair: CardPair) -> None:
         """Add a regular pair to the portfolio."""
         self.regular_pairs.append(pair)
+        self._add_totals(pair, 1, hidden=False)
+        self._state = None
             
     def add_hidden_pair(self, pair: CardPair) -> None:
         """Add a hidden pair to the portfolio."""
         self.hidden_pairs.append(pair)
-
+        self._add_totals(pair, 1, hidden=True)
+        self._state = None
         
     def add_seven_card(self, card: Card) -> None:
         """Add a seven card to the portfolio."""
         if card.rank.value != 7:
             raise ValueError("Card must be a seven card")
         self.seven_cards.append(card)
+        self._toggle_seven_card(card)
+        self._state = None
             
     def remove_seven_card(self, special_card: Card) -> None:
         """Use and remove a seven card if available."""
@@ -49,9 +154,11 @@ class Portfolio(BaseModel):
         for card in self.seven_cards:
             if card == special_card:
                 self.seven_cards.remove(card)
+                self._toggle_seven_card(card)
                 flag = True
         if not flag:
             raise ValueError("Card not found in seven cards")
+        self._state = None
         
     def has_seven_card(self) -> bool:
         """Check if portfolio has any seven cards."""
@@ -60,12 +167,20 @@ class Portfolio(BaseModel):
     def convert_pair_color(self, pair_index: int) -> None:
         """Convert color of a specific pair (for turn 8)."""
         if 0 <= pair_index < len(self.regular_pairs):
-            self.regular_pairs[pair_index] = self.regular_pairs[pair_index].convert_big_card_color()
+            pairs, index, hidden = self.regular_pairs, pair_index, False
         elif pair_index == -1 and len(self.hidden_pairs) >= 1:
-            self.hidden_pairs[0] = self.hidden_pairs[0].convert_big_card_color()
+            pairs, index, hidden = self.hidden_pairs, 0, True
+        else:
+            return
+        self._add_totals(pairs[index], -1, hidden)
+        pairs[index] = pairs[index].convert_big_card_color()
+        self._add_totals(pairs[index], 1, hidden)
+        self._state = None
 
     def reset(self) -> None:
         """Reset portfolio for a new game."""
         self.regular_pairs = []
         self.hidden_pairs = []
-        self.seven_cards = []
\ No newline at end of file
+        self.seven_cards = []
+        self._totals = NO_TOTALS
+        self._state = None
@@ -0,0 +1,159 @@
+"""
+Exact stock price distributions and expected pair values.
+
+The price moves by the dice sum of one roll per turn and wraps around within 1..20, so the final price
+is a Markov chain over 20 states. Distributions are cached by (price, rolls, collection), which makes
+every query after the first a dictionary lookup.
+"""
+import itertools
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from card import CardPair
+from dice import DiceCollectionType, create_dice_collection
+
+MIN_PRICE = 1
+MAX_PRICE = 20
+PRICES = range(MIN_PRICE, MAX_PRICE + 1)
+LAST_TURN = 7
+
+Distribution = Tuple[float, ...]  # probability of each price, indexed by price (index 0 unused)
+
+
+def wrap_price(price: int) -> int:
+    """Same wrap-around as GameContext.update_price."""
+    if price <= 0:
+        return price + 20
+    if price > 20:
+        return price - 20
+    return price
+
+
+def rolls_remaining(turn: int) -> int:
+    """Rolls still to come when pairs are selected in a turn: this turn's and one per later turn."""
+    return LAST_TURN - turn + 1
+
+
+@lru_cache(maxsize=None)
+def roll_distribution(collection: DiceCollectionType = DiceCollectionType.REGULAR) -> Dict[int, float]:
+    """Probability of each price change of one roll, modifier included."""
+    dice = create_dice_collection(collection)
+    extra = {DiceCollectionType.SOFT_LANDING: 1, DiceCollectionType.SUPPLY_SHOCK: -1}.get(collection, 0)
+    outcomes: Dict[int, float] = {}
+    weight = 1 / 6 ** len(dice)
+    for values in itertools.product(range(1, 7), repeat=len(dice)):
+        change = sum(v if die.is_positive else -v for die, v in zip(dice, values)) + extra
+        outcomes[change] = outcomes.get(change, 0.0) + weight
+    return outcomes
+
+
+@lru_cache(maxsize=None)
+def transition_matrix(collection: DiceCollectionType = DiceCollectionType.REGULAR) -> Tuple[Distribution, ...]:
+    """Row p is the price distribution after one roll from price p."""
+    rows = [tuple([0.0] * (MAX_PRICE + 1))]
+    for price in PRICES:
+        row = [0.0] * (MAX_PRICE + 1)
+        for change, probability in roll_distribution(collection).items():
+            row[wrap_price(price + change)] += probability
+        rows.append(tuple(row))
+    return tuple(rows)
+
+
+def step(distribution: Distribution, collection: DiceCollectionType = DiceCollectionType.REGULAR) -> Distribution:
+    """Distribution after one more roll."""
+    matrix = transition_matrix(collection)
+    result = [0.0] * (MAX_PRICE + 1)
+    for price in PRICES:
+        probability = distribution[price]
+        if probability:
+            row = matrix[price]
+            for next_price in PRICES:
+                result[next_price] += probability * row[next_price]
+    return tuple(result)
+
+
+@lru_cache(maxsize=4096)
+def price_distribution(price: int, rolls: int,
+                       collection: DiceCollectionType = DiceCollectionType.REGULAR) -> Distribution:
+    """Final price distribution from `price` after `rolls` rolls, the first of them with `collection`."""
+    if rolls <= 0:
+        return tuple(1.0 if p == price else 0.0 for p in range(MAX_PRICE + 1))
+    if rolls == 1:
+        return transition_matrix(collection)[price]
+    return step(price_distribution(price, rolls - 1, collection))
+
+
+@lru_cache(maxsize=None)
+def value_by_price_id(pair_id: int) -> Tuple[int, ...]:
+    """A pair's value at every final price, indexed by price."""
+    pair = CardPair.from_index(pair_id)
+    return (0,) + tuple(pair.get_value(price) for price in PRICES)
+
+
+@lru_cache(maxsize=None)
+def pnl_by_price_id(pair_id: int) -> Tuple[int, ...]:
+    """A pair's P&L at every final price, indexed by price."""
+    pair = CardPair.from_index(pair_id)
+    return (0,) + tuple(pair.get_pnl(price) for price in PRICES)
+
+
+def expected_pnl(pnl: Tuple[int, ...], distribution: Distribution) -> float:
+    return sum(distribution[p] * pnl[p] for p in PRICES)
+
+
+def profit_probability(pnl: Tuple[int, ...], distribution: Distribution) -> float:
+    return sum(distribution[p] for p in PRICES if pnl[p] > 0)
+
+
+class PortfolioRisk(NamedTuple):
+    expected_pnl: float
+    pnl_std: float
+    win_probability: float  # probability of a final P&L above the opponent's visible P&L
+    delta: float  # P&L change per point of price, at the current price
+
+
+@lru_cache(maxsize=4096)
+def portfolio_risk(price: int, rolls: int, pnl: Tuple[int, ...], opponent_pnl: Tuple[int, ...]) -> PortfolioRisk:
+    """Risk of a portfolio given its P&L at every final price, assuming regular rolls until the end."""
+    distribution = price_distribution(price, rolls)
+    mean = expected_pnl(pnl, distribution)
+    variance = sum(distribution[p] * (pnl[p] - mean) ** 2 for p in PRICES)
+    win = sum(distribution[p] for p in PRICES if pnl[p] > opponent_pnl[p])
+    delta = (pnl[wrap_price(price + 1)] - pnl[wrap_price(price - 1)]) / 2
+    return PortfolioRisk(mean, variance ** 0.5, win, delta)
+
+
+class PairHint(NamedTuple):
+    pair_index: int  # index in the available pairs
+    expected_pnl: float
+    profit_probability: float
+    # expected P&L lead over an opponent taking the best remaining pair, None when not asked for
+    vs_best_response: Optional[float] = None
+
+
+@lru_cache(maxsize=4096)
+def pair_values(price: int, rolls: int, pair_ids: Tuple[int, ...]) -> Tuple[Tuple[float, float], ...]:
+    """
+    Expected final P&L and probability of profit of each pair, assuming regular rolls until the end.
+    Keyed by the offer and the price only, so every request of a turn shares one computation.
+    """
+    distribution = price_distribution(price, rolls)
+    return tuple((expected_pnl(pnl_by_price_id(pair_id), distribution),
+                  profit_probability(pnl_by_price_id(pair_id), distribution)) for pair_id in pair_ids)
+
+
+def pair_hints(price: int, rolls: int, pair_ids: Tuple[int, ...], best_response: bool = False) -> Tuple[PairHint, ...]:
+    """
+    Available pairs ranked by expected final P&L, or by the lead over an opponent taking the best
+    remaining pair with best_response, the ranking a first selector asks for.
+    """
+    values = pair_values(price, rolls, pair_ids)
+    hints = []
+    for index, (expected, probability) in enumerate(values):
+        lead = None
+        if best_response:
+            others = [other for j, (other, _) in enumerate(values) if j != index]
+            lead = expected - max(others) if others else expected
+        hints.append(PairHint(index, expected, probability, lead))
+    key = (lambda hint: hint.vs_best_response) if best_response else (lambda hint: hint.expected_pnl)
+    return tuple(sorted(hints, key=key, reverse=True))
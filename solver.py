@@ -0,0 +1,298 @@
+"""
+Expectiminimax search of the rest of a game, from one seat's point of view.
+
+Players pick pairs and dice collections, dice outcomes are chance nodes weighted by their exact
+probabilities and the pairs drawn for a turn are a chance node over a few samples of the cards the
+seat has not seen. Values are the expected final P&L lead of player id 0, both players converting
+optimally in the final review. Below the depth budget a state is valued by its expected lead with
+regular rolls until the end and no more picks.
+
+States are keyed by Zobrist hashes updated move by move, and values are kept in a bounded
+transposition table shared by searches. Searches deepen one ply at a time until the depth or time
+budget runs out, so they always return the deepest completed answer.
+"""
+import random
+import time
+from functools import lru_cache
+from operator import mul
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import zobrist
+from conversion import best_conversions
+from dice import DiceCollectionType
+from dice_advice import SPECIAL_COLLECTIONS, final_pnl
+from enums import GamePhase
+from game_record import TURNS
+from pricing import price_distribution, roll_distribution, rolls_remaining, wrap_price
+
+DRAW_SAMPLES = 3  # sampled draws of the next turn's pairs
+DEFAULT_DEPTH = 6
+MAX_DEPTH = 3 * TURNS  # three plies per turn
+DEFAULT_TIME_BUDGET = 1.0  # seconds
+TABLE_SIZE = 1 << 18
+TIME_CHECK_INTERVAL = 1024  # nodes between clock reads
+
+SMALL_CARD_IDS = tuple(suit * 13 + rank - 1 for suit in range(4) for rank in range(1, 7))
+BIG_CARD_IDS = tuple(suit * 13 + rank - 1 for suit in range(4) for rank in range(8, 14))
+SEARCH_PHASES = (GamePhase.TURN_SELECT_FIRST, GamePhase.TURN_SELECT_SECOND, GamePhase.TURN_COMPLETE,
+                 GamePhase.FINAL_REVIEW)
+
+
+class SearchState(NamedTuple):
+    key: int  # zobrist hash of the other fields
+    phase: GamePhase
+    turn: int
+    price: int
+    offered: Tuple[int, ...]  # pair ids on offer and not taken yet
+    held: Tuple[Tuple[int, ...], Tuple[int, ...]]  # pair ids picked by player id 0 and 1, in turn order
+    hidden: Tuple[Optional[int], Optional[int]]  # only the analysed seat's hidden pair is known
+    sevens: Tuple[int, int]
+
+    def first_selector(self) -> int:
+        return 0 if self.turn % 2 == 1 else 1
+
+    def mover(self) -> int:
+        """Player id of the player to act, the second selector rolls."""
+        if self.phase == GamePhase.TURN_SELECT_FIRST:
+            return self.first_selector()
+        return 1 - self.first_selector()
+
+
+class MoveValue(NamedTuple):
+    pair_id: Optional[int]  # for pair selections
+    collection: Optional[DiceCollectionType]  # for rolls
+    value: float  # expected final lead of player id 0 after the move
+
+
+class Analysis(NamedTuple):
+    value: float  # expected final lead of player id 0 under best play
+    moves: Tuple[MoveValue, ...]  # moves of the player to act, best for them first
+    conversions: Tuple[int, ...]  # in the final review, the pair indexes the player to analyse should flip
+    depth: int  # deepest completed search
+    nodes: int
+    table_probes: int
+    table_hits: int
+    elapsed: float
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def root_state(context, player_id: int) -> SearchState:
+    """Search state of a game in one of SEARCH_PHASES, as seen by a seat."""
+    if context.current_phase not in SEARCH_PHASES:
+        raise ValueError(f"Cannot search from phase {context.current_phase.value}")
+    players = (context.player_1, context.player_2)
+    taken = set(context.selected_pair_index.values())
+    offered = tuple(pair.to_index() for i, pair in enumerate(context.available_pairs) if i not in taken)
+    held = tuple(tuple(pair.to_index() for pair in player.selected_pairs) for player in players)
+    hidden = tuple(players[i].hidden_pair.to_index() if i == player_id and players[i].hidden_pair else None
+                   for i in (0, 1))
+    sevens = tuple(len(player.seven_cards) for player in players)
+    return SearchState(context.search_key(player_id), context.current_phase, context.current_turn, context.current_price, offered, held,
+                       hidden, sevens)
+
+
+def final_lead(state: SearchState) -> float:
+    """Exact lead of player id 0 once the price is final."""
+    return (final_pnl(state.held[0], state.hidden[0], state.sevens[0])[state.price]
+            - final_pnl(state.held[1], state.hidden[1], state.sevens[1])[state.price])
+
+
+@lru_cache(maxsize=65536)
+def expected_final_pnl(price: int, rolls: int, pair_ids: Tuple[int, ...], hidden_pair_id: Optional[int],
+                       seven_cards: int, collection: DiceCollectionType = DiceCollectionType.REGULAR) -> float:
+    """Expected final P&L of a portfolio that gets no more pairs, the next roll being with `collection`."""
+    return sum(map(mul, price_distribution(price, rolls, collection), final_pnl(pair_ids, hidden_pair_id, seven_cards)))
+
+
+def expected_lead(state: SearchState, collection: DiceCollectionType = DiceCollectionType.REGULAR) -> float:
+    """Expected final lead of player id 0 with no more pairs, each portfolio's expectation being cached on its own."""
+    rolls = rolls_remaining(state.turn)
+    return (expected_final_pnl(state.price, rolls, state.held[0], state.hidden[0], state.sevens[0], collection)
+            - expected_final_pnl(state.price, rolls, state.held[1], state.hidden[1], state.sevens[1], collection))
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of (key, depth, generation, value) slots indexed by the low bits of the key.
+    A slot is replaced by a search at least as deep, or by anything once it is from an older search.
+    """
+
+    def __init__(self, size: int = TABLE_SIZE):
+        if size & (size - 1):
+            raise ValueError("Table size must be a power of two")
+        self.mask = size - 1
+        self.slots: List[Optional[tuple]] = [None] * size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self) -> None:
+        self.generation += 1
+
+    def probe(self, key: int, depth: int) -> Optional[float]:
+        self.probes += 1
+        slot = self.slots[key & self.mask]
+        if slot is not None and slot[0] == key and slot[1] >= depth:
+            self.hits += 1
+            return slot[3]
+        return None
+
+    def store(self, key: int, depth: int, value: float) -> None:
+        index = key & self.mask
+        slot = self.slots[index]
+        if slot is None or slot[2] != self.generation or depth >= slot[1] or slot[0] == key:
+            self.slots[index] = (key, depth, self.generation, value)
+            self.stores += 1
+
+    def clear(self) -> None:
+        self.__init__(self.mask + 1)
+
+
+class Solver:
+    def __init__(self, table: Optional[TranspositionTable] = None):
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes = 0
+        self.deadline = float("inf")
+
+    def search(self, state: SearchState, max_depth: int = DEFAULT_DEPTH,
+               time_budget: float = DEFAULT_TIME_BUDGET, player_id: int = 0) -> Analysis:
+        """
+        Best play for the player to act, deepening until `max_depth` plies or `time_budget` seconds.
+        In the final review, the conversions of `player_id` instead.
+        """
+        start = time.perf_counter()
+        probes, hits = self.table.probes, self.table.hits
+        self.table.new_search()
+        self.nodes = 0
+        if state.phase == GamePhase.FINAL_REVIEW:
+            plan = best_conversions(state.price, state.held[player_id], state.hidden[player_id],
+                                    state.sevens[player_id])
+            return Analysis(final_lead(state), (), plan.pair_indexes, 0, 0, 0, 0, time.perf_counter() - start)
+
+        # depth 1 only evaluates leaves, so it always completes
+        self.deadline = float("inf")
+        moves = list(self.moves(state, 1))
+        depth = 1
+        self.deadline = start + time_budget
+        for next_depth in range(2, max_depth + 1):
+            try:
+                moves = list(self.moves(state, next_depth))
+            except _OutOfTime:
+                break
+            depth = next_depth
+        sign = 1 if state.mover() == 0 else -1
+        moves.sort(key=lambda move: sign * move.value, reverse=True)
+        return Analysis(moves[0].value, tuple(moves), (), depth, self.nodes, self.table.probes - probes,
+                        self.table.hits - hits, time.perf_counter() - start)
+
+    def value(self, state: SearchState, depth: int) -> float:
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise _OutOfTime()
+        if state.phase == GamePhase.FINAL_REVIEW:
+            return final_lead(state)
+        if depth <= 0:
+            return expected_lead(state)
+
+        cached = self.table.probe(state.key, depth)
+        if cached is not None:
+            return cached
+        values = [move.value for move in self.moves(state, depth)]
+        best = max(values) if state.mover() == 0 else min(values)
+        self.table.store(state.key, depth, best)
+        return best
+
+    def moves(self, state: SearchState, depth: int) -> Iterator[MoveValue]:
+        """Every move of the player to act with its value, searched `depth - 1` plies deeper."""
+        if state.phase == GamePhase.TURN_COMPLETE:
+            collections = [DiceCollectionType.REGULAR]
+            if state.sevens[state.mover()]:
+                collections += SPECIAL_COLLECTIONS
+            for collection in collections:
+                yield MoveValue(None, collection, self.roll_value(state, collection, depth - 1))
+            return
+        for pair_id in state.offered:
+            yield MoveValue(pair_id, None, self.value(pick(state, pair_id), depth - 1))
+
+    def roll_value(self, state: SearchState, collection: DiceCollectionType, depth: int) -> float:
+        """Expected value over the dice outcomes of a roll, and the pairs drawn for the next turn."""
+        if depth <= 0 or state.turn >= TURNS:
+            # no more choices before the end: the exact expectation over the final price
+            self.nodes += 1
+            return expected_lead(spend_seven_card(state, collection), collection)
+        total = 0.0
+        for change, probability in roll_distribution(collection).items():
+            total += probability * self.draw_value(roll(state, collection, wrap_price(state.price + change)), depth)
+        return total
+
+    def draw_value(self, state: SearchState, depth: int) -> float:
+        """Average value over sampled draws of the turn's pairs from the cards the seat has not seen."""
+        seen = set()
+        for pair_ids in state.held + (tuple(p for p in state.hidden if p is not None),):
+            for pair_id in pair_ids:
+                seen.update(divmod(pair_id, zobrist.CARD_COUNT))
+        small = [card for card in SMALL_CARD_IDS if card not in seen]
+        big = [card for card in BIG_CARD_IDS if card not in seen]
+        rng = random.Random(state.key)  # same samples every time the state is searched
+        total = 0.0
+        for _ in range(DRAW_SAMPLES):
+            pairs = tuple(s * zobrist.CARD_COUNT + b for s, b in zip(rng.sample(small, 3), rng.sample(big, 3)))
+            total += self.value(offer(state, pairs), depth)
+        return total / DRAW_SAMPLES
+
+
+def pick(state: SearchState, pair_id: int) -> SearchState:
+    """State after the player to act picks an offered pair."""
+    mover = state.mover()
+    next_phase = (GamePhase.TURN_SELECT_SECOND if state.phase == GamePhase.TURN_SELECT_FIRST
+                  else GamePhase.TURN_COMPLETE)
+    held = list(state.held)
+    held[mover] = held[mover] + (pair_id,)
+    key = (state.key ^ zobrist.OFFERED[pair_id] ^ zobrist.HELD[mover][pair_id]
+           ^ zobrist.PHASE[state.phase] ^ zobrist.PHASE[next_phase])
+    return state._replace(key=key, phase=next_phase, held=tuple(held),
+                          offered=tuple(p for p in state.offered if p != pair_id))
+
+
+def spend_seven_card(state: SearchState, collection: DiceCollectionType) -> SearchState:
+    """The roller gives up a seven card for a special roll."""
+    if collection == DiceCollectionType.REGULAR:
+        return state
+    roller = state.mover()
+    sevens = list(state.sevens)
+    sevens[roller] -= 1
+    key = state.key ^ zobrist.SEVENS[roller][state.sevens[roller]] ^ zobrist.SEVENS[roller][sevens[roller]]
+    return state._replace(key=key, sevens=tuple(sevens))
+
+
+def roll(state: SearchState, collection: DiceCollectionType, price: int) -> SearchState:
+    """State after a roll landing on `price`: the next turn before its pairs are drawn, or the final review."""
+    state = spend_seven_card(state, collection)
+    turn, phase = (state.turn, GamePhase.FINAL_REVIEW) if state.turn >= TURNS else (state.turn + 1,
+                                                                                  GamePhase.TURN_SELECT_FIRST)
+    key = (state.key ^ zobrist.TURN[state.turn] ^ zobrist.TURN[turn] ^ zobrist.PHASE[state.phase]
+           ^ zobrist.PHASE[phase] ^ zobrist.PRICE[state.price] ^ zobrist.PRICE[price])
+    for pair_id in state.offered:  # the pair nobody took is discarded
+        key ^= zobrist.OFFERED[pair_id]
+    return state._replace(key=key, phase=phase, turn=turn, price=price, offered=())
+
+
+def offer(state: SearchState, pair_ids: Tuple[int, ...]) -> SearchState:
+    """State after the turn's pairs are drawn."""
+    key = state.key
+    for pair_id in pair_ids:
+        key ^= zobrist.OFFERED[pair_id]
+    return state._replace(key=key, offered=pair_ids)
+
+
+# Global transposition table instance, one per process, shared by the searches it runs one at a time
+transposition_table = TranspositionTable()
+
+
+def analyse(state: SearchState, max_depth: int, time_budget: float, player_id: int) -> Analysis:
+    """Search with the process's table, e.g. in the server's process pool, away from its event loop."""
+    return Solver(transposition_table).search(state, max_depth, time_budget, player_id)
@@ -0,0 +1,178 @@
+"""
+Cold-start helpers: import profiling, the prebuilt OpenAPI schema and serializer warm-up.
+
+    AXKAN_PROFILE_STARTUP=1 hypercorn main:app   # log import and app construction times
+    python startup.py --export-openapi           # regenerate openapi.json after changing routes
+"""
+import hashlib
+import importlib.abc
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OPENAPI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openapi.json")
+ROUTES_SIGNATURE_KEY = "x-routes-signature"
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("AXKAN_PROFILE_STARTUP", "") not in ("", "0")
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, name: str, profiler: "StartupProfiler"):
+        self.loader = loader
+        self.name = name
+        self.profiler = profiler
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profiler.imports.append((self.name, time.perf_counter() - start))
+
+    def __getattr__(self, item):
+        return getattr(self.loader, item)
+
+
+class StartupProfiler(importlib.abc.MetaPathFinder):
+    """Times every module import (including the modules it imports) and named startup phases."""
+
+    def __init__(self):
+        self.imports: List[Tuple[str, float]] = []
+        self.phases: List[Tuple[str, float]] = []
+        self._finding = False
+
+    def start(self) -> None:
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def stop(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        if self._finding:
+            return None
+        self._finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, fullname, self)
+                    return spec
+            return None
+        finally:
+            self._finding = False
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self, top: int = 25) -> str:
+        lines = ["Startup profile"]
+        lines += [f"  {name:<40} {seconds * 1000:8.1f} ms" for name, seconds in self.phases]
+        lines.append("  slowest imports (cumulative):")
+        for name, seconds in sorted(self.imports, key=lambda item: -item[1])[:top]:
+            lines.append(f"    {name:<38} {seconds * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+startup_profiler = StartupProfiler()
+
+
+def _route_lines(routes, prefix: str = ""):
+    for route in routes:
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            # routers added with include_router are kept as a single entry holding the prefix
+            yield from _route_lines(included.routes, prefix + route.include_context.prefix)
+        elif hasattr(route, "path"):
+            methods = ','.join(sorted(getattr(route, 'methods', None) or []))
+            endpoint = getattr(route, "endpoint", None)
+            signature = inspect.signature(endpoint) if endpoint is not None else ""
+            yield f"{methods} {prefix}{route.path} {signature} {getattr(route, 'response_model', None)}"
+
+
+def routes_signature(app) -> str:
+    """
+    Cheap fingerprint of the app's routes, their parameters and response models, used to detect a stale
+    openapi.json. Changes inside a model are not seen, tests/test_startup.py compares the whole schema.
+    """
+    lines = sorted(_route_lines(app.routes))
+    lines.append(f"{app.title} {app.version}")
+    return hashlib.sha1("\n".join(lines).encode()).hexdigest()
+
+
+def build_openapi(app) -> Dict:
+    from fastapi.openapi.utils import get_openapi
+    schema = get_openapi(title=app.title, version=app.version, routes=app.routes)
+    schema[ROUTES_SIGNATURE_KEY] = routes_signature(app)
+    return schema
+
+
+def use_prebuilt_openapi(app, path: str = OPENAPI_PATH) -> None:
+    """
+    Serve the checked-in schema instead of generating it on the first /openapi.json or /docs request.
+    Falls back to generation when the file is missing or was built for different routes.
+    """
+    generate = app.openapi
+
+    def openapi() -> Dict:
+        if app.openapi_schema is None:
+            app.openapi_schema = _load_openapi(app, path) or generate()
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+
+def _load_openapi(app, path: str) -> Optional[Dict]:
+    if os.getenv("AXKAN_PREBUILT_OPENAPI", "1") == "0" or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        schema = json.load(f)
+    if schema.get(ROUTES_SIGNATURE_KEY) != routes_signature(app):
+        logger.warning("openapi.json is out of date, regenerate it with `python startup.py --export-openapi`")
+        return None
+    return schema
+
+
+def warm_serializers() -> None:
+    """Build and dump a throwaway board and result once so the first real request does not pay for it."""
+    from enums import GamePhase
+    from game_context import GameContext
+    from player import Player
+    context = GameContext()
+    context.add_player(Player(uuid="warm-0", name="warm-0"))
+    context.add_player(Player(uuid="warm-1", name="warm-1"))
+    context.initialize_game()
+    context.set_initial_price(4)
+    context.current_phase = GamePhase.TURN_START
+    context.start_turn()
+    for player_id in (0, 1):
+        context.create_board(player_id).model_dump_json()
+    context.calculate_final_results().model_dump_json()
+
+if __name__ == "__main__":
+    if "--export-openapi" in sys.argv:
+        from api import app
+        with open(OPENAPI_PATH, "w") as f:
+            json.dump(build_openapi(app), f)
+        print(f"Wrote {OPENAPI_PATH}")
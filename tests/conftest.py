@@ -0,0 +1,24 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from api import app
+from api.registry import session_registry
+from validation import set_strict_validation
+
+API_KEY = "test-key"
+CLUSTER_SECRET = "test-cluster-secret"
+
+# validate the boards and results the server builds, which production trusts
+set_strict_validation(True)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Create a test client authorized with the internal API key."""
+    monkeypatch.setattr(api, "api_key_internal", API_KEY)
+    monkeypatch.setattr(api, "cluster_secret", CLUSTER_SECRET)
+    session_registry.clear()
+    test_client = TestClient(app, headers={api.API_KEY_NAME: API_KEY})
+    yield test_client
+    session_registry.clear()
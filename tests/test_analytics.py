@@ -0,0 +1,80 @@
+"""
+Tests for the aggregate game statistics.
+"""
+import asyncio
+import json
+
+import pytest
+
+from api.analytics import GameStats, PNL_BINS, game_stats, pnl_bin
+from api.registry import session_registry
+
+from tests.test_batch_actions import batch, full_game_actions, start_game
+
+
+@pytest.fixture
+def stats():
+    game_stats.reset()
+    yield game_stats
+    game_stats.reset()
+
+
+def play_game(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    assert batch(client, game_id, full_game_actions(p1, p2)).status_code == 200
+    return context.calculate_final_results()
+
+
+def test_finished_games_are_counted(client, stats):
+    results = [play_game(client) for _ in range(3)]
+
+    response = client.get("/api/v1/games/stats")
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["games"] == 3
+    assert sum(summary["wins"]) == 3
+    assert summary["wins"][0] == sum(result.winner == 0 for result in results)
+    assert sum(summary["pnl"][0]) == sum(summary["pnl"][1]) == 3
+    assert summary["final_price"][results[0].stock_price] >= 1
+    assert sum(summary["picks"]["red"]) + sum(summary["picks"]["black"]) == 3 * 14
+    assert summary["seven_cards_used"] == [6, 0, 0]
+    assert summary["win_rate"][0] + summary["win_rate"][1] + summary["draw_rate"] == pytest.approx(1)
+
+
+def test_pnl_bins_are_clamped():
+    assert pnl_bin(-1000) == 0
+    assert pnl_bin(1000) == PNL_BINS - 1
+    assert pnl_bin(-60) == 0 and pnl_bin(-55) == 1
+
+
+def test_snapshot_round_trip_and_merge(client, stats, tmp_path):
+    play_game(client)
+    path = str(tmp_path / "stats.json")
+    stats.save(path)
+    assert not stats.dirty
+
+    restored = GameStats()
+    assert restored.load(path)
+    assert restored.to_dict() == stats.to_dict()
+    assert not GameStats().load(str(tmp_path / "missing.json"))
+
+    restored.merge(stats)
+    assert restored.games == 2
+    assert sum(restored.wins) == 2
+
+
+def test_periodic_snapshots_are_written_on_cancel(client, stats, tmp_path):
+    path = tmp_path / "stats.json"
+    play_game(client)
+
+    async def run():
+        task = asyncio.create_task(stats.snapshot_periodically(str(path), interval=3600))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert GameStats.from_dict(json.loads(path.read_text())).games == 1
@@ -0,0 +1,105 @@
+"""
+Tests for the game archive and seeded replays.
+"""
+import numpy as np
+import pytest
+
+from archive import HEADER_SIZE, NO_PAIR, RECORD_DTYPE, GameArchive, open_archive, pack_game, win_rate
+from enums import GamePhase
+from game_context import GameContext
+from game_record import HIDDEN_PAIR_SLOT
+from player import Player
+
+from tests.test_analytics import play_game
+from api.registry import session_registry
+
+
+def new_context(seed=None):
+    context = GameContext()
+    context.add_player(Player(uuid="a", name="A"))
+    context.add_player(Player(uuid="b", name="B"))
+    context.initialize_game(seed)
+    return context
+
+
+def test_seed_replays_draws_and_rolls():
+    first, second = new_context(1234), new_context(1234)
+    for context in (first, second):
+        context.roll_dice()
+        context.start_turn()
+    assert first.player_1.uuid == second.player_1.uuid
+    assert first.player_1.hidden_pair == second.player_1.hidden_pair
+    assert first.available_pairs == second.available_pairs
+    assert first.dice_result == second.dice_result
+
+
+def test_finished_games_are_archived(client, tmp_path, monkeypatch):
+    path = str(tmp_path / "games.axa")
+    monkeypatch.setenv("AXKAN_ARCHIVE_PATH", path)
+    result = play_game(client)
+    context = next(iter(session_registry.games.values())).context
+
+    records = open_archive(path)
+    assert len(records) == 1
+    record = records[0]
+    assert record["seed"] == context.seed
+    assert record["prices"][-1] == result.stock_price
+    assert record["winner"] == result.winner
+    assert list(record["pnl"]) == [result.player_1.pnl, result.player_2.pnl]
+    assert list(record["selected"][0]) == [pair.to_index() for pair in context.player_1.selected_pairs]
+    assert record["hidden"][1] == context.player_2.hidden_pair.to_index()
+    assert NO_PAIR not in record["available"]
+
+
+def test_conversions_are_recorded():
+    context = new_context(7)
+    context.roll_dice()
+    context.start_turn()
+    context.select_pair(context.available_pairs[0])
+    context.current_phase = GamePhase.FINAL_REVIEW
+    assert context.convert_color(0, 0, 0)
+    assert context.convert_color(0, -1, 0)
+    assert context.recorder.conversions[0] == 1 | 1 << HIDDEN_PAIR_SLOT
+
+
+def test_double_conversion_is_not_recorded():
+    context = new_context(7)
+    context.roll_dice()
+    context.start_turn()
+    context.select_pair(context.available_pairs[0])
+    context.current_phase = GamePhase.FINAL_REVIEW
+    original = context.player_1.portfolio.regular_pairs[0].to_index()
+    assert context.convert_color(0, 0, 0)
+    assert context.convert_color(0, 0, 0)
+    assert context.player_1.portfolio.regular_pairs[0].to_index() == original
+    assert context.recorder.conversions[0] == 0
+
+
+def test_torn_record_is_dropped(tmp_path):
+    path = str(tmp_path / "games.axa")
+    archive = GameArchive(path)
+    record = np.zeros((), dtype=RECORD_DTYPE)
+    record["winner"] = 1
+    archive.append(record)
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 10)  # a crash in the middle of an append
+
+    archive = GameArchive(path)
+    archive.append(record)
+    assert len(open_archive(path)) == 2
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"x" * HEADER_SIZE)
+    with pytest.raises(ValueError):
+        open_archive(str(path))
+
+
+def test_win_rate():
+    records = np.zeros(4, dtype=RECORD_DTYPE)
+    records["winner"] = [0, 1, 1, -1]
+    records["prices"][:, 1] = [15, 16, 3, 4]
+    assert win_rate(records) == (0.25, 0.5, 0.25)
+    assert win_rate(records, records["prices"][:, 1] >= 15) == (0.5, 0.5, 0.0)
+    assert win_rate(records, records["prices"][:, 1] > 20) == (0.0, 0.0, 0.0)
@@ -0,0 +1,127 @@
+"""
+Tests for the batched action endpoint.
+"""
+import json
+
+from api.analytics import game_stats
+from api.registry import session_registry
+from enums import GamePhase
+
+from tests.conftest import API_KEY
+
+
+def start_game(client):
+    first = client.post("/api/v1/games/join", json={"player_name": "Player 1"}).json()
+    second = client.post("/api/v1/games/join", json={"player_name": "Player 2"}).json()
+    return first["game_id"], first["player_uuid"], second["player_uuid"]
+
+
+def full_game_actions(p1, p2):
+    actions = [{"player_uuid": p1, "action": "roll_dice"}]
+    for turn in range(1, 8):
+        first, second = (p1, p2) if turn % 2 == 1 else (p2, p1)
+        actions += [
+            {"player_uuid": first, "action": "select_pair", "pair_index": 0},
+            {"player_uuid": second, "action": "select_pair", "pair_index": 1},
+            {"player_uuid": second, "action": "roll_dice"},
+        ]
+    actions += [
+        {"player_uuid": p1, "action": "end_review"},
+        {"player_uuid": p2, "action": "end_review"},
+    ]
+    return actions
+
+
+def batch(client, game_id, actions):
+    return client.post(f"/api/v1/games/{game_id}/actions:batch", json={"actions": actions})
+
+
+def test_full_game_in_two_batches(client):
+    game_id, a, b = start_game(client)
+    response = batch(client, game_id, [
+        {"player_uuid": a, "action": "ready"},
+        {"player_uuid": b, "action": "ready"},
+    ])
+    assert response.status_code == 200
+    assert response.json()["current_phase"] == "game_init"
+
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    with client.websocket_connect(f"/api/v1/games/ws?game_id={game_id}&player_uuid={p1}&API_KEY_INTERNAL={API_KEY}") as ws:
+        response = batch(client, game_id, full_game_actions(p1, p2))
+        assert response.status_code == 200
+        assert response.json()["applied"] == 24
+        assert response.json()["current_phase"] == "game_end"
+
+        # only the result and one final board are sent
+        result = ws.receive_json()
+        assert result["type"] == "result"
+        board = ws.receive_json()
+        assert board["type"] == "board"
+        assert json.loads(board["content"])["current_phase"] == "game_end"
+
+    assert len(context.player_1.selected_pairs) == 7
+    assert session_registry.games_in_phase(GamePhase.GAME_END) == [game_id]
+
+
+def test_failed_batch_is_rolled_back(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    game_manager = session_registry.get_game(game_id)
+    p1, p2 = game_manager.context.player_1.uuid, game_manager.context.player_2.uuid
+
+    response = batch(client, game_id, [
+        {"player_uuid": p1, "action": "roll_dice"},
+        {"player_uuid": p1, "action": "select_pair", "pair_index": 0},
+        {"player_uuid": p1, "action": "select_pair", "pair_index": 1},  # not p1's turn
+    ])
+    assert response.status_code == 400
+    assert "Action 2" in response.json()["detail"]
+    assert game_manager.context.current_phase == GamePhase.GAME_INIT
+    assert game_manager.context.player_1.selected_pairs == []
+    assert session_registry.games_in_phase(GamePhase.GAME_INIT) == [game_id]
+
+
+def test_out_of_phase_action_fails_the_batch(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    game_manager = session_registry.get_game(game_id)
+    p1, p2 = game_manager.context.player_1.uuid, game_manager.context.player_2.uuid
+
+    response = batch(client, game_id, [
+        {"player_uuid": p1, "action": "roll_dice"},
+        {"player_uuid": p1, "action": "end_review"},  # no review before the game ends
+        {"player_uuid": p1, "action": "select_pair", "pair_index": 0},
+    ])
+    assert response.status_code == 400
+    assert "Action 1" in response.json()["detail"]
+    assert game_manager.context.current_phase == GamePhase.GAME_INIT
+    assert game_manager.context.player_1.selected_pairs == []
+
+
+def test_rolled_back_game_end_is_not_recorded(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    games = game_stats.games
+
+    rematch = [{"player_uuid": p1, "action": "ready"}, {"player_uuid": p2, "action": "ready"},
+               {"player_uuid": p1, "action": "roll_dice"}]
+    response = batch(client, game_id, full_game_actions(p1, p2) + rematch +
+                     [{"player_uuid": p1, "action": "select_pair", "pair_index": 99}])
+    assert response.status_code == 400
+    assert game_stats.games == games
+
+    # a game ended then rematched within one batch is recorded once it commits
+    response = batch(client, game_id, full_game_actions(p1, p2) + rematch)
+    assert response.status_code == 200
+    assert game_stats.games == games + 1
+
+
+def test_batch_rejects_outsiders(client):
+    game_id, a, b = start_game(client)
+    response = batch(client, game_id, [{"player_uuid": "someone", "action": "ready"}])
+    assert response.status_code == 403
+    response = batch(client, "missing", [{"player_uuid": a, "action": "ready"}])
+    assert response.status_code == 404
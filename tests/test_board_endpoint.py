@@ -0,0 +1,51 @@
+"""
+Tests for the conditional board endpoint.
+"""
+from api.registry import session_registry
+
+
+def start_game(client):
+    first = client.post("/api/v1/games/join", json={"player_name": "Player 1"}).json()
+    second = client.post("/api/v1/games/join", json={"player_name": "Player 2"}).json()
+    return first["game_id"], first["player_uuid"], second["player_uuid"]
+
+
+def test_board_etag_and_not_modified(client):
+    game_id, a, b = start_game(client)
+    url = f"/api/v1/games/{game_id}/board"
+
+    response = client.get(url, params={"player_uuid": a})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.json()["current_phase"] == "game_start"
+    assert response.json()["current_player"]["uuid"] == a
+
+    response = client.get(url, params={"player_uuid": a}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": b})
+    response = client.get(url, params={"player_uuid": a}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_board_is_built_once_per_version(client, monkeypatch):
+    game_id, a, b = start_game(client)
+    context = session_registry.get_game(game_id).context
+    calls = []
+    create_board = context.create_board
+    monkeypatch.setattr(context, "create_board", lambda player_id: calls.append(player_id) or create_board(player_id))
+
+    for _ in range(3):
+        client.get(f"/api/v1/games/{game_id}/board", params={"player_uuid": a})
+        client.get(f"/api/v1/games/{game_id}/board", params={"player_uuid": b})
+    assert sorted(calls) == [0, 1]
+
+
+def test_board_requires_two_players(client):
+    first = client.post("/api/v1/games/join", json={"player_name": "Player 1"}).json()
+    response = client.get(f"/api/v1/games/{first['game_id']}/board", params={"player_uuid": first["player_uuid"]})
+    assert response.status_code == 409
+    response = client.get(f"/api/v1/games/{first['game_id']}/board", params={"player_uuid": "someone"})
+    assert response.status_code == 403
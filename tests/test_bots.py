@@ -0,0 +1,114 @@
+"""
+Tests for the bots that fill empty seats.
+"""
+import asyncio
+import random
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from api import app
+from api.bots import BotManager
+from api.registry import session_registry
+from bot import Difficulty, choose_move, random_move
+from enums import GamePhase
+from game_manager import GameManager
+from solver import Solver, root_state
+
+from tests.conftest import API_KEY, CLUSTER_SECRET
+from tests.test_solver import context_at_turn_start
+
+
+def test_choose_move_by_difficulty():
+    state = root_state(context_at_turn_start(), 0)
+    assert random_move(state, random.Random(1)).pair_id in state.offered
+    assert choose_move(state, Difficulty.EASY, 0.0).pair_id in state.offered
+
+    shallow = Solver().search(state, 1).moves[0]
+    assert choose_move(state, Difficulty.MEDIUM, 0.1) == (shallow.pair_id, None)
+    start = time.perf_counter()
+    assert choose_move(state, Difficulty.HARD, 0.2).pair_id in state.offered
+    assert time.perf_counter() - start < 2
+
+
+def test_choose_move_stops_at_its_deadline():
+    state = root_state(context_at_turn_start(), 0)
+    # a choice dequeued after its deadline does not search at all
+    start = time.perf_counter()
+    assert choose_move(state, Difficulty.HARD, 10.0, deadline=time.time() - 1).pair_id in state.offered
+    assert time.perf_counter() - start < 0.1
+    # a budget longer than the time left is cut to the deadline
+    start = time.perf_counter()
+    assert choose_move(state, Difficulty.HARD, 10.0, deadline=time.time() + 0.2).pair_id in state.offered
+    assert time.perf_counter() - start < 2
+
+
+@pytest.mark.asyncio
+async def test_bots_play_a_game_to_the_end():
+    bots = BotManager()
+    game_manager = GameManager("bot-game")
+    session_registry.register(game_manager)
+    try:
+        easy = await bots.add(game_manager, Difficulty.EASY)
+        medium = await bots.add(game_manager, Difficulty.MEDIUM)
+        deadline = time.monotonic() + 60
+        while game_manager.context.current_phase != GamePhase.GAME_END and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        assert game_manager.context.current_phase == GamePhase.GAME_END
+        # each seat selects once per turn and the second selector rolls
+        assert easy.moves + medium.moves == 7 * 3
+        assert medium.timeouts == 0
+        # a game without players left ends its bots
+        session_registry.remove(game_manager.game_id)
+        await asyncio.wait_for(asyncio.gather(easy.task, medium.task), 10)
+        assert bots.bots == {}
+    finally:
+        session_registry.clear()
+        await bots.shutdown()
+
+
+def wait_for_phase(game_manager, phase, timeout=10):
+    deadline = time.monotonic() + timeout
+    while game_manager.context.current_phase != phase and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return game_manager.context.current_phase
+
+
+def test_join_with_a_bot(monkeypatch):
+    monkeypatch.setattr(api, "api_key_internal", API_KEY)
+    session_registry.clear()
+    # entered, so the bots' tasks keep running between requests
+    with TestClient(app, headers={api.API_KEY_NAME: API_KEY}) as client:
+        joined = client.post("/api/v1/games/join", json={"player_name": "Human", "bot": "easy"}).json()
+        assert joined["opponent_name"] == "Bot (easy)"
+        game_manager = session_registry.get_game(joined["game_id"])
+        client.post("/api/v1/games/ready", params={"game_id": joined["game_id"], "player_uuid": joined["player_uuid"]})
+        assert wait_for_phase(game_manager, GamePhase.GAME_INIT) == GamePhase.GAME_INIT
+
+        waiting = client.post("/api/v1/games/join", json={"player_name": "Waiting"}).json()
+        url = f"/api/v1/games/{waiting['game_id']}/bot"
+        assert client.post(url, params={"player_uuid": joined["player_uuid"]}).status_code == 403
+        response = client.post(url, params={"player_uuid": waiting["player_uuid"], "difficulty": "hard"})
+        assert response.status_code == 200 and response.json()["opponent_name"] == "Bot (hard)"
+        assert client.post(url, params={"player_uuid": waiting["player_uuid"]}).status_code == 409
+    session_registry.clear()
+
+
+def test_bot_moves_with_its_game(monkeypatch):
+    monkeypatch.setattr(api, "api_key_internal", API_KEY)
+    monkeypatch.setattr(api, "cluster_secret", CLUSTER_SECRET)
+    session_registry.clear()
+    cluster = {"AXKAN-CLUSTER": CLUSTER_SECRET}
+    with TestClient(app, headers={api.API_KEY_NAME: API_KEY}) as client:
+        joined = client.post("/api/v1/games/join", json={"player_name": "Human", "bot": "easy"}).json()
+        game_id = joined["game_id"]
+        exported = client.post(f"/internal/games/{game_id}/export", headers=cluster).json()
+        assert [bot[1] for bot in exported["bots"]] == ["easy"]
+        assert client.post("/internal/games/import", headers=cluster, json=exported).status_code == 200
+
+        game_manager = session_registry.get_game(game_id)
+        client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": joined["player_uuid"]})
+        assert wait_for_phase(game_manager, GamePhase.GAME_INIT) == GamePhase.GAME_INIT
+    session_registry.clear()
@@ -0,0 +1,157 @@
+"""
+Tests for the WebSocket message buses.
+"""
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from api.bus import Broker, BrokerBus, DeliveryError, InProcessBus, MessageBus
+from api.websocket import WebSocketManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+@pytest.mark.asyncio
+async def test_in_process_bus_delivers_locally():
+    manager = WebSocketManager(InProcessBus())
+    ws_1, ws_2 = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(ws_1, "game", "1")
+    await manager.connect(ws_2, "game", "2")
+
+    await manager.send("game", ["2"], "board", "{}")
+    await manager.send("game", None, "ready", "1")
+    assert ws_1.sent == [{"type": "ready", "content": "1"}]
+    assert ws_2.sent == [{"type": "board", "content": "{}"}, {"type": "ready", "content": "1"}]
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_broker_relays_to_worker_holding_connection():
+    with tempfile.TemporaryDirectory() as socket_dir:
+        broker = Broker(os.path.join(socket_dir, "broker.sock"))
+        await broker.start()
+        owner = WebSocketManager(BrokerBus(broker.path))  # runs the game, no sockets
+        holder = WebSocketManager(BrokerBus(broker.path))  # holds the player's socket
+        other = WebSocketManager(BrokerBus(broker.path))  # unrelated worker
+        ws = FakeWebSocket()
+        other_ws = FakeWebSocket()
+        try:
+            await holder.connect(ws, "game", "1")
+            await other.connect(other_ws, "other-game", "3")
+            await wait_for(lambda: "game" in broker.subscribers)
+
+            for i in range(5):
+                await owner.send("game", ["1"], "board", str(i))
+            await wait_for(lambda: len(ws.sent) == 5)
+            assert [m["content"] for m in ws.sent] == ["0", "1", "2", "3", "4"]
+            assert other_ws.sent == []
+
+            await holder.disconnect(ws, "game", "1")
+            await wait_for(lambda: "game" not in broker.subscribers)
+        finally:
+            for manager in (owner, holder, other):
+                await manager.bus.close()
+            await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_broker_batches_frames_per_tick():
+    with tempfile.TemporaryDirectory() as socket_dir:
+        broker = Broker(os.path.join(socket_dir, "broker.sock"))
+        await broker.start()
+        batches = []
+        bus = BrokerBus(broker.path)
+        holder = BrokerBus(broker.path)
+
+        async def deliver(frames):
+            batches.append(frames)
+        holder.bind(deliver)
+        bus.bind(deliver)
+        try:
+            await holder.subscribe("game")
+            await wait_for(lambda: "game" in broker.subscribers)
+            assert await bus.wait_connected(2.0)
+            for i in range(10):
+                await bus.publish(["game", None, "board", str(i)], local=False)
+            await wait_for(lambda: sum(len(b) for b in batches) == 10)
+            assert len(batches) == 1
+        finally:
+            await bus.close()
+            await holder.close()
+            await broker.close()
+
+
+def test_message_bus_is_abstract():
+    with pytest.raises(TypeError):
+        MessageBus()
+
+
+class BrokenWebSocket(FakeWebSocket):
+    async def send_json(self, data):
+        raise ConnectionError("gone")
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_raises_after_trying_every_connection():
+    manager = WebSocketManager(InProcessBus())
+    ws = FakeWebSocket()
+    await manager.connect(BrokenWebSocket(), "game", "1")
+    await manager.connect(ws, "game", "2")
+    with pytest.raises(DeliveryError):
+        await manager.send("game", None, "ready", "1")
+    assert ws.sent == [{"type": "ready", "content": "1"}]
+
+
+@pytest.mark.asyncio
+async def test_bus_reconnects_and_subscribes_again(monkeypatch):
+    monkeypatch.setattr("api.bus.RECONNECT_MIN_DELAY", 0.01)
+    with tempfile.TemporaryDirectory() as socket_dir:
+        path = os.path.join(socket_dir, "broker.sock")
+        holder, bus = BrokerBus(path), BrokerBus(path)
+        received = []
+
+        async def deliver(frames):
+            received.extend(frames)
+        holder.bind(deliver)
+        bus.bind(deliver)
+        # subscribed before the broker is up, published while it is down
+        await holder.subscribe("game")
+        await bus.publish(["game", None, "board", "0"], local=False)
+        broker = Broker(path)
+        await broker.start()
+        try:
+            await wait_for(lambda: received == [["game", None, "board", "0"]])
+
+            # the broker restarts: the holder reconnects and subscribes again
+            await broker.close()
+            await wait_for(lambda: not holder.connected)
+            broker = Broker(path)
+            await broker.start()
+            await wait_for(lambda: "game" in broker.subscribers)
+            assert await bus.wait_connected(2.0)
+            await bus.publish(["game", None, "board", "1"], local=False)
+            await wait_for(lambda: len(received) == 2)
+        finally:
+            await bus.close()
+            await holder.close()
+            await broker.close()
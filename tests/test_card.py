@@ -121,3 +121,18 @@ def test_big_card_color_conversion():
     assert converted_pair.small_card.suit == CardSuit.HEARTS  # small card unchanged
     assert converted_pair.big_card.suit == CardSuit.SPADES  # big card converted
     assert converted_pair.big_card.rank == CardRank.KING  # rank unchanged
+
+
+def test_card_and_pair_indexes():
+    """Test the compact ids used by the game archive."""
+    ids = set()
+    for suit in CardSuit:
+        for rank in CardRank:
+            card = Card(suit=suit, rank=rank)
+            assert Card.from_index(card.to_index()) == card
+            ids.add(card.to_index())
+    assert ids == set(range(52))
+
+    pair = CardPair(small_card=Card(suit=CardSuit.CLUBS, rank=CardRank.SIX),
+                    big_card=Card(suit=CardSuit.HEARTS, rank=CardRank.KING))
+    assert CardPair.from_index(pair.to_index()) == pair
@@ -0,0 +1,76 @@
+"""
+Tests for the seven card conversion solver.
+"""
+import itertools
+import random
+
+from card import Card, CardPair, CardRank, CardSuit
+from conversion import HIDDEN_PAIR_INDEX, best_conversions, conversion_gain
+from pricing import PRICES
+from api.registry import session_registry
+
+from tests.test_batch_actions import batch, full_game_actions, start_game
+
+
+# small cards are A-6 and big cards 8-K
+PAIRS = [CardPair(small_card=Card(suit=suit, rank=CardRank(small)), big_card=Card(suit=big_suit, rank=CardRank(big)))
+         for suit in CardSuit for small in range(1, 7) for big_suit in CardSuit for big in range(8, 14)]
+
+
+def brute_force(price, pair_ids, hidden_pair_id, seven_cards):
+    """Best total P&L over every way of spending up to `seven_cards` flips, flipping twice included."""
+    slots = list(pair_ids) + ([hidden_pair_id] if hidden_pair_id is not None else [])
+    best = None
+    for used in range(seven_cards + 1):
+        for flips in itertools.product(range(len(slots)), repeat=used):
+            pairs = [CardPair.from_index(pair_id) for pair_id in slots]
+            for index in flips:
+                pairs[index] = pairs[index].convert_big_card_color()
+            total = sum(pair.get_pnl(price) for pair in pairs)
+            best = total if best is None else max(best, total)
+    return best
+
+
+def test_best_conversions_match_brute_force():
+    rng = random.Random(7)
+    for _ in range(30):
+        ids = [pair.to_index() for pair in rng.sample(PAIRS, 8)]
+        price, seven_cards = rng.choice(PRICES), rng.randint(0, 2)
+        plan = best_conversions(price, tuple(ids[:7]), ids[7], seven_cards)
+        current = sum(CardPair.from_index(pair_id).get_pnl(price) for pair_id in ids)
+        assert current + plan.total_gain == brute_force(price, ids[:7], ids[7], seven_cards)
+        assert len(plan.pair_indexes) <= seven_cards
+        assert all(gain > 0 for gain in plan.gains)
+
+
+def test_hidden_pair_and_gain():
+    # a red king is worth nothing at 5, flipping it to black is worth 8
+    red_king = CardPair(small_card=Card(suit=CardSuit.CLUBS, rank=CardRank.TWO),
+                        big_card=Card(suit=CardSuit.HEARTS, rank=CardRank.KING))
+    assert conversion_gain(red_king.to_index(), 5) == 8
+    plan = best_conversions(5, (), red_king.to_index(), 2)
+    assert plan.pair_indexes == (HIDDEN_PAIR_INDEX,) and plan.total_gain == 8
+    assert best_conversions(5, (), red_king.to_index(), 0).pair_indexes == ()
+
+
+def test_auto_convert_endpoint(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    params = {"player_uuid": p1}
+    assert client.get(f"/api/v1/games/{game_id}/conversions", params=params).status_code == 409
+
+    assert batch(client, game_id, full_game_actions(p1, p2)[:-2]).status_code == 200
+    response = client.get(f"/api/v1/games/{game_id}/conversions", params=params)
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["seven_cards"] == 2
+
+    before = context.calculate_final_results().player_1.pnl
+    response = client.post("/api/v1/games/auto-convert", params={"game_id": game_id, **params})
+    assert response.status_code == 200
+    assert context.calculate_final_results().player_1.pnl == before + plan["total_gain"]
+    assert len(context.player_1.seven_cards) == 2 - len(plan["conversions"])
+    # nothing is left to gain
+    assert client.get(f"/api/v1/games/{game_id}/conversions", params=params).json()["total_gain"] == 0
@@ -0,0 +1,79 @@
+"""
+Tests for the odds of the pairs still to be drawn.
+"""
+import itertools
+import random
+
+import pytest
+
+from deck import BIG_MASK, SMALL_MASK, deck_odds, odds_by_counts, seen_mask
+from enums import GamePhase
+from api.registry import session_registry
+
+from tests.test_batch_actions import batch, full_game_actions, start_game
+
+SMALL_IDS = [card_id for card_id in range(52) if SMALL_MASK >> card_id & 1]
+BIG_IDS = [card_id for card_id in range(52) if BIG_MASK >> card_id & 1]
+
+
+def breakeven(small_id, big_id):
+    small_rank, big_rank = small_id % 13 + 1, big_id % 13 + 1
+    return f">={big_rank + small_rank}" if big_id // 13 < 2 else f"<={big_rank - small_rank}"
+
+
+def test_odds_match_enumerating_every_draw():
+    rng = random.Random(4)
+    unseen_small, unseen_big = rng.sample(SMALL_IDS, 6), rng.sample(BIG_IDS, 5)
+    seen = SMALL_MASK | BIG_MASK
+    for card_id in unseen_small + unseen_big:
+        seen &= ~(1 << card_id)
+    odds = deck_odds(seen, 3)
+    assert (odds.small_cards, odds.big_cards, odds.draws) == (6, 5, 3)
+    assert odds.pair_probability == pytest.approx(3 / 30)
+
+    hits, per_pair, draws = {}, {}, 0
+    for smalls in itertools.permutations(unseen_small, 3):
+        for bigs in itertools.permutations(unseen_big, 3):
+            draws += 1
+            labels = [breakeven(s, b) for s, b in zip(smalls, bigs)]
+            for label in set(labels):
+                hits[label] = hits.get(label, 0) + 1
+            for label in labels:
+                per_pair[label] = per_pair.get(label, 0) + 1
+    assert {b.breakeven for b in odds.breakevens} == set(hits)
+    for b in odds.breakevens:
+        assert b.at_least_one == pytest.approx(hits[b.breakeven] / draws)
+        assert b.expected_count == pytest.approx(per_pair[b.breakeven] / draws)
+    assert [b.at_least_one for b in odds.breakevens] == sorted((b.at_least_one for b in odds.breakevens), reverse=True)
+
+
+def test_odds_are_cached_by_counts():
+    odds_by_counts.cache_clear()
+    # the same ranks and colors seen in other suits give the same odds
+    hearts_king_ace, diamonds_king_ace = 0 * 52 + 12, 13 * 52 + 25
+    assert deck_odds(seen_mask([hearts_king_ace]), 3) is deck_odds(seen_mask([diamonds_king_ace]), 3)
+    assert odds_by_counts.cache_info().hits == 1
+    assert deck_odds(seen_mask([]), 0).breakevens == ()
+
+
+def test_deck_endpoint(client):
+    game_id, a, b = start_game(client)
+    url = f"/api/v1/games/{game_id}/deck"
+    assert client.get(url, params={"player_uuid": a}).status_code == 409
+
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    odds = client.get(url, params={"player_uuid": p1}).json()
+    # the player's own hidden pair is seen, the opponent's is not
+    assert (odds["small_cards"], odds["big_cards"], odds["draws"]) == (23, 23, 3)
+
+    batch(client, game_id, full_game_actions(p1, p2)[:1 + 3])
+    assert context.current_turn == 2 and context.current_phase == GamePhase.TURN_SELECT_FIRST
+    odds = client.get(url, params={"player_uuid": p2}).json()
+    assert (odds["small_cards"], odds["big_cards"]) == (17, 17)
+    assert sum(b["expected_count"] for b in odds["breakevens"]) == pytest.approx(3)
+
+    batch(client, game_id, full_game_actions(p1, p2)[1 + 3:1 + 6 * 3 + 1])
+    assert context.current_turn == 7
+    assert client.get(url, params={"player_uuid": p2}).json()["draws"] == 0
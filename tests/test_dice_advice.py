@@ -0,0 +1,79 @@
+"""
+Tests for the dice collection advisor.
+"""
+import pytest
+
+from card import Card, CardPair, CardRank, CardSuit
+from dice import DiceCollectionType
+from dice_advice import SPECIAL_COLLECTIONS, dice_options, final_pnl
+from pricing import PRICES, price_distribution
+from api.registry import session_registry
+from enums import GamePhase
+
+from tests.test_batch_actions import batch, start_game
+
+
+def pair(big_suit, big_rank, small_rank=CardRank.TWO):
+    return CardPair(small_card=Card(suit=CardSuit.CLUBS, rank=small_rank), big_card=Card(suit=big_suit, rank=big_rank))
+
+
+RED_EIGHT = pair(CardSuit.HEARTS, CardRank.EIGHT).to_index()
+BLACK_KING = pair(CardSuit.SPADES, CardRank.KING).to_index()
+
+
+def test_final_pnl_counts_conversions():
+    plain = final_pnl((RED_EIGHT,), None, 0)
+    converted = final_pnl((RED_EIGHT,), None, 1)
+    for price in PRICES:
+        assert plain[price] == CardPair.from_index(RED_EIGHT).get_pnl(price)
+        assert converted[price] >= plain[price]
+    # at 3 the red eight is worthless and a black eight is worth 5
+    assert converted[3] - plain[3] == 5
+
+
+def test_options_without_seven_cards():
+    options = dice_options(10, 1, (RED_EIGHT,), None, 0, (BLACK_KING,), 0)
+    assert [option.collection for option in options] == [DiceCollectionType.REGULAR]
+
+
+def test_options_are_exact_and_ranked():
+    options = dice_options(10, 1, (RED_EIGHT,), None, 1, (BLACK_KING,), 0)
+    assert {option.collection for option in options} == {DiceCollectionType.REGULAR, *SPECIAL_COLLECTIONS}
+    assert [option.expected_lead for option in options] == sorted((o.expected_lead for o in options), reverse=True)
+
+    by_collection = {option.collection: option for option in options}
+    # a red pair wants the price up, the opponent's black king wants it down
+    assert by_collection[DiceCollectionType.STIMULUS].expected_lead > by_collection[DiceCollectionType.TARIFF].expected_lead
+
+    stimulus = price_distribution(10, 1, DiceCollectionType.STIMULUS)
+    own, opponent = final_pnl((RED_EIGHT,), None, 0), final_pnl((BLACK_KING,), None, 0)
+    option = by_collection[DiceCollectionType.STIMULUS]
+    assert option.spends_seven_card
+    assert option.expected_pnl == pytest.approx(sum(stimulus[p] * own[p] for p in PRICES))
+    assert option.expected_lead == pytest.approx(sum(stimulus[p] * (own[p] - opponent[p]) for p in PRICES))
+    assert not by_collection[DiceCollectionType.REGULAR].spends_seven_card
+
+
+def test_dice_options_endpoint(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    assert client.get(f"/api/v1/games/{game_id}/dice-options", params={"player_uuid": p1}).status_code == 409
+
+    batch(client, game_id, [
+        {"player_uuid": p1, "action": "roll_dice"},
+        {"player_uuid": p1, "action": "select_pair", "pair_index": 0},
+        {"player_uuid": p2, "action": "select_pair", "pair_index": 1},
+    ])
+    assert context.current_phase == GamePhase.TURN_COMPLETE
+    roller = context.dice_roller.uuid
+    other = p1 if roller == p2 else p2
+    assert client.get(f"/api/v1/games/{game_id}/dice-options", params={"player_uuid": other}).status_code == 409
+
+    response = client.get(f"/api/v1/games/{game_id}/dice-options", params={"player_uuid": roller})
+    assert response.status_code == 200
+    advice = response.json()
+    assert advice["rolls_remaining"] == 7
+    assert len(advice["options"]) == 1 + len(SPECIAL_COLLECTIONS)
+    assert {option["collection"] for option in advice["options"]} >= {"regular", "stimulus"}
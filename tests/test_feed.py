@@ -0,0 +1,121 @@
+"""
+Tests for the long-poll and Server-Sent Events transports.
+"""
+import asyncio
+
+import pytest
+
+from api import routes
+from api.feed import GameFeed
+
+
+def start_game(client):
+    first = client.post("/api/v1/games/join", json={"player_name": "Player 1"}).json()
+    second = client.post("/api/v1/games/join", json={"player_name": "Player 2"}).json()
+    return first["game_id"], first["player_uuid"], second["player_uuid"]
+
+
+@pytest.mark.asyncio
+async def test_waiters_share_one_event():
+    feed = GameFeed()
+    waiters = [asyncio.create_task(feed.wait(0, 1.0)) for _ in range(100)]
+    await asyncio.sleep(0)
+    event = feed._changed
+    assert event is not None
+
+    feed.append(None, "ready", "1")
+    assert all(await asyncio.gather(*waiters))
+    assert event.is_set() and feed._changed is None
+    assert not await feed.wait(1, 0.01)
+
+
+def test_feed_filters_and_detects_gaps():
+    feed = GameFeed(size=2)
+    feed.append(["a"], "board", "for a")
+    feed.append(["b"], "board", "for b")
+    feed.append(None, "ready", "all")
+
+    messages, missed = feed.since(0, "a")
+    assert [m.content for m in messages] == ["all"]
+    assert missed
+    messages, missed = feed.since(2, "b")
+    assert [m.content for m in messages] == ["all"] and not missed
+    assert feed.since(10, "b")[1]
+
+
+def test_poll_returns_notifications(client):
+    game_id, a, b = start_game(client)
+    response = client.get(f"/api/v1/games/{game_id}/poll", params={"player_uuid": a, "since": 0, "timeout": 0})
+    assert response.status_code == 200
+    data = response.json()
+    assert [m["type"] for m in data["messages"]] == ["join", "join"]
+
+    client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": b})
+    response = client.get(f"/api/v1/games/{game_id}/poll", params={"player_uuid": a, "since": data["seq"]})
+    assert [(m["type"], m["content"]) for m in response.json()["messages"]] == [("ready", b)]
+
+    seq = response.json()["seq"]
+    response = client.get(f"/api/v1/games/{game_id}/poll", params={"player_uuid": a, "since": seq, "timeout": 0.05})
+    assert response.json() == {"seq": seq, "missed": False, "messages": []}
+
+
+def test_event_stream(client, monkeypatch):
+    monkeypatch.setattr(routes, "SSE_KEEPALIVE", 0.01)
+    game_id, a, b = start_game(client)
+
+    async def read_events():
+        response = await routes.stream_notifications(game_id, b, last_event_id=1)
+        assert response.media_type == "text/event-stream"
+        events = response.body_iterator
+        try:
+            return [await events.__anext__(), await events.__anext__()]
+        finally:
+            await events.aclose()
+
+    event, keepalive = asyncio.run(read_events())
+    lines = event.split("\n")
+    assert lines[:2] == ["id: 2", "event: join"]
+    assert lines[2].startswith("data: {")
+    assert keepalive == ": keepalive\n\n"
+
+
+def test_event_stream_ends_when_game_is_exported(client):
+    game_id, a, b = start_game(client)
+
+    async def read_events():
+        response = await routes.stream_notifications(game_id, b, last_event_id=None)
+        events = [event async for event in response.body_iterator]
+        return events
+
+    async def export_later():
+        stream = asyncio.create_task(read_events())
+        await asyncio.sleep(0.01)
+        await routes.export_game(game_id)
+        return await asyncio.wait_for(stream, 1.0)
+
+    assert asyncio.run(export_later()) == []
+
+
+def test_event_stream_resyncs_unknown_event_id(client):
+    game_id, a, b = start_game(client)
+
+    async def first_event():
+        # an id from the feed of the worker the game was migrated from
+        response = await routes.stream_notifications(game_id, b, last_event_id=40)
+        events = response.body_iterator
+        try:
+            return await events.__anext__()
+        finally:
+            await events.aclose()
+
+    assert asyncio.run(first_event()) == "id: 2\nevent: resync\ndata: 2\n\n"
+
+
+@pytest.mark.asyncio
+async def test_closing_wakes_waiters():
+    feed = GameFeed()
+    waiter = asyncio.create_task(feed.wait(0, 1.0))
+    await asyncio.sleep(0)
+    feed.close()
+    assert await waiter
+    assert feed.closed and await feed.wait(0, 1.0)
@@ -1,3 +1,5 @@
+
+import zobrist
 from enums import GamePhase
 from game_context import GameContext, GameResult
 from player import Player
@@ -165,3 +167,117 @@ def test_game_context_end():
     assert board_for_player1.current_player.selected_pairs == []
     assert board_for_player1.current_player.hidden_pair is not None
     assert len(board_for_player1.current_player.seven_cards) == 2
+
+
+def seeded_context(seed=3):
+    context = GameContext()
+    for i in range(2):
+        context.add_player(Player(uuid=str(i), name=f"Player {i}"))
+    context.initialize_game(seed=seed)
+    context.roll_dice()
+    context.start_turn()
+    return context
+
+
+def play_turn(context):
+    context.select_pair(context.available_pairs[0])
+    context.select_pair(context.available_pairs[1])
+    context.roll_dice()
+    if context.current_phase == GamePhase.TURN_START:
+        context.start_turn()
+
+
+def boards(context):
+    return [context.create_board(player_id).model_dump_json() for player_id in (0, 1)]
+
+
+def test_restore_replays_the_same_game():
+    context = seeded_context()
+    state = context.snapshot()
+    before = boards(context)
+    play_turn(context)
+    play_turn(context)
+    after = boards(context)
+
+    context.restore(state)
+    assert boards(context) == before
+    play_turn(context)
+    play_turn(context)
+    # the dice and draws come out the same, so does the record
+    assert boards(context) == after
+    assert context.recorder.available == GameContext.from_state(context.snapshot()).recorder.available
+
+
+def test_snapshots_share_unchanged_parts():
+    context = seeded_context()
+    first = context.snapshot()
+    assert context.snapshot().pile is first.pile
+    context.select_pair(context.available_pairs[0])
+    second = context.snapshot()
+    selector, other = (0, 1) if context.first_selector is context.players[0] else (1, 0)
+    assert second.pile is first.pile
+    assert second.players[other].portfolio is first.players[other].portfolio
+    assert second.players[selector].portfolio is not first.players[selector].portfolio
+
+
+def test_what_if_leaves_the_game_alone():
+    context = seeded_context()
+    before = boards(context)
+    sandbox = GameContext.from_state(context.snapshot())
+    play_turn(sandbox)
+    assert sandbox.current_turn == 2
+    assert boards(context) == before
+    assert context.card_pile.draw_pile_size == sandbox.card_pile.draw_pile_size + 6
+
+
+def ids(items):
+    return tuple(item.to_index() for item in items)
+
+
+def key_from_scratch(context, player_id=None):
+    """zobrist.game_hash of the game, or zobrist.state_hash as seen by a seat."""
+    taken = context.selected_pair_index.values()
+    offered = ids(pair for i, pair in enumerate(context.available_pairs) if i not in taken)
+    players = (context.player_1, context.player_2)
+    held = tuple(ids(player.selected_pairs) for player in players)
+    hidden = tuple(player.hidden_pair.to_index() if player.hidden_pair and player_id in (None, player.player_id)
+                   else None for player in players)
+    if player_id is not None:
+        return zobrist.state_hash(context.current_phase, context.current_turn, context.current_price, offered, held,
+                                  hidden, tuple(len(player.seven_cards) for player in players))
+    pile = context.card_pile
+    return zobrist.game_hash(context.current_phase, context.current_turn, context.current_price, offered, held, hidden,
+                             tuple(ids(player.seven_cards) for player in players),
+                             ids(pile.small_card_draw_pile + pile.big_card_draw_pile))
+
+
+def test_state_key_follows_every_change():
+    context = seeded_context()
+    keys = [context.state_key]
+    while context.current_phase != GamePhase.FINAL_REVIEW:
+        context.select_pair(context.available_pairs[0])
+        keys.append(context.state_key)
+        context.select_pair(context.available_pairs[1])
+        keys.append(context.state_key)
+        assert context.state_key == key_from_scratch(context)
+        assert all(context.search_key(seat) == key_from_scratch(context, seat) for seat in (0, 1))
+        context.roll_dice()
+        if context.current_phase == GamePhase.TURN_START:
+            context.start_turn()
+        keys.append(context.state_key)
+        assert context.state_key == key_from_scratch(context)
+        assert all(context.search_key(seat) == key_from_scratch(context, seat) for seat in (0, 1))
+    context.start_review()
+    context.convert_color(player_id=0, pair_index=-1, special_card_index=0)
+    assert context.state_key == key_from_scratch(context)
+    assert all(context.search_key(seat) == key_from_scratch(context, seat) for seat in (0, 1))
+    assert len(set(keys)) == len(keys)
+
+    # a replay of the seed goes through the same keys, and a restored game gets its key back
+    replay = seeded_context()
+    state = replay.snapshot()
+    assert replay.state_key == keys[0]
+    play_turn(replay)
+    assert replay.state_key == keys[3]
+    replay.restore(state)
+    assert replay.state_key == keys[0]
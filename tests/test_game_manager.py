@@ -1,63 +1,193 @@
+import asyncio
+
+import pytest
+
 from dice import DiceCollectionType
-from enums import GameAction
-from game_manager import GameManager
+from enums import GameAction, GamePhase
+import game_manager as game_manager_module
+from api.feed import notification_feed
+from api.registry import session_registry
+from game_manager import GameManager, GamePool, game_pool
+from player import Player
 
 
-def test_game_manager() -> None:
-    game_manager = GameManager()
+@pytest.mark.asyncio
+async def test_game_manager() -> None:
+    game_manager = GameManager("game")
     uuid_1 = "1"
     uuid_2 = "2"
-    game_manager.take_action(uuid_1, GameAction.JOIN_GAME, player_name = "AAA")
-    game_manager.take_action(uuid_2, GameAction.JOIN_GAME, player_name = "BBB")
-    game_manager.take_action(uuid_1, GameAction.READY)
-    game_manager.take_action(uuid_2, GameAction.READY)
+    await game_manager.take_action(uuid_1, GameAction.JOIN_GAME, player_name = "AAA")
+    await game_manager.take_action(uuid_2, GameAction.JOIN_GAME, player_name = "BBB")
+    await game_manager.take_action(uuid_1, GameAction.READY)
+    await game_manager.take_action(uuid_2, GameAction.READY)
 
     uuid_1 = game_manager.context.player_1.uuid
     uuid_2 = game_manager.context.player_2.uuid
-    game_manager.take_action(uuid_1, GameAction.ROLL_DICE)
+    await game_manager.take_action(uuid_1, GameAction.ROLL_DICE)
     # Turn 1
-    game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
-    game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
-    game_manager.take_action(uuid_2, GameAction.ROLL_DICE)
+    await game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
+    await game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
+    await game_manager.take_action(uuid_2, GameAction.ROLL_DICE)
     # Turn 2
-    game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 0)
-    game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 1)
-    game_manager.take_action(uuid_1, GameAction.ROLL_DICE)
+    await game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 0)
+    await game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 1)
+    await game_manager.take_action(uuid_1, GameAction.ROLL_DICE)
     # Turn 3
-    game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
-    game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
-    game_manager.take_action(uuid_2, GameAction.ROLL_DICE)
+    await game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
+    await game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
+    await game_manager.take_action(uuid_2, GameAction.ROLL_DICE)
     # Turn 4
-    game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 0)
-    game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 1)
-    game_manager.take_action(uuid_1, GameAction.ROLL_DICE)
+    await game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 0)
+    await game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 1)
+    await game_manager.take_action(uuid_1, GameAction.ROLL_DICE)
     # Turn 5
-    game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
-    game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
-    game_manager.take_action(uuid_2, GameAction.ROLL_DICE)
+    await game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
+    await game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
+    await game_manager.take_action(uuid_2, GameAction.ROLL_DICE)
     # Turn 6
-    game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 0)
-    game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 1)
-    game_manager.take_action(uuid_1, GameAction.ROLL_DICE, dice_collection_type = DiceCollectionType.SUPPLY_SHOCK)
+    await game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 0)
+    await game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 1)
+    await game_manager.take_action(uuid_1, GameAction.ROLL_DICE, dice_collection_type = DiceCollectionType.SUPPLY_SHOCK)
     # Turn 7
-    game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
-    game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
-    game_manager.take_action(uuid_2, GameAction.ROLL_DICE, dice_collection_type = DiceCollectionType.INFLATION)
+    await game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
+    await game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
+    await game_manager.take_action(uuid_2, GameAction.ROLL_DICE, dice_collection_type = DiceCollectionType.INFLATION)
 
     # Final Review
-    game_manager.take_action(uuid_1, GameAction.COLOR_CONVERT, pair_index=-1, special_card_index=0)
-    game_manager.take_action(uuid_1, GameAction.COLOR_CONVERT, pair_index=0, special_card_index=0)
-    game_manager.take_action(uuid_2, GameAction.END_REVIEW)
-    game_manager.take_action(uuid_1, GameAction.END_REVIEW)
+    await game_manager.take_action(uuid_1, GameAction.COLOR_CONVERT, pair_index=-1, special_card_index=0)
+    await game_manager.take_action(uuid_1, GameAction.COLOR_CONVERT, pair_index=0, special_card_index=0)
+    await game_manager.take_action(uuid_2, GameAction.END_REVIEW)
+    await game_manager.take_action(uuid_1, GameAction.END_REVIEW)
 
     # Restart
-    game_manager.take_action(uuid_1, GameAction.READY)
-    game_manager.take_action(uuid_2, GameAction.READY)
+    await game_manager.take_action(uuid_1, GameAction.READY)
+    await game_manager.take_action(uuid_2, GameAction.READY)
     uuid_1 = game_manager.context.player_1.uuid
     uuid_2 = game_manager.context.player_2.uuid
-    game_manager.take_action(uuid_1, GameAction.ROLL_DICE)
+    await game_manager.take_action(uuid_1, GameAction.ROLL_DICE)
     # Turn 1
-    game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
-    game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
-    game_manager.take_action(uuid_2, GameAction.ROLL_DICE)
+    await game_manager.take_action(uuid_1, GameAction.SELECT_PAIR, pair_index = 0)
+    await game_manager.take_action(uuid_2, GameAction.SELECT_PAIR, pair_index = 1)
+    await game_manager.take_action(uuid_2, GameAction.ROLL_DICE)
+
+
+@pytest.mark.asyncio
+async def test_transition_hooks() -> None:
+    game_manager = GameManager("game")
+    timings = []
+
+    def hook(phase, action, elapsed):
+        timings.append((phase, action, elapsed))
+
+    GameManager.add_transition_hook(hook)
+    try:
+        await game_manager.take_action("1", GameAction.JOIN_GAME, player_name="AAA")
+        await game_manager.take_action("1", GameAction.ROLL_DICE)  # not valid in the lobby
+        await game_manager.take_action("2", GameAction.JOIN_GAME, player_name="BBB")
+    finally:
+        GameManager.remove_transition_hook(hook)
+
+    assert [(phase, action) for phase, action, _ in timings] == [
+        (GamePhase.LOBBY, GameAction.JOIN_GAME),
+        (GamePhase.LOBBY, GameAction.JOIN_GAME),
+    ]
+    assert all(elapsed >= 0 for _, _, elapsed in timings)
+    assert game_manager.context.current_phase == GamePhase.GAME_START
+
+
+@pytest.mark.asyncio
+async def test_invalid_selection_raises() -> None:
+    game_manager = GameManager("game")
+    await game_manager.take_action("1", GameAction.JOIN_GAME, player_name="AAA")
+    await game_manager.take_action("2", GameAction.JOIN_GAME, player_name="BBB")
+    await game_manager.take_action("1", GameAction.READY)
+    await game_manager.take_action("2", GameAction.READY)
+    await game_manager.take_action(game_manager.context.player_1.uuid, GameAction.ROLL_DICE)
+
+    with pytest.raises(ValueError):
+        await game_manager.take_action(game_manager.context.player_2.uuid, GameAction.SELECT_PAIR, pair_index=0)
+    assert game_manager.context.current_phase == GamePhase.TURN_SELECT_FIRST
+    assert game_manager.context.is_valid_action(GameAction.SELECT_PAIR)
+    assert not game_manager.context.is_valid_action(GameAction.READY)
+
+
+def play_seeded_game(game_manager, seed):
+    context = game_manager.context
+    for i in range(2):
+        context.add_player(Player(uuid=str(i), name=f"Player {i}"))
+    context.initialize_game(seed=seed)
+    context.roll_dice()
+    keys = []
+    while context.current_phase != GamePhase.FINAL_REVIEW:
+        context.start_turn()
+        context.select_pair(context.available_pairs[0])
+        context.select_pair(context.available_pairs[1])
+        context.roll_dice()
+        keys.append(context.state_key)
+    return keys
+
+
+def test_pooled_games_are_reset_in_place():
+    pool = GamePool(size=1)
+    game_manager = pool.acquire("first")
+    keys = play_seeded_game(game_manager, seed=5)
+    pile, version = game_manager.context.card_pile, game_manager.version
+    piles = (pile.small_card_draw_pile, pile.big_card_draw_pile, pile.discard_pile, pile.initial_seven_cards)
+    pool.release(game_manager)
+    pool.release(GameManager("extra"))  # the pool is full
+    assert pool.free == [game_manager]
+
+    reused = pool.acquire("second")
+    assert reused is game_manager and not pool.free
+    assert (reused.game_id, reused.context.current_phase, reused.context.players) == ("second", GamePhase.LOBBY, [])
+    assert reused.version > version
+    assert reused.context.card_pile is None and reused.context.state_key == GameManager("fresh").context.state_key
+    # the pile is refilled for the next game, which plays exactly as on a fresh manager
+    assert play_seeded_game(reused, seed=5) == keys
+    assert reused.context.card_pile is pile
+    assert all(new is old for new, old in zip((pile.small_card_draw_pile, pile.big_card_draw_pile, pile.discard_pile,
+                                               pile.initial_seven_cards), piles))
+    assert play_seeded_game(GameManager("fresh"), seed=5) == keys
+
+
+@pytest.mark.asyncio
+async def test_finished_game_is_dropped_after_grace(monkeypatch) -> None:
+    monkeypatch.setattr(game_manager_module, "END_GRACE", 0.05)
+    session_registry.clear()
+    game_manager = GameManager("finished")
+    session_registry.register(game_manager)
+    feed = notification_feed.get("finished")
+    game_manager.context.current_phase = GamePhase.GAME_END
+
+    # acting on the finished game, e.g. asking for a rematch, restarts the grace period
+    game_manager.schedule_expiry()
+    await asyncio.sleep(0.02)
+    game_manager.version += 1
+    await asyncio.sleep(0.05)
+    assert session_registry.get_game("finished") is game_manager
+
+    await asyncio.sleep(0.08)
+    assert session_registry.get_game("finished") is None
+    assert feed.closed and "finished" not in notification_feed.games
+
+
+@pytest.mark.asyncio
+async def test_closed_game_is_pooled_once_nothing_holds_it() -> None:
+    game_pool.clear()
+    session_registry.clear()
+    game_manager = game_pool.acquire("held")
+    session_registry.register(game_manager)
+    feed = notification_feed.get("held")
 
+    async def stream():
+        # like a long-poll or a bot waiting for the game's next notification
+        with game_manager.hold():
+            await feed.wait(feed.seq, 1.0)
+            assert game_pool.free == []
+    waiter = asyncio.create_task(stream())
+    await asyncio.sleep(0)
+    await game_manager.close()
+    assert session_registry.get_game("held") is None and game_pool.free == []
+    await waiter
+    assert game_pool.free == [game_manager]
+    game_pool.clear()
@@ -0,0 +1,114 @@
+"""
+Tests for rating-aware matchmaking.
+"""
+import asyncio
+
+import pytest
+
+from api import matchmaking, profiles, sharding
+from api.matchmaking import BASE_WINDOW, MATCH_TTL, WINDOW_GROWTH, Matchmaker, Ticket, matchmaker
+from api.profiles import profile_directory
+from api.ratings import PlayerRatings, Profile, player_ratings
+from api.registry import session_registry
+from api.sharding import HashRing, ShardConfig
+from enums import GamePhase
+
+from tests.test_ratings import owner_worker
+
+
+@pytest.fixture
+def ratings():
+    player_ratings.clear()
+    for profile_id, rating in (("low", 1000.0), ("mid", 1500.0), ("mid2", 1520.0), ("high", 1900.0)):
+        player_ratings.profiles[profile_id] = Profile(profile_id, profile_id, rating=rating)
+    matchmaker.clear()
+    yield player_ratings
+    player_ratings.clear()
+    matchmaker.clear()
+
+
+def test_closest_rating_within_window_is_paired(ratings):
+    pool = Matchmaker()
+    low = pool.enqueue("low", "low", ratings.get("low").rating, now=0)
+    mid = pool.enqueue("mid", "mid", ratings.get("mid").rating, now=0)
+    high = pool.enqueue("high", "high", ratings.get("high").rating, now=0)
+    mid2 = pool.enqueue("mid2", "mid2", ratings.get("mid2").rating, now=0)
+
+    pairs = pool.pairs(now=0)
+    assert [(a.ticket_id, b.ticket_id) for a, b in pairs] == [(mid.ticket_id, mid2.ticket_id)]
+    assert len(pool.pool) == 2
+    assert pool.pairs(now=1) == []
+
+
+def test_window_widens_with_waiting(ratings):
+    pool = Matchmaker()
+    low = pool.enqueue("low", "low", ratings.get("low").rating, now=0)
+    pool.enqueue("mid", "mid", ratings.get("mid").rating, now=0)
+    wait = (500 - BASE_WINDOW) / WINDOW_GROWTH
+    assert low.window(0) == BASE_WINDOW
+    assert pool.pairs(now=wait - 1) == []
+    assert len(pool.pairs(now=wait)) == 1
+
+
+def test_tick_starts_games_and_reports_waits(client, ratings):
+    a = client.post("/api/v1/matchmaking/queue", json={"player_name": "A", "profile_id": "mid"}).json()
+    b = client.post("/api/v1/matchmaking/queue", json={"player_name": "B", "profile_id": "mid2"}).json()
+    assert a["status"] == "waiting"
+
+    assert asyncio.run(matchmaker.tick()) == 1
+    first = client.get(f"/api/v1/matchmaking/queue/{a['ticket_id']}").json()
+    second = client.get(f"/api/v1/matchmaking/queue/{b['ticket_id']}", params={"wait": 1}).json()
+    assert first["status"] == second["status"] == "matched"
+    assert first["match"]["game_id"] == second["match"]["game_id"]
+    assert first["match"]["opponent_uuid"] == second["match"]["player_uuid"]
+
+    game = session_registry.get_game(first["match"]["game_id"])
+    assert game.context.current_phase == GamePhase.GAME_START
+    assert {player.profile_id for player in game.context.players} == {"mid", "mid2"}
+
+    # a match is handed out once
+    assert client.get(f"/api/v1/matchmaking/queue/{a['ticket_id']}").status_code == 404
+    stats = client.get("/api/v1/matchmaking/stats").json()
+    assert stats["waiting"] == 0 and stats["matches"] == 1
+    assert stats["p50_wait"] is not None and stats["p99_wait"] >= stats["p50_wait"]
+
+
+def test_leave_queue(client, ratings):
+    ticket = client.post("/api/v1/matchmaking/queue", json={"player_name": "A"}).json()
+    assert client.delete(f"/api/v1/matchmaking/queue/{ticket['ticket_id']}").status_code == 200
+    assert client.delete(f"/api/v1/matchmaking/queue/{ticket['ticket_id']}").status_code == 409
+    assert matchmaker.stats()["waiting"] == 0
+
+
+def test_unfetched_matches_expire(ratings, monkeypatch):
+    pool = Matchmaker()
+
+    async def start_game(first, second):
+        return "first", "second"
+
+    monkeypatch.setattr(matchmaking, "start_game", start_game)
+    pool.enqueue("mid", "mid", ratings.get("mid").rating, now=0)
+    pool.enqueue("mid2", "mid2", ratings.get("mid2").rating, now=0)
+    asyncio.run(pool.tick(now=0))
+    assert len(pool.tickets) == 2
+    asyncio.run(pool.tick(now=MATCH_TTL + 1))
+    assert pool.tickets == {}
+
+
+@pytest.mark.asyncio
+async def test_matches_on_other_workers_use_the_profile_owner(monkeypatch, ratings):
+    config = ShardConfig(worker_id=1, workers=[0, 1])
+    for module in (profiles, sharding):
+        monkeypatch.setattr(module, "shard_config", config)
+    monkeypatch.setattr(sharding, "_local_ring", None)
+    monkeypatch.setattr(sharding, "_previous_ring", None)
+    owner = PlayerRatings()
+    monkeypatch.setattr(profile_directory, "_clients", {0: owner_worker(owner)})
+
+    first, second = Ticket("t1", "A", "a-profile", 1500.0, 0.0), Ticket("t2", "B", None, 1500.0, 0.0)
+    try:
+        match, _ = await matchmaking.start_game(first, second)
+        assert HashRing([0, 1]).lookup(match.game_id) == 1  # the gateway routes the game here
+        assert owner.get("a-profile").name == "A" and "a-profile" not in ratings.profiles
+    finally:
+        session_registry.clear()
@@ -78,7 +78,7 @@ def test_player_model(player, sample_pair):
     player.select_pair(sample_pair)
     
     player_model = player.model_dump()
-    assert list(player_model.keys()) == ["uuid", "player_id", "name", "portfolio"]
+    assert list(player_model.keys()) == ["uuid", "player_id", "name", "portfolio", "profile_id"]
     assert player_model["uuid"] == "1"
     assert player_model["player_id"] == 1
     assert player_model["name"] == "Player 1"
@@ -0,0 +1,89 @@
+"""
+Tests for the memory-mapped policy tables.
+"""
+import pytest
+
+from dice import DiceCollectionType
+from enums import GamePhase
+from policy import (DIMS, ENTRY_COUNT, HEADER_SIZE, OFFERED, PolicyTable, build_policy_table, entry_index, exposure,
+                    representative_state)
+from solver import Solver
+from api.policy import close_policy_table, open_policy_table
+from api.registry import session_registry
+
+from tests.test_batch_actions import batch, full_game_actions, start_game
+from tests.test_conversion import PAIRS
+
+
+@pytest.fixture(scope="module")
+def table_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("policy") / "policy.axp")
+    assert build_policy_table(path, turns=[7]) == ENTRY_COUNT // DIMS[0]
+    return path
+
+
+def test_entry_index_is_row_major():
+    assert entry_index(1, GamePhase.TURN_SELECT_FIRST, 1, 0, 0, -3, -3) == 0
+    assert entry_index(7, GamePhase.TURN_COMPLETE, 20, 2, 2, 3, 3) == ENTRY_COUNT - 1
+    assert entry_index(1, GamePhase.TURN_SELECT_FIRST, 1, 0, 0, -3, -2) == 1
+
+
+def test_exposure_is_clamped():
+    red = [pair.to_index() for pair in PAIRS if pair.big_card.is_red][:5]
+    black = [pair.to_index() for pair in PAIRS if not pair.big_card.is_red][:5]
+    assert exposure(red[:2]) == 2 and exposure(red) == 3 and exposure(black) == -3
+    assert exposure(red[:2] + black[:1]) == 1 and exposure([]) == 0
+
+
+def test_entries_match_the_solver(table_path):
+    table = PolicyTable(table_path)
+    assert table.get(1, GamePhase.TURN_COMPLETE, 10, 2, 2, 0, 0) is None  # turn not built
+
+    key = (7, GamePhase.TURN_COMPLETE, 12, 1, 2, 2, -1)
+    state = representative_state(*key)
+    analysis = Solver().search(state, 1)
+    sign = 1 if state.mover() == 0 else -1
+    entry = table.get(*key)
+    assert entry.collection == analysis.moves[0].collection and entry.pick_red is None
+    assert entry.value == pytest.approx(sign * analysis.value, rel=1e-6)
+    assert entry.margin == pytest.approx(sign * (analysis.moves[0].value - analysis.moves[1].value), rel=1e-6)
+    assert table.get(7, GamePhase.TURN_COMPLETE, 12, 0, 2, 2, -1).collection == DiceCollectionType.REGULAR
+
+    key = (7, GamePhase.TURN_SELECT_FIRST, 4, 0, 0, 0, 0)
+    analysis = Solver().search(representative_state(*key), 1)
+    assert table.get(*key).pick_red == (analysis.moves[0].pair_id == OFFERED[0])
+
+
+def test_bad_files_are_rejected(table_path, tmp_path):
+    not_a_table = tmp_path / "other.axp"
+    not_a_table.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError, match="not a policy table"):
+        PolicyTable(str(not_a_table))
+    truncated = tmp_path / "truncated.axp"
+    with open(table_path, "rb") as f:
+        truncated.write_bytes(f.read(HEADER_SIZE + 100))
+    with pytest.raises(ValueError, match="truncated"):
+        PolicyTable(str(truncated))
+
+
+def test_policy_endpoint(client, table_path):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    url = f"/api/v1/games/{game_id}/policy"
+    assert client.get(url, params={"player_uuid": p1}).status_code == 503
+
+    table = open_policy_table(table_path)
+    try:
+        batch(client, game_id, full_game_actions(p1, p2)[:1 + 6 * 3])
+        assert context.current_turn == 7 and context.current_phase == GamePhase.TURN_SELECT_FIRST
+        assert client.get(url, params={"player_uuid": p2}).status_code == 409
+
+        response = client.get(url, params={"player_uuid": p1})
+        assert response.status_code == 200
+        policy = response.json()
+        entry = table.lookup(context, 0)
+        assert policy["pick_red"] == entry.pick_red and policy["expected_lead"] == pytest.approx(entry.value)
+    finally:
+        close_policy_table()
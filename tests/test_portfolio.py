@@ -78,4 +78,33 @@ def test_portfolio_model():
     assert list(portfolio_dict.keys()) == ["regular_pairs", "hidden_pairs", "seven_cards"]
     assert portfolio_dict["regular_pairs"] == [pair.model_dump()]
     assert portfolio_dict["hidden_pairs"] == [hidden_pair.model_dump()]
-    assert portfolio_dict["seven_cards"] == []
\ No newline at end of file
+    assert portfolio_dict["seven_cards"] == []
+
+def test_totals_follow_the_pairs():
+    """The running cost, value and P&L are updated with every change of the pairs."""
+    portfolio = Portfolio()
+    red = CardPair(small_card=Card(suit=CardSuit.CLUBS, rank=CardRank.TWO),
+                   big_card=Card(suit=CardSuit.HEARTS, rank=CardRank.NINE))
+    black = CardPair(small_card=Card(suit=CardSuit.CLUBS, rank=CardRank.THREE),
+                     big_card=Card(suit=CardSuit.SPADES, rank=CardRank.QUEEN))
+    portfolio.add_pair(red)
+    portfolio.add_hidden_pair(black)
+
+    def check():
+        for include_hidden in (True, False):
+            pairs = portfolio.regular_pairs + portfolio.hidden_pairs if include_hidden else portfolio.regular_pairs
+            assert portfolio.get_cost(include_hidden) == sum(pair.cost for pair in pairs)
+            for price in range(0, 22):
+                assert portfolio.get_value(price, include_hidden) == sum(pair.get_value(price) for pair in pairs)
+                assert portfolio.get_pnl(price, include_hidden) == sum(pair.get_pnl(price) for pair in pairs)
+                if 1 <= price <= 20:
+                    assert portfolio.pnl_by_price(include_hidden)[price] == portfolio.get_pnl(price, include_hidden)
+
+    check()
+    portfolio.convert_pair_color(0)
+    portfolio.convert_pair_color(-1)
+    check()
+    assert Portfolio(**portfolio.model_dump()).pnl_by_price() == portfolio.pnl_by_price()
+    portfolio.reset()
+    assert portfolio.pnl_by_price() == (0,) * 21
+    assert (portfolio.get_cost(), portfolio.get_value(20)) == (0, 0)
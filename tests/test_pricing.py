@@ -0,0 +1,117 @@
+"""
+Tests for price distributions and pair hints.
+"""
+import pytest
+
+from card import Card, CardPair, CardRank, CardSuit
+from dice import DiceCollectionType
+from pricing import (MAX_PRICE, PRICES, pair_hints, pair_values, pnl_by_price_id, portfolio_risk, price_distribution,
+                     roll_distribution, rolls_remaining, transition_matrix, wrap_price)
+from api.registry import session_registry
+from enums import GamePhase
+
+from tests.test_batch_actions import batch, start_game
+
+
+def pair(big_suit, big_rank, small_rank=CardRank.TWO):
+    return CardPair(small_card=Card(suit=CardSuit.CLUBS, rank=small_rank), big_card=Card(suit=big_suit, rank=big_rank))
+
+
+def test_roll_distributions():
+    regular = roll_distribution(DiceCollectionType.REGULAR)
+    assert sum(regular.values()) == pytest.approx(1)
+    assert regular[0] == pytest.approx(6 / 36)
+    assert min(regular) == -5 and max(regular) == 5
+    assert min(roll_distribution(DiceCollectionType.SOFT_LANDING)) == -4
+    assert set(roll_distribution(DiceCollectionType.TARIFF)) == {-1, -2, -3, -4, -5, -6}
+
+
+def test_transition_matrix_wraps_around():
+    matrix = transition_matrix(DiceCollectionType.REGULAR)
+    for price in PRICES:
+        assert sum(matrix[price]) == pytest.approx(1)
+    # from 1, a change of -5 wraps to 16
+    assert matrix[1][16] == pytest.approx(1 / 36)
+    assert wrap_price(0) == 20 and wrap_price(21) == 1
+
+
+def test_price_distribution_matches_brute_force():
+    # two regular rolls from price 18
+    expected = [0.0] * (MAX_PRICE + 1)
+    regular = roll_distribution(DiceCollectionType.REGULAR)
+    for first, p1 in regular.items():
+        for second, p2 in regular.items():
+            expected[wrap_price(wrap_price(18 + first) + second)] += p1 * p2
+    assert price_distribution(18, 2) == pytest.approx(tuple(expected))
+    assert price_distribution(7, 0)[7] == 1.0
+    assert rolls_remaining(1) == 7 and rolls_remaining(7) == 1
+
+
+def test_pair_hints_rank_by_expected_pnl():
+    # at price 10 with one roll left, a red 8 pays about 2 on average and a black king about 3
+    pairs = (pair(CardSuit.HEARTS, CardRank.EIGHT), pair(CardSuit.SPADES, CardRank.KING),
+             pair(CardSuit.HEARTS, CardRank.KING))
+    hints = pair_hints(10, 1, tuple(p.to_index() for p in pairs))
+    assert [hint.pair_index for hint in hints] == [1, 0, 2]
+    assert hints[-1].profit_probability == 0
+    assert hints[0].expected_pnl == pytest.approx(sum(
+        price_distribution(10, 1)[p] * pairs[1].get_pnl(p) for p in PRICES))
+
+    leads = pair_hints(10, 1, tuple(p.to_index() for p in pairs), True)
+    assert leads[0].vs_best_response == pytest.approx(hints[0].expected_pnl - hints[1].expected_pnl)
+
+    # the other seat's request of the turn is served from the cache, whichever ranking it asks for
+    hits = pair_values.cache_info().hits
+    pair_hints(10, 1, tuple(p.to_index() for p in pairs), True)
+    pair_hints(10, 1, tuple(p.to_index() for p in pairs))
+    assert pair_values.cache_info().hits == hits + 2
+
+
+def test_portfolio_risk():
+    pairs = [pair(CardSuit.HEARTS, CardRank.NINE), pair(CardSuit.SPADES, CardRank.KING, CardRank.FIVE)]
+    pnl = tuple(map(sum, zip(*(pnl_by_price_id(p.to_index()) for p in pairs))))
+    opponent = pnl_by_price_id(pair(CardSuit.DIAMONDS, CardRank.EIGHT).to_index())
+    risk = portfolio_risk(12, 3, pnl, opponent)
+
+    distribution = price_distribution(12, 3)
+    mean = sum(distribution[p] * pnl[p] for p in PRICES)
+    assert risk.expected_pnl == pytest.approx(mean)
+    assert risk.pnl_std ** 2 == pytest.approx(sum(distribution[p] * pnl[p] ** 2 for p in PRICES) - mean ** 2)
+    assert risk.win_probability == pytest.approx(sum(distribution[p] for p in PRICES if pnl[p] > opponent[p]))
+    assert risk.delta == (pnl[13] - pnl[11]) / 2
+    # with no rolls left the price is known
+    assert portfolio_risk(12, 0, pnl, opponent)[:2] == (pnl[12], 0.0)
+
+
+def test_boards_carry_the_risk(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    assert context.create_board(0).current_player.risk is None
+
+    batch(client, game_id, [{"player_uuid": context.player_1.uuid, "action": "roll_dice"}])
+    board = context.create_board(0)
+    hidden = context.player_1.hidden_pair.to_index()
+    expected = portfolio_risk(context.current_price, 7, pnl_by_price_id(hidden), (0,) * (MAX_PRICE + 1))
+    assert board.current_player.risk.model_dump() == expected._asdict()
+
+
+def test_hints_endpoint(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    assert client.get(f"/api/v1/games/{game_id}/hints", params={"player_uuid": p1}).status_code == 409
+
+    batch(client, game_id, [{"player_uuid": p1, "action": "roll_dice"}])
+    response = client.get(f"/api/v1/games/{game_id}/hints", params={"player_uuid": p1, "best_response": True})
+    assert response.status_code == 200
+    hints = response.json()
+    assert hints["rolls_remaining"] == 7
+    assert sorted(hint["pair_index"] for hint in hints["hints"]) == [0, 1, 2]
+    assert hints["hints"][0]["vs_best_response"] is not None
+
+    batch(client, game_id, [{"player_uuid": p1, "action": "select_pair", "pair_index": 1}])
+    hints = client.get(f"/api/v1/games/{game_id}/hints", params={"player_uuid": p2}).json()
+    assert sorted(hint["pair_index"] for hint in hints["hints"]) == [0, 2]
+    assert context.current_phase == GamePhase.TURN_SELECT_SECOND
@@ -0,0 +1,175 @@
+"""
+Tests for player ratings and the leaderboard.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from api import profiles
+from api.profiles import ProfileDirectory
+from api.ratings import Leaderboard, PlayerRatings, Profile, elo_update, player_ratings
+from api.registry import session_registry
+from api.sharding import ShardConfig
+
+from tests.conftest import CLUSTER_SECRET
+from tests.test_batch_actions import batch, full_game_actions
+
+
+@pytest.fixture
+def ratings():
+    player_ratings.clear()
+    yield player_ratings
+    player_ratings.clear()
+
+
+class Result:
+    def __init__(self, winner):
+        self.winner = winner
+
+
+def test_elo_update_is_zero_sum():
+    winner, loser = elo_update(1500, 1500, 1.0)
+    assert winner == 1516 and loser == 1484
+    favorite, underdog = elo_update(1800, 1400, 0.0)
+    assert favorite < 1800 - 16 and underdog - 1400 == pytest.approx(1800 - favorite)
+
+
+def test_leaderboard_ranks_and_pages():
+    profiles = [Profile(f"p{i}", f"P{i}", rating=1000 + i) for i in range(10)]
+    leaderboard = Leaderboard(profiles)
+    assert leaderboard.rank(profiles[9]) == 1
+    assert leaderboard.rank(profiles[0]) == 10
+    assert leaderboard.page(0, 3) == [(1, "p9"), (2, "p8"), (3, "p7")]
+    assert leaderboard.page(8, 5) == [(9, "p1"), (10, "p0")]
+    assert leaderboard.around(profiles[5], 1) == [(4, "p6"), (5, "p5"), (6, "p4")]
+    assert leaderboard.around(profiles[9], 2) == [(1, "p9"), (2, "p8"), (3, "p7")]
+
+    raised = profiles[0]._replace(rating=2000)
+    leaderboard.update(profiles[0], raised)
+    assert leaderboard.rank(raised) == 1
+    assert len(leaderboard) == 10
+
+
+def test_results_update_ratings(ratings):
+    a, b = ratings.create("A"), ratings.create("B")
+    ratings.record(Result(1), (a.profile_id, b.profile_id))
+    a, b = ratings.get(a.profile_id), ratings.get(b.profile_id)
+    assert a.rating < b.rating
+    assert (a.games, a.wins, b.wins) == (1, 0, 1)
+    assert ratings.rank(b) == 1
+
+    ratings.record(Result(-1), (a.profile_id, b.profile_id))
+    assert ratings.get(a.profile_id).draws == 1
+
+    # guests and self-play are not rated
+    ratings.record(Result(0), (a.profile_id, None))
+    ratings.record(Result(0), (a.profile_id, a.profile_id))
+    assert ratings.get(a.profile_id).games == 2
+
+
+def test_snapshot_round_trip(ratings, tmp_path):
+    a, b = ratings.create("A"), ratings.create("B")
+    ratings.record(Result(0), (a.profile_id, b.profile_id))
+    path = str(tmp_path / "ratings.jsonl")
+    ratings.save(path)
+
+    restored = PlayerRatings()
+    assert restored.load(path)
+    assert restored.profiles == ratings.profiles
+    assert restored.rank(restored.get(a.profile_id)) == 1
+
+
+def test_rated_game_through_the_api(client, ratings):
+    a_profile = client.post("/api/v1/players", json={"name": "A"}).json()["profile_id"]
+    a = client.post("/api/v1/games/join", json={"player_name": "A", "profile_id": a_profile}).json()
+    b = client.post("/api/v1/games/join", json={"player_name": "B", "profile_id": "b-profile"}).json()
+    game_id = a["game_id"]
+    batch(client, game_id, [{"player_uuid": a["player_uuid"], "action": "ready"},
+                            {"player_uuid": b["player_uuid"], "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    batch(client, game_id, full_game_actions(context.player_1.uuid, context.player_2.uuid))
+
+    profile = client.get(f"/api/v1/players/{a_profile}").json()
+    assert profile["games"] == 1
+    assert client.get("/api/v1/players/b-profile").json()["name"] == "B"
+    assert client.get("/api/v1/players/missing").status_code == 404
+
+    page = client.get("/api/v1/leaderboard", params={"limit": 1}).json()
+    assert page["total"] == 2
+    assert [entry["rank"] for entry in page["entries"]] == [1]
+    around = client.get(f"/api/v1/leaderboard/around/{a_profile}", params={"radius": 1}).json()
+    assert {entry["profile_id"] for entry in around["entries"]} == {a_profile, "b-profile"}
+
+
+def owner_worker(ratings: PlayerRatings) -> httpx.AsyncClient:
+    """The internal profile endpoints of the worker owning the profiles, over an httpx mock transport."""
+    def handle(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/internal/profiles/import":
+            ratings.restore(Profile(*profile) for profile in json.loads(request.content))
+        elif path == "/internal/profiles/rate":
+            body = json.loads(request.content)
+            ratings.rate(tuple(body["profile_ids"]), body["score"])
+        elif request.method == "PUT":
+            return httpx.Response(200, json=ratings.get_or_create(path.split("/")[-1],
+                                                                   json.loads(request.content)["name"])._asdict())
+        else:
+            profile = ratings.get(path.split("/")[-1])
+            return httpx.Response(200, json=profile._asdict()) if profile else httpx.Response(404)
+        return httpx.Response(200, json=None)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handle), base_url="http://worker")
+
+
+@pytest.mark.asyncio
+async def test_other_workers_rate_through_the_owner(monkeypatch, ratings):
+    monkeypatch.setattr(profiles, "shard_config", ShardConfig(worker_id=1, workers=[0, 1]))
+    owner = PlayerRatings()
+    directory = ProfileDirectory()
+    directory._clients[0] = owner_worker(owner)
+
+    assert (await directory.get_or_create("a", "A")).name == "A"
+    await directory.get_or_create("b", "B")
+    directory.record(Result(0), ("a", "b"))
+    await asyncio.gather(*directory._tasks)
+    assert (await directory.get("a")).rating > owner.get("b").rating
+    assert await directory.get("missing") is None
+    assert ratings.profiles == {}  # nothing is kept on this worker
+
+
+@pytest.mark.asyncio
+async def test_handoff_moves_every_profile(monkeypatch):
+    monkeypatch.setattr(profiles, "shard_config", ShardConfig(worker_id=0, workers=[0, 1]))
+    local = PlayerRatings()
+    monkeypatch.setattr(profiles, "player_ratings", local)
+    a, b = local.create("A"), local.create("B")
+    new_owner = PlayerRatings()
+    directory = ProfileDirectory()
+    directory._clients[1] = owner_worker(new_owner)
+
+    directory.record(Result(0), (a.profile_id, b.profile_id))  # rated here while the owner
+    await directory.handoff(1)
+    assert local.profiles == {} and directory.owner() == 1
+    assert new_owner.get(a.profile_id).games == 1
+
+    # games ending here later are rated by the new owner
+    directory.record(Result(1), (a.profile_id, b.profile_id))
+    await asyncio.gather(*directory._tasks)
+    assert new_owner.get(b.profile_id).wins == 1 and local.profiles == {}
+
+
+def test_internal_profile_endpoints(client, ratings):
+    cluster = {"AXKAN-CLUSTER": CLUSTER_SECRET}
+    assert client.put("/internal/profiles/a", json={"name": "A"}).status_code == 403
+    assert client.put("/internal/profiles/a", headers=cluster, json={"name": "A"}).json()["name"] == "A"
+    client.put("/internal/profiles/b", headers=cluster, json={"name": "B"})
+    response = client.post("/internal/profiles/rate", headers=cluster, json={"profile_ids": ["a", "b"], "score": 1.0})
+    assert response.status_code == 200
+    assert client.get("/internal/profiles/a", headers=cluster).json()["wins"] == 1
+    assert client.get("/internal/profiles/c", headers=cluster).status_code == 404
+
+    handed = [list(Profile("c", "C", rating=1700.0))]
+    assert client.post("/internal/profiles/import", headers=cluster, json=handed).status_code == 200
+    assert client.get("/api/v1/leaderboard").json()["total"] == 1
+    assert client.post("/internal/profiles/import", headers=cluster, json=[[]]).status_code == 400
@@ -0,0 +1,91 @@
+"""
+Tests for the session registry and the routes resolving through it.
+"""
+from api.registry import session_registry
+from enums import GamePhase
+
+
+def join(client, name):
+    response = client.post("/api/v1/games/join", json={"player_name": name})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_join_pairs_players_through_lobby_index(client):
+    first = join(client, "Player 1")
+    assert first["opponent_uuid"] is None
+    assert session_registry.games_in_phase(GamePhase.LOBBY) == [first["game_id"]]
+
+    second = join(client, "Player 2")
+    assert second["game_id"] == first["game_id"]
+    assert second["opponent_uuid"] == first["player_uuid"]
+    assert session_registry.games_in_phase(GamePhase.LOBBY) == []
+    assert session_registry.games_in_phase(GamePhase.GAME_START) == [first["game_id"]]
+
+    third = join(client, "Player 3")
+    assert third["game_id"] != first["game_id"]
+
+
+def test_locate_player(client):
+    first = join(client, "Player 1")
+    second = join(client, "Player 2")
+
+    location = session_registry.locate(second["player_uuid"])
+    assert location.game_id == first["game_id"]
+    assert location.seat == 1
+    assert session_registry.locate("unknown") is None
+
+
+def test_phase_index_follows_actions(client):
+    first = join(client, "Player 1")
+    second = join(client, "Player 2")
+    game_id = first["game_id"]
+
+    for player in (first, second):
+        response = client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": player["player_uuid"]})
+        assert response.status_code == 200
+    assert session_registry.games_in_phase(GamePhase.GAME_INIT) == [game_id]
+
+    game_manager = session_registry.get_game(game_id)
+    roller = game_manager.context.player_1.uuid
+    client.post("/api/v1/games/roll-dice", params={"game_id": game_id, "player_uuid": roller})
+    assert session_registry.games_in_phase(GamePhase.TURN_SELECT_FIRST) == [game_id]
+
+    response = client.get("/api/v1/games/phases/turn_select_first")
+    assert response.json() == [game_id]
+    assert client.get("/api/v1/games/phases").json()["turn_select_first"] == 1
+
+
+def test_unknown_game_and_player(client):
+    first = join(client, "Player 1")
+    other = join(client, "Player 2")
+    outsider = join(client, "Player 3")
+
+    response = client.post("/api/v1/games/ready", params={"game_id": "missing", "player_uuid": first["player_uuid"]})
+    assert response.status_code == 404
+
+    response = client.post("/api/v1/games/ready", params={"game_id": first["game_id"], "player_uuid": outsider["player_uuid"]})
+    assert response.status_code == 403
+
+    session_registry.remove(first["game_id"])
+    assert session_registry.resolve(first["player_uuid"]) is None
+    assert session_registry.resolve(other["player_uuid"]) is None
+
+
+def test_phase_index_follows_failed_notifications(client, monkeypatch):
+    first = join(client, "Player 1")
+    second = join(client, "Player 2")
+    game_id = first["game_id"]
+    for player in (first, second):
+        client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": player["player_uuid"]})
+    game_manager = session_registry.get_game(game_id)
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("connection lost")
+    monkeypatch.setattr(game_manager, "notify_boards", fail)
+    try:
+        client.post("/api/v1/games/roll-dice", params={"game_id": game_id, "player_uuid": game_manager.context.player_1.uuid})
+    except RuntimeError:
+        pass
+    assert game_manager.context.current_phase == GamePhase.TURN_SELECT_FIRST
+    assert session_registry.games_in_phase(GamePhase.TURN_SELECT_FIRST) == [game_id]
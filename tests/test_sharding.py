@@ -0,0 +1,270 @@
+"""
+Tests for consistent hashing of games onto workers.
+"""
+import json
+import uuid
+
+import httpx
+import pytest
+
+from api import sharding
+from api.gateway import STREAM_PATH, Gateway
+from api.sharding import HashRing, ShardConfig
+from tests.conftest import CLUSTER_SECRET
+
+
+@pytest.fixture
+def game_ids():
+    return [str(uuid.uuid4()) for _ in range(2000)]
+
+
+def test_hash_ring_spreads_games(game_ids):
+    ring = HashRing([0, 1, 2, 3])
+    counts = {worker_id: 0 for worker_id in ring.workers}
+    for game_id in game_ids:
+        counts[ring.lookup(game_id)] += 1
+    assert all(count > len(game_ids) / 4 * 0.6 for count in counts.values())
+
+
+def test_hash_ring_is_stable(game_ids):
+    assert [HashRing([0, 1]).lookup(g) for g in game_ids] == [HashRing([1, 0]).lookup(g) for g in game_ids]
+
+
+def test_adding_worker_moves_only_its_share(game_ids):
+    ring = HashRing([0, 1, 2])
+    grown = ring.with_worker(3)
+    moved = [g for g in game_ids if ring.lookup(g) != grown.lookup(g)]
+    assert all(grown.lookup(g) == 3 for g in moved)
+    assert len(moved) < len(game_ids) * 0.4
+
+    shrunk = grown.without_worker(3)
+    assert all(shrunk.lookup(g) == ring.lookup(g) for g in game_ids)
+
+
+def test_empty_ring():
+    with pytest.raises(ValueError):
+        HashRing([]).lookup("game")
+
+
+def test_new_game_id_is_owned_by_local_worker(monkeypatch):
+    monkeypatch.setattr(sharding, "shard_config", ShardConfig(worker_id=2, workers=[0, 1, 2]))
+    monkeypatch.setattr(sharding, "_local_ring", None)
+    ring = HashRing([0, 1, 2])
+    assert all(ring.lookup(sharding.new_game_id()) == 2 for _ in range(20))
+
+
+def test_new_game_id_follows_the_rebalanced_ring(monkeypatch):
+    monkeypatch.setattr(sharding, "shard_config", ShardConfig(worker_id=2, workers=[0, 1]))
+    monkeypatch.setattr(sharding, "_local_ring", None)
+    monkeypatch.setattr(sharding, "_previous_ring", None)
+    sharding.set_workers([2, 1, 0])
+    ring = HashRing([0, 1, 2])
+    assert all(ring.lookup(sharding.new_game_id()) == 2 for _ in range(20))
+
+    # until the gateway switches too, new games hash here on both rings
+    sharding.set_workers([0, 1, 2, 3])
+    grown = ring.with_worker(3)
+    game_ids = [sharding.new_game_id() for _ in range(20)]
+    assert all(ring.lookup(g) == grown.lookup(g) == 2 for g in game_ids)
+
+
+def test_gateway_finds_game_id():
+    game_id = str(uuid.uuid4())
+    assert Gateway.game_id_of("/api/v1/games/ready", [("game_id", game_id)]) == game_id
+    assert Gateway.game_id_of(f"/api/v1/games/{game_id}/board", []) == game_id
+    assert Gateway.game_id_of("/api/v1/games/join", []) is None
+    assert STREAM_PATH.search(f"/api/v1/games/{game_id}/events")
+    assert not STREAM_PATH.search(f"/api/v1/games/{game_id}/board")
+
+
+def test_game_export_and_import(client):
+    first = client.post("/api/v1/games/join", json={"player_name": "Player 1"}).json()
+    second = client.post("/api/v1/games/join", json={"player_name": "Player 2"}).json()
+    game_id = first["game_id"]
+    cluster = {"AXKAN-CLUSTER": CLUSTER_SECRET}
+
+    # the client's API key does not open the internal endpoints
+    assert client.post(f"/internal/games/{game_id}/export").status_code == 403
+    assert client.post(f"/internal/games/{game_id}/export", headers={"AXKAN-CLUSTER": "guess"}).status_code == 401
+
+    exported = client.post(f"/internal/games/{game_id}/export", headers=cluster)
+    assert exported.status_code == 200
+    assert exported.json()["game_id"] == game_id  # plain JSON, nothing executable
+    response = client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": second["player_uuid"]})
+    assert response.status_code == 404
+
+    assert client.post("/internal/games/import", headers=cluster, json={"game_id": "x"}).status_code == 400
+    assert client.post("/internal/games/import", headers=cluster, json=exported.json()).status_code == 200
+    response = client.post("/api/v1/games/ready", params={"game_id": game_id, "player_uuid": second["player_uuid"]})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_gateway_does_not_forward_internal_paths():
+    gateway = Gateway("/nonexistent", [0], api_key="key", cluster_secret="secret")
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+    scope = {"type": "http", "method": "POST", "path": "/internal/games/import", "query_string": b"", "headers": []}
+    await gateway(scope, receive, send)
+    assert sent[0]["status"] == 404
+
+
+class FakeWorker:
+    """Worker internal endpoints over an httpx mock transport, holding games as their exported JSON."""
+
+    def __init__(self, games=(), fail_imports=False):
+        self.games = {game_id: {"game_id": game_id} for game_id in games}
+        self.workers = None
+        self.fail_imports = fail_imports
+        self.profiles_to = None  # worker the profiles were handed to
+        self.profile_owner = None
+        self.fail_listing = False
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        assert request.headers["AXKAN-CLUSTER"] == "secret"
+        path = request.url.path
+        if path == "/internal/ring":
+            self.workers = json.loads(request.content)["workers"]
+            return httpx.Response(200, json=None)
+        if path == "/internal/profiles/owner":
+            self.profile_owner = json.loads(request.content)["owner"]
+            return httpx.Response(200, json=None)
+        if path == "/internal/profiles/handoff":
+            if self.fail_imports:
+                return httpx.Response(502)
+            self.profiles_to = json.loads(request.content)["owner"]
+            return httpx.Response(200, json=None)
+        if path == "/internal/games":
+            if self.fail_listing:
+                return httpx.Response(503)
+            return httpx.Response(200, json=list(self.games))
+        if path == "/internal/games/import":
+            if self.fail_imports:
+                return httpx.Response(500)
+            data = json.loads(request.content)
+            self.games[data["game_id"]] = data
+            return httpx.Response(200, json={})
+        game_id = path.split("/")[3]
+        if game_id not in self.games:
+            return httpx.Response(404)
+        return httpx.Response(200, json=self.games.pop(game_id))
+
+
+def fake_gateway(workers, ring=None):
+    gateway = Gateway("/nonexistent", ring or list(workers), api_key="key", cluster_secret="secret")
+    for worker_id, worker in workers.items():
+        gateway._clients[worker_id] = httpx.AsyncClient(transport=httpx.MockTransport(worker.handle),
+                                                        base_url="http://worker")
+    return gateway
+
+
+@pytest.mark.asyncio
+async def test_rebalance_moves_games_the_gateway_never_routed(game_ids):
+    ring = HashRing([0, 1])
+    workers = {w: FakeWorker(g for g in game_ids[:200] if ring.lookup(g) == w) for w in ring.workers}
+    workers[2] = FakeWorker()
+    gateway = fake_gateway(workers, ring.workers)
+    grown = gateway.ring.with_worker(2)
+
+    moved = await gateway.rebalance(grown)
+    assert moved == len(workers[2].games) > 0
+    assert all(worker.workers == [0, 1, 2] for worker in workers.values())
+    for worker_id, worker in workers.items():
+        assert all(grown.lookup(game_id) == worker_id for game_id in worker.games)
+    assert gateway.placements == {}
+    assert not gateway._migrations
+
+
+@pytest.mark.asyncio
+async def test_failed_migration_puts_the_game_back(game_ids):
+    workers = {0: FakeWorker(game_ids[:100]), 1: FakeWorker(fail_imports=True)}
+    gateway = fake_gateway({0: workers[0]})
+    gateway._clients[1] = httpx.AsyncClient(transport=httpx.MockTransport(workers[1].handle),
+                                            base_url="http://worker")
+    stuck = [g for g in game_ids[:100] if gateway.ring.with_worker(1).lookup(g) == 1]
+
+    await gateway.rebalance(gateway.ring.with_worker(1))
+    assert sorted(workers[0].games) == sorted(game_ids[:100])
+    assert gateway.placements == {game_id: 0 for game_id in stuck}
+    assert all(gateway.owner(game_id) == 0 for game_id in stuck)
+
+    # the stuck games move with the next rebalance, their placements are dropped then
+    workers[1].fail_imports = False
+    await gateway.rebalance(gateway.ring.without_worker(1).with_worker(1))
+    assert sorted(workers[1].games) == sorted(stuck)
+    assert gateway.placements == {}
+
+
+@pytest.mark.asyncio
+async def test_removing_the_home_worker_hands_off_the_profiles():
+    workers = {0: FakeWorker(fail_imports=True), 1: FakeWorker()}
+    gateway = fake_gateway(workers)
+    assert await gateway.remove_worker(0) == 0
+    assert gateway.ring.workers == [0, 1]  # kept, the profiles could not move
+    assert workers[1].workers == [0, 1]
+
+    workers[0].fail_imports = False
+    await gateway.remove_worker(0)
+    assert workers[0].profiles_to == 1 and workers[1].workers == [1]
+    assert workers[0].profile_owner == workers[1].profile_owner == 1
+    assert gateway.home_worker == 1
+
+
+@pytest.mark.asyncio
+async def test_unlisted_worker_keeps_the_ring(game_ids):
+    ring = HashRing([0, 1])
+    workers = {w: FakeWorker(g for g in game_ids[:200] if ring.lookup(g) == w) for w in ring.workers}
+    workers[2] = FakeWorker()
+    workers[1].fail_listing = True
+    gateway = fake_gateway(workers, ring.workers)
+
+    assert await gateway.rebalance(ring.with_worker(2)) == 0
+    assert gateway.ring.workers == [0, 1] and workers[2].games == {}
+    assert workers[0].workers == workers[1].workers == [0, 1]  # the new ring was taken back
+    assert gateway.owner(next(iter(workers[1].games))) == 1
+
+
+class JoinWorker:
+    """A worker's /games/join, filling the game at once for a first player asking for a bot."""
+
+    def __init__(self):
+        self.players = {}  # game_id -> player names
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        game_id = request.url.params["game_id"]
+        body = json.loads(request.content)
+        players = self.players.setdefault(game_id, [])
+        if len(players) == 2:
+            return httpx.Response(409, json={"detail": "Game is already full"})
+        players.append(body["player_name"])
+        if body.get("bot") and len(players) == 1:
+            players.append("Bot")
+        opponent_uuid = str(uuid.uuid4()) if len(players) == 2 else None
+        return httpx.Response(200, json={"game_id": game_id, "opponent_uuid": opponent_uuid})
+
+
+@pytest.mark.asyncio
+async def test_join_after_a_bot_game_opens_a_new_game():
+    worker = JoinWorker()
+    gateway = Gateway("/nonexistent", [0], api_key="key", cluster_secret="secret")
+    gateway._clients[0] = httpx.AsyncClient(transport=httpx.MockTransport(worker.handle), base_url="http://worker")
+
+    async def join(body):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+        await gateway.handle_join(send, "/api/v1/games/join", [], [], json.dumps(body).encode())
+        return sent[0]["status"], json.loads(sent[1]["body"])
+
+    status, bot_game = await join({"player_name": "A", "bot": "easy"})
+    assert status == 200 and gateway.open_game_id is None
+    status, waiting = await join({"player_name": "B"})
+    assert status == 200 and waiting["game_id"] != bot_game["game_id"] and waiting["opponent_uuid"] is None
+    status, paired = await join({"player_name": "C"})
+    assert status == 200 and paired["game_id"] == waiting["game_id"]
@@ -0,0 +1,148 @@
+"""
+Tests for the expectiminimax solver, its Zobrist keys and its transposition table.
+"""
+import pytest
+
+import zobrist
+from conversion import best_conversions
+from dice import DiceCollectionType
+from dice_advice import final_pnl
+from enums import GamePhase
+from game_context import GameContext
+from player import Player
+from pricing import PRICES, price_distribution
+from solver import (Solver, TranspositionTable, expected_lead, final_lead, offer, pick, roll, root_state,
+                    transposition_table)
+from api.registry import session_registry
+
+from tests.test_batch_actions import batch, full_game_actions, start_game
+
+
+def context_at_turn_start(seed=3):
+    context = GameContext()
+    for i in range(2):
+        context.add_player(Player(uuid=str(i), name=f"Player {i}"))
+    context.initialize_game(seed=seed)
+    context.roll_dice()
+    context.start_turn()
+    return context
+
+
+def full_hash(state):
+    return zobrist.state_hash(state.phase, state.turn, state.price, state.offered, state.held, state.hidden,
+                              state.sevens)
+
+
+def test_incremental_keys_match_full_hash():
+    state = root_state(context_at_turn_start(), 0)
+    assert state.key == full_hash(state)
+    state = pick(state, state.offered[0])
+    assert state.key == full_hash(state) and state.phase == GamePhase.TURN_SELECT_SECOND
+    state = pick(state, state.offered[1])
+    assert state.key == full_hash(state) and state.phase == GamePhase.TURN_COMPLETE
+    state = roll(state, DiceCollectionType.STIMULUS, 15)
+    assert state.key == full_hash(state)
+    assert (state.turn, state.price, state.offered, state.sevens) == (2, 15, (), (2, 1))
+    state = offer(state, (100, 200, 300))
+    assert state.key == full_hash(state)
+    # the same pairs picked in another order hash the same
+    assert zobrist.state_hash(state.phase, 2, 15, (), ((1, 2), ()), (None, None), (2, 2)) == \
+        zobrist.state_hash(state.phase, 2, 15, (), ((2, 1), ()), (None, None), (2, 2))
+
+
+def test_transposition_table_replacement():
+    table = TranspositionTable(4)
+    table.new_search()
+    table.store(1, 3, 1.0)
+    table.store(5, 1, 2.0)  # same slot, shallower: kept out
+    assert table.probe(1, 3) == 1.0 and table.probe(1, 4) is None and table.probe(5, 1) is None
+    table.store(5, 3, 2.0)  # as deep: replaces
+    assert table.probe(5, 2) == 2.0 and table.probe(1, 1) is None
+    table.new_search()
+    table.store(1, 1, 3.0)  # anything replaces an older search's entry
+    assert table.probe(1, 1) == 3.0
+    assert table.hits == 3 and table.probes == 6
+    with pytest.raises(ValueError):
+        TranspositionTable(6)
+
+
+def test_last_roll_is_exact():
+    context = context_at_turn_start()
+    state = root_state(context, 0)
+    offered = state.offered
+    for _ in range(6):
+        state = offer(roll(pick(pick(state, offered[0]), offered[1]), DiceCollectionType.REGULAR, state.price), offered)
+    state = pick(pick(state, offered[0]), offered[1])
+    assert state.turn == 7 and state.phase == GamePhase.TURN_COMPLETE
+
+    analysis = Solver().search(state, 3)
+    roller = state.mover()
+    for move in analysis.moves:
+        sevens = list(state.sevens)
+        sevens[roller] -= move.collection != DiceCollectionType.REGULAR
+        distribution = price_distribution(state.price, 1, move.collection)
+        first = final_pnl(state.held[0], state.hidden[0], sevens[0])
+        second = final_pnl(state.held[1], state.hidden[1], sevens[1])
+        assert move.value == pytest.approx(sum(distribution[p] * (first[p] - second[p]) for p in PRICES))
+    best = max if roller == 0 else min
+    assert analysis.value == best(move.value for move in analysis.moves)
+
+
+def test_search_deepens_and_uses_the_table():
+    state = root_state(context_at_turn_start(), 0)
+    solver = Solver(TranspositionTable(1 << 12))
+    shallow = solver.search(state, 1)
+    assert shallow.depth == 1
+    assert shallow.value == max(expected_lead(pick(state, pair_id)) for pair_id in state.offered)
+
+    analysis = solver.search(state, 5, time_budget=30)
+    assert analysis.depth == 5 and analysis.table_hits > 0
+    assert [move.pair_id for move in analysis.moves] != [] and analysis.value == analysis.moves[0].value
+    # a repeated search is answered from the table at the root's children
+    again = solver.search(state, 5, time_budget=30)
+    assert again.value == analysis.value and again.nodes < analysis.nodes
+
+
+def test_time_budget_stops_deepening():
+    analysis = Solver().search(root_state(context_at_turn_start(), 0), 21, time_budget=0.05)
+    assert 1 <= analysis.depth < 21
+
+
+def test_final_review_gives_conversions():
+    context = context_at_turn_start()
+    state = root_state(context, 1)
+    offered = state.offered
+    for _ in range(7):
+        state = roll(pick(pick(offer(state, offered), offered[0]), offered[1]), DiceCollectionType.REGULAR, 3)
+    assert state.phase == GamePhase.FINAL_REVIEW and len(state.held[1]) == 7
+    analysis = Solver().search(state, player_id=1)
+    assert analysis.value == final_lead(state)
+    assert analysis.moves == ()
+    assert analysis.conversions == best_conversions(3, state.held[1], state.hidden[1], 2).pair_indexes
+
+
+def test_analysis_endpoint(client):
+    game_id, a, b = start_game(client)
+    batch(client, game_id, [{"player_uuid": a, "action": "ready"}, {"player_uuid": b, "action": "ready"}])
+    context = session_registry.get_game(game_id).context
+    p1, p2 = context.player_1.uuid, context.player_2.uuid
+    url = f"/api/v1/games/{game_id}/analysis"
+    probes = transposition_table.probes
+    assert client.get(url, params={"player_uuid": p1}).status_code == 409
+
+    batch(client, game_id, [{"player_uuid": p1, "action": "roll_dice"}])
+    response = client.get(url, params={"player_uuid": p2, "depth": 3})
+    assert response.status_code == 200
+    analysis = response.json()
+    assert analysis["to_move"] == 0 and analysis["depth"] == 3
+    assert sorted(move["pair_index"] for move in analysis["moves"]) == [0, 1, 2]
+    # player id 0 moves, its best move is the worst for player id 1
+    assert analysis["expected_lead"] == min(move["expected_lead"] for move in analysis["moves"])
+    assert client.get(url, params={"player_uuid": p2, "depth": 99}).status_code == 422
+
+    assert batch(client, game_id, full_game_actions(p1, p2)[1:-2]).status_code == 200
+    analysis = client.get(url, params={"player_uuid": p1}).json()
+    assert analysis["current_phase"] == "final_review" and analysis["moves"] == []
+    assert analysis["conversions"] == list(context.conversion_plan(0).pair_indexes)
+    # searched in the process pool, each of its processes has its own table
+    assert transposition_table.probes == probes
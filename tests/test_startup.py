@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+
+from api import app
+from startup import OPENAPI_PATH, ROUTES_SIGNATURE_KEY, StartupProfiler, build_openapi, routes_signature, \
+    warm_serializers
+
+
+def test_checked_in_openapi_matches_routes():
+    with open(OPENAPI_PATH) as f:
+        schema = json.load(f)
+    assert schema[ROUTES_SIGNATURE_KEY] == routes_signature(app)
+    assert "/api/v1/games/join" in schema["paths"]
+    assert "/internal/games/import" in schema["paths"]
+
+
+def test_checked_in_openapi_is_up_to_date():
+    # the signature does not see changes inside models, the schema does
+    with open(OPENAPI_PATH) as f:
+        schema = json.load(f)
+    assert schema == json.loads(json.dumps(build_openapi(app))), \
+        "openapi.json is out of date, regenerate it with `python startup.py --export-openapi`"
+
+
+def test_prebuilt_openapi_is_served(client):
+    app.openapi_schema = None
+    response = client.get("/openapi.json")
+    assert response.status_code == 200
+    assert response.json()[ROUTES_SIGNATURE_KEY] == routes_signature(app)
+
+
+def test_stale_openapi_is_regenerated(tmp_path, monkeypatch):
+    stale = tmp_path / "openapi.json"
+    stale.write_text(json.dumps({"paths": {}, ROUTES_SIGNATURE_KEY: "stale"}))
+    from startup import _load_openapi
+    assert _load_openapi(app, str(stale)) is None
+    monkeypatch.setenv("AXKAN_PREBUILT_OPENAPI", "0")
+    assert _load_openapi(app, OPENAPI_PATH) is None
+
+
+def test_startup_defers_cluster_and_bot_imports():
+    # a fresh interpreter, the test session has imported everything already
+    deferred = "{'httpx', 'multiprocessing', 'bot', 'solver'}"
+    script = f"import sys, main; print(' '.join(sorted({deferred} & set(sys.modules))))"
+    imported = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(OPENAPI_PATH),
+                              capture_output=True, text=True, check=True).stdout
+    assert imported.split() == []
+
+
+def test_warm_serializers():
+    warm_serializers()
+
+
+def test_profiler_times_imports_and_phases():
+    profiler = StartupProfiler()
+    profiler.start()
+    try:
+        with profiler.phase("import"):
+            import xml.dom.minidom  # noqa: F401  (not imported by the app)
+    finally:
+        profiler.stop()
+    assert [name for name, _ in profiler.phases] == ["import"]
+    report = profiler.report()
+    assert "import" in report
@@ -0,0 +1,73 @@
+import pydantic
+import pytest
+
+import validation
+from game_context import GameContext
+from player import Player, PlayerView
+
+
+@pytest.fixture
+def context():
+    context = GameContext()
+    context.add_player(Player(uuid="a", name="A"))
+    context.add_player(Player(uuid="b", name="B"))
+    context.initialize_game()
+    context.set_initial_price(4)
+    context.current_phase = context.current_phase.TURN_START
+    context.start_turn()
+    return context
+
+
+def build_all(context):
+    boards = [context.create_board(player_id).model_dump_json() for player_id in (0, 1)]
+    return boards + [context.calculate_final_results().model_dump_json()]
+
+
+def test_trusted_construction_matches_validation(context, monkeypatch):
+    strict = build_all(context)
+    monkeypatch.setattr(validation, "strict_validation", False)
+    assert build_all(context) == strict
+
+
+def test_trusted_views_do_not_share_portfolio_lists(context, monkeypatch):
+    monkeypatch.setattr(validation, "strict_validation", False)
+    player = context.players[0]
+    view = player.get_player_view(context.current_price)
+    player.select_pair(context.available_pairs[0])
+    assert view.selected_pairs == []
+
+
+def test_strict_mode_rejects_bad_state(context):
+    context.dice_result = ["not a number"]
+    with pytest.raises(ValueError):
+        context.create_board(0)
+
+
+def view_fields(context):
+    return context.players[0].get_player_view(context.current_price).model_dump()
+
+
+def test_build_trusted_skips_validation(context, monkeypatch):
+    monkeypatch.setattr(validation, "strict_validation", False)
+    view = validation.build_trusted(PlayerView, **{**view_fields(context), "player_id": "not validated"})
+    assert view.player_id == "not validated"
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_every_field_is_required(context, monkeypatch, strict):
+    monkeypatch.setattr(validation, "strict_validation", strict)
+    fields = view_fields(context)
+    del fields["cost"], fields["hidden_pair"]
+    with pytest.raises(ValueError, match="missing fields: cost, hidden_pair"):
+        validation.build_trusted(PlayerView, **fields)
+
+
+def test_trusted_instances_match_model_construct(context, monkeypatch):
+    # the fast path writes pydantic 2's instance slots, a new major version has to be checked again
+    assert pydantic.VERSION.split(".")[0] == "2"
+    monkeypatch.setattr(validation, "strict_validation", False)
+    fields = view_fields(context)
+    trusted, constructed = validation.build_trusted(PlayerView, **fields), PlayerView.model_construct(**fields)
+    for slot in ("__dict__", "__pydantic_fields_set__", "__pydantic_extra__", "__pydantic_private__"):
+        assert getattr(trusted, slot) == getattr(constructed, slot)
+    assert trusted == constructed
@@ -0,0 +1,38 @@
+"""
+Game state machine: the actions accepted in each phase, shared by validation and execution.
+"""
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, FrozenSet, Tuple
+
+from enums import GamePhase, GameAction
+
+
+class BoardUpdate(Enum):
+    """Which boards are sent out after a transition."""
+    NONE = "none"      # the handler sends its own event messages
+    ACTOR = "actor"    # only the player who acted
+    ALL = "all"        # both players
+
+
+@dataclass(frozen=True)
+class Transition:
+    name: str  # GameManager handles it with _on_<name>
+    boards: BoardUpdate = BoardUpdate.NONE
+
+
+TRANSITIONS: Dict[Tuple[GamePhase, GameAction], Transition] = {
+    (GamePhase.LOBBY, GameAction.JOIN_GAME): Transition("join"),
+    (GamePhase.GAME_START, GameAction.READY): Transition("ready"),
+    (GamePhase.GAME_INIT, GameAction.ROLL_DICE): Transition("initial_roll", BoardUpdate.ALL),
+    (GamePhase.TURN_SELECT_FIRST, GameAction.SELECT_PAIR): Transition("select_first", BoardUpdate.ALL),
+    (GamePhase.TURN_SELECT_SECOND, GameAction.SELECT_PAIR): Transition("select_second", BoardUpdate.ALL),
+    (GamePhase.TURN_COMPLETE, GameAction.ROLL_DICE): Transition("roll", BoardUpdate.ALL),
+    (GamePhase.FINAL_REVIEW, GameAction.COLOR_CONVERT): Transition("convert_color", BoardUpdate.ACTOR),
+    (GamePhase.FINAL_REVIEW, GameAction.AUTO_CONVERT): Transition("auto_convert", BoardUpdate.ACTOR),
+    (GamePhase.FINAL_REVIEW, GameAction.END_REVIEW): Transition("end_review"),
+    (GamePhase.GAME_END, GameAction.READY): Transition("rematch"),
+}
+
+# Phases in which players can act at all
+ACTIVE_PHASES: FrozenSet[GamePhase] = frozenset(phase for phase, _ in TRANSITIONS)
@@ -0,0 +1,46 @@
+"""
+Construction of response models from state the server built itself.
+
+Boards, player views and results are assembled from cards and pairs that were validated when they
+were created, so by default they skip pydantic validation. Set AXKAN_STRICT_VALIDATION=1 (the test
+suite does) to validate them again and catch a bad internal state early.
+"""
+import os
+from typing import Type, TypeVar
+
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+_new = object.__new__
+_set = object.__setattr__
+
+strict_validation = os.getenv("AXKAN_STRICT_VALIDATION", "") not in ("", "0")
+
+
+def set_strict_validation(enabled: bool) -> None:
+    global strict_validation
+    strict_validation = enabled
+
+
+def build_trusted(model: Type[M], **fields) -> M:
+    """
+    Create a model from trusted data, which must give every field: validated in strict mode,
+    otherwise the instance is filled in directly. (model_construct is slower than validation itself
+    in pydantic 2, as it walks the fields in Python to apply defaults.) Filling in the instance relies on
+    pydantic 2's instance layout, which tests/test_validation.py checks against model_construct.
+    """
+    missing = model.model_fields.keys() - fields.keys()
+    if missing:
+        raise ValueError(f"{model.__name__} is missing fields: {', '.join(sorted(missing))}")
+    if strict_validation:
+        return model(**fields)
+    if model.__private_attributes__:
+        # private attributes need their defaults
+        return model.model_construct(**fields)
+    instance = _new(model)
+    _set(instance, "__dict__", fields)
+    _set(instance, "__pydantic_fields_set__", set(fields))
+    _set(instance, "__pydantic_extra__", None)
+    _set(instance, "__pydantic_private__", None)
+    return instance
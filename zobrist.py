@@ -0,0 +1,68 @@
+"""
+Zobrist keys of game states.
+
+Every feature of a state (the price, the turn, the phase, a pair held by a player, a pair on offer,
+...) has a random 64-bit key and a state hashes to the XOR of the keys of its features. A move updates
+the hash with a few XORs, and pairs hash the same whatever order they were picked in.
+
+There is one layout. state_hash covers what a search sees, the key of solver states and policy tables.
+game_hash adds what only the server knows: the opponent's hidden pair, which seven cards are held and
+the cards left to draw. GameContext.search_key and GameContext.state_key keep both up to date.
+"""
+import random
+from typing import Iterable, Optional, Tuple
+
+from card import CARD_COUNT
+from enums import GamePhase
+from game_record import TURNS
+
+PAIR_COUNT = CARD_COUNT * CARD_COUNT  # range of CardPair.to_index
+MAX_SEVEN_CARDS = 2
+
+_rng = random.Random(0x41584B414E)  # fixed, so hashes are the same in every process
+
+
+def _keys(count: int) -> Tuple[int, ...]:
+    return tuple(_rng.getrandbits(64) for _ in range(count))
+
+
+PRICE = _keys(21)  # indexed by price, 0 unused
+TURN = _keys(TURNS + 2)  # indexed by turn
+PHASE = dict(zip(GamePhase, _keys(len(GamePhase))))
+HELD = (_keys(PAIR_COUNT), _keys(PAIR_COUNT))  # pair picked by player id 0 / 1
+HIDDEN = (_keys(PAIR_COUNT), _keys(PAIR_COUNT))  # hidden pair of player id 0 / 1
+OFFERED = _keys(PAIR_COUNT)  # pair on offer and not taken yet
+SEVENS = (_keys(MAX_SEVEN_CARDS + 1), _keys(MAX_SEVEN_CARDS + 1))  # seven cards left to player id 0 / 1
+# game_hash only, drawn after the keys above so they keep their values: policy tables are keyed by state_hash
+SEVEN_CARD = (_keys(CARD_COUNT), _keys(CARD_COUNT))  # seven card held by player id 0 / 1, by card id
+PILE = _keys(CARD_COUNT)  # card still in a draw pile, by card id
+
+
+def state_hash(phase: GamePhase, turn: int, price: Optional[int], offered: Iterable[int],
+               held: Tuple[Iterable[int], Iterable[int]], hidden: Tuple[Optional[int], Optional[int]],
+               sevens: Tuple[int, int]) -> int:
+    """Hash of a state from scratch, given pair ids by player id."""
+    key = PHASE[phase] ^ TURN[turn] ^ (PRICE[price] if price else 0)
+    for pair_id in offered:
+        key ^= OFFERED[pair_id]
+    for player_id in (0, 1):
+        for pair_id in held[player_id]:
+            key ^= HELD[player_id][pair_id]
+        if hidden[player_id] is not None:
+            key ^= HIDDEN[player_id][hidden[player_id]]
+        key ^= SEVENS[player_id][sevens[player_id]]
+    return key
+
+
+def game_hash(phase: GamePhase, turn: int, price: Optional[int], offered: Iterable[int],
+              held: Tuple[Iterable[int], Iterable[int]], hidden: Tuple[Optional[int], Optional[int]],
+              seven_cards: Tuple[Iterable[int], Iterable[int]], pile: Iterable[int]) -> int:
+    """Hash of a whole game from scratch: the state_hash with both hidden pairs, plus the seven card ids and draw piles."""
+    seven_cards = (tuple(seven_cards[0]), tuple(seven_cards[1]))
+    key = state_hash(phase, turn, price, offered, held, hidden, (len(seven_cards[0]), len(seven_cards[1])))
+    for player_id in (0, 1):
+        for card_id in seven_cards[player_id]:
+            key ^= SEVEN_CARD[player_id][card_id]
+    for card_id in pile:
+        key ^= PILE[card_id]
+    return key